@@ -34,6 +34,7 @@ from soma.controller.trait_utils import relax_exists_constraint
 import six
 import sys
 import copy
+from collections import OrderedDict
 from six.moves import range
 
 # DEBUG
@@ -90,6 +91,7 @@ class ProcessCompletionEngine(traits.HasTraits):
     get_completion_engine
     get_attribute_values
     complete_parameters
+    update_completion
     set_parameters
     attributes_to_path
     get_path_completion_engine
@@ -107,6 +109,7 @@ class ProcessCompletionEngine(traits.HasTraits):
         self.add_trait('completion_progress', traits.Float(0.))
         self.add_trait('completion_progress_total', traits.Float(1.))
         self._rebuild_attributes = False
+        self._completion_record = None
 
 
     def __del__(self):
@@ -280,6 +283,10 @@ class ProcessCompletionEngine(traits.HasTraits):
         ''' Completes file parameters from given inputs parameters, which may
         include both "regular" process parameters (file names) and attributes.
 
+        The parameters set by the completion, and the attributes each node
+        completion depends on, are recorded to allow a later incremental
+        update, see :meth:`update_completion`.
+
         Parameters
         ----------
         process_inputs: dict (optional)
@@ -287,9 +294,56 @@ class ProcessCompletionEngine(traits.HasTraits):
             process parameters, and attributes used for completion. Attributes
             should be in a sub-dictionary under the key "capsul_attributes".
         '''
+        self._complete(process_inputs)
+
+
+    def update_completion(self, changed_attributes=(), process_inputs={},
+                          changed_nodes=()):
+        ''' Incremental completion after a change of some attributes or
+        switches.
+
+        Only the nodes whose attributes intersect changed_attributes, the
+        changed nodes, and the nodes which have not been completed yet are
+        completed again. For other nodes, parameters values set by their last
+        completion are set again, without building paths: they may have been
+        overwritten by values propagated from recompleted nodes through links.
+        The result is the same as the one of :meth:`complete_parameters`.
+
+        If the engine has never been completed, or if its class overrides
+        :meth:`complete_parameters`, a full completion is performed.
+
+        Parameters
+        ----------
+        changed_attributes: list (optional)
+            names of attributes which have changed
+        process_inputs: dict (optional)
+            parameters and attributes, as in :meth:`complete_parameters`
+        changed_nodes: list (optional)
+            nodes of the pipeline which must be completed again (switches
+            which state has changed for instance)
+        '''
+        if self._completion_record is None:
+            self.complete_parameters(process_inputs)
+        else:
+            self._complete(process_inputs, set(changed_attributes),
+                           set(changed_nodes))
+
+
+    def _complete(self, process_inputs, changed_attributes=None,
+                  changed_nodes=()):
+        ''' Completion implementation, full if changed_attributes is None,
+        otherwise incremental (see :meth:`update_completion`).
+        '''
         self.completion_progress = 0.
         self.completion_progress_total = 1.
         self.set_parameters(process_inputs)
+        incremental = changed_attributes is not None
+        old_record = self._completion_record
+        if not incremental or old_record is None:
+            old_record = {'nodes': {}, 'parameters': None, 'attributes': None}
+        record = {'nodes': OrderedDict(), 'parameters': {}, 'attributes': None}
+        # the record is invalid until completion ends
+        self._completion_record = None
 
         # if process is a pipeline, trigger completions for its nodes and
         # sub-pipelines.
@@ -303,16 +357,6 @@ class ProcessCompletionEngine(traits.HasTraits):
         # now, but it is sub-optimal since many parameters will be set many
         # times.
 
-        def satisfied_deps(node, all_nodes, done):
-            for param, plug in node.plugs.items():
-                if not plug.output:
-                    for link in plug.links_from:
-                        snode = link[2]
-                        if snode not in done \
-                                and (link[0], snode) in all_nodes:
-                            return False
-            return True
-
         verbose = False
 
         pipeline = None
@@ -324,86 +368,214 @@ class ProcessCompletionEngine(traits.HasTraits):
             attrib_values = self.get_attribute_values().export_to_dict()
             name = getattr(pipeline, 'context_name', pipeline.name)
 
-            # build nodes list
-            nodes_list = set([n for n in pipeline.nodes.items()
-                              if n[0] != ''
-                                  and pipeline_tools.is_node_enabled(
-                                      pipeline, n[0], n[1])])
-            init_result = True
-            done = set()
-            todo = [(node_name, node) for node_name, node in nodes_list
-                    if satisfied_deps(node, nodes_list, done)]
+            nodes_list = self._completion_order(pipeline)
 
             self.completion_progress_total = len(nodes_list) + 0.05
             index = 0
 
             # process topologically through nodes dependencies
-            while todo:
-                node_name, node = todo.pop(0)
-                done.add(node)
-
-                pname = '.'.join([name, node_name])
-
-                subprocess_compl = \
-                    ProcessCompletionEngine.get_completion_engine(
-                        node, pname)
-                self._install_subprogress_moniotoring(subprocess_compl)
-                try:
-                    subprocess_compl.complete_parameters(
-                        {'capsul_attributes': attrib_values})
-                except Exception:
-                    try:
-                        self.__class__(node).complete_parameters(
-                            {'capsul_attributes': attrib_values})
-                    except Exception:
-                        pass
-                self._remove_subprogress_moniotoring(subprocess_compl)
+            for node_name, node in nodes_list:
+                node_record = old_record['nodes'].get(node)
+                if node_record is not None and node not in changed_nodes \
+                        and node_record['attributes'] is not None \
+                        and not node_record['attributes'].intersection(
+                            changed_attributes):
+                    # not affected by the change: set again the parameters
+                    # values of the last completion
+                    self._replay_node_completion(node, node_record)
+                else:
+                    pname = '.'.join([name, node_name])
+                    subprocess_compl = \
+                        ProcessCompletionEngine.get_completion_engine(
+                            node, pname)
+                    node_changes = None
+                    if incremental and node not in changed_nodes:
+                        node_changes = changed_attributes
+                    node_record = self._complete_node(
+                        node, subprocess_compl, attrib_values,
+                        old_record['nodes'].get(node), node_changes)
+                record['nodes'][node] = node_record
 
                 # increase progress notification
                 index += 1
                 self.completion_progress = index
 
-                # insert downstream nodes in todo list
-                for param, plug in node.plugs.items():
-                    if not plug.output:
-                        continue
-                    links = plug.links_to
-                    for l in links:
-                        dnode = l[2]
-                        #print(l[0], dnode in done, dnode in )
-                        if dnode not in done \
-                                and (l[0], dnode) in nodes_list \
-                                and (l[0], dnode) not in todo \
-                                and satisfied_deps(dnode, nodes_list,
-                                                    done):
-                            todo.append((l[0], dnode))
-                        # not needed any longer:
-                        ## release "exists" property on connected traits
-                        #if hasattr(dnode, 'process'):
-                            #p = l[2].process
-                        #else:
-                            #p = l[2]
-                        #trait = p.trait(l[1])
-                        #if trait:
-                            #relax_exists_constraint(trait)
-                            ## FIXME this very specific stuff should be
-                            ## handled another way at another place...
-                            #if hasattr(p, 'process') \
-                                    #and hasattr(p.process, 'inputs'):
-                                ## MIA custom wrappings of nipype interfaces
-                                ## are this way, and do not release the
-                                ## exists constrain internally.
-                                #relax_exists_constraint(
-                                    #p.process.inputs.trait(l[1]))
-
-            if len(done) != len(nodes_list):
-                print('Some nodes of the pipeline could not be reached '
-                      'through dependencies. The pipeline structure is '
-                      'probably wrong:')
-                print([nname for nname, n in nodes_list if n not in done])
-
         attributes = self.get_attribute_values()
+        record['attributes'] = set(attributes.user_traits().keys())
+
+        # now complete process parameters:
+        process = self.process
+        if isinstance(process, ProcessNode):
+            process = process.process
+        if incremental and old_record['parameters'] is not None \
+                and not changed_nodes \
+                and record['attributes'] == old_record['attributes'] \
+                and not record['attributes'].intersection(
+                    changed_attributes):
+            # parameters do not depend on changed attributes
+            record['parameters'] = old_record['parameters']
+            self._set_parameters_values(process, record['parameters'])
+        else:
+            record['parameters'] = self._complete_process_parameters(
+                process, attributes, verbose)
+        self._completion_record = record
+        self.completion_progress = self.completion_progress_total
+
+
+    def _completion_order(self, pipeline):
+        ''' Enabled nodes of a pipeline, in the order of their completion:
+        topologically through nodes dependencies.
+
+        Returns
+        -------
+        nodes: list
+            [(node_name, node), ...]
+        '''
+        # enabled nodes, ordered using the pipeline dependency index, which
+        # is shared with other traversals and kept as long as the pipeline
+        # structure does not change
+        nodes = [node for node_name, node in six.iteritems(pipeline.nodes)
+                 if node_name != ''
+                    and pipeline_tools.is_node_enabled(pipeline, node_name,
+                                                       node)]
+        index = pipeline.dependency_index()
+        ordered = [(index.names[node], node)
+                   for node in index.topological_order(nodes)]
+
+        if len(ordered) != len(nodes):
+            done = set([node for node_name, node in ordered])
+            print('Some nodes of the pipeline could not be reached '
+                  'through dependencies. The pipeline structure is '
+                  'probably wrong:')
+            print([index.names[n] for n in nodes if n not in done])
+        return ordered
+
+
+    def _complete_node(self, node, subprocess_compl, attrib_values,
+                       old_node_record=None, changed_attributes=None):
+        ''' Complete a pipeline node, and return its completion record: the
+        attributes it depends on, and the means to set again the parameters
+        values it has set.
+
+        If changed_attributes is not None, and the node engine supports it,
+        the node completion is incremental.
+        '''
+        process = getattr(node, 'process', node)
+        before = None
+        if subprocess_compl.__class__.complete_parameters \
+                is not ProcessCompletionEngine.complete_parameters:
+            # specialized completion: parameters changes will be recorded
+            before = self._parameters_values(process)
+        self._install_subprogress_moniotoring(subprocess_compl)
+        engine = subprocess_compl
+        try:
+            if changed_attributes is not None \
+                    and subprocess_compl._completion_record is not None:
+                subprocess_compl.update_completion(
+                    changed_attributes, {'capsul_attributes': attrib_values})
+            else:
+                subprocess_compl.complete_parameters(
+                    {'capsul_attributes': attrib_values})
+        except Exception:
+            engine = None
+            try:
+                self.__class__(node).complete_parameters(
+                    {'capsul_attributes': attrib_values})
+            except Exception:
+                pass
+        self._remove_subprogress_moniotoring(subprocess_compl)
+
+        node_record = {'attributes': None, 'engine': None, 'parameters': {}}
+        if engine is None:
+            # no dependencies information: always complete this node
+            return node_record
+        try:
+            node_record['attributes'] = set(
+                engine.get_attribute_values().user_traits().keys())
+        except Exception:
+            return node_record
+        if before is None:
+            if engine._completion_record is not None:
+                # the node engine has recorded what it did.
+                node_record['engine'] = engine
+            else:
+                node_record['attributes'] = None
+        else:
+            # specialized engine: record the parameters modified by the
+            # completion, and the ones set by its previous completion which
+            # still have the same value.
+            after = self._parameters_values(process)
+            old_parameters = {}
+            if old_node_record is not None:
+                old_parameters = old_node_record['parameters']
+            parameters = node_record['parameters']
+            for param, value in six.iteritems(after):
+                if param not in before or before[param] != value \
+                        or (param in old_parameters
+                            and old_parameters[param] == value):
+                    parameters[param] = value
+        return node_record
+
+
+    def _replay_node_completion(self, node, node_record):
+        ''' Set again the parameters values set by the last completion of a
+        node (see :meth:`_complete_node`)
+        '''
+        if node_record['engine'] is not None:
+            node_record['engine']._replay_completion()
+        else:
+            self._set_parameters_values(getattr(node, 'process', node),
+                                        node_record['parameters'])
+
+
+    def _replay_completion(self):
+        ''' Set again the parameters values set by the last completion, in
+        the same order, without building paths
+        '''
+        record = self._completion_record
+        if record is None:
+            return
+        for node, node_record in six.iteritems(record['nodes']):
+            self._replay_node_completion(node, node_record)
+        process = self.process
+        if isinstance(process, ProcessNode):
+            process = process.process
+        self._set_parameters_values(process, record['parameters'])
+
+
+    @staticmethod
+    def _parameters_values(process):
+        ''' Values of the user parameters of a process or node
+        '''
+        values = {}
+        for param in process.user_traits():
+            try:
+                values[param] = getattr(process, param)
+            except Exception:
+                pass
+        return values
+
 
+    @staticmethod
+    def _set_parameters_values(process, values):
+        ''' Set parameters values on a process or node, except on protected
+        parameters
+        '''
+        is_protected = getattr(process, 'is_parameter_protected', None)
+        for param, value in six.iteritems(values):
+            if is_protected is not None and is_protected(param):
+                continue
+            try:
+                setattr(process, param, value)
+            except Exception:
+                pass
+
+
+    def _complete_process_parameters(self, process, attributes,
+                                     verbose=False):
+        ''' Complete parameters of the process itself from attributes, and
+        return the values which have been set: {parameter: value}
+        '''
         # if some attributes are list, we must separate list and non-list
         # attributes, and use an un-listed controller to get a path
         have_list = any([isinstance(t.trait_type, traits.List)
@@ -416,10 +588,7 @@ class ProcessCompletionEngine(traits.HasTraits):
             # no list parameter
             attributes_single = attributes
 
-        # now complete process parameters:
-        process = self.process
-        if isinstance(process, ProcessNode):
-            process = process.process
+        completed = {}
         for pname, trait in six.iteritems(process.user_traits()):
             if trait.forbid_completion \
                     or process.is_parameter_protected(pname):
@@ -473,6 +642,7 @@ class ProcessCompletionEngine(traits.HasTraits):
                         value = None  # not in pattern: don't complete
                 if value is not None:  # should None be valid ?
                     setattr(process, pname, value)
+                    completed[pname] = value
             except Exception as e:
                 if verbose:
                     print('Exception:', e)
@@ -481,7 +651,7 @@ class ProcessCompletionEngine(traits.HasTraits):
                     import traceback
                     traceback.print_exc()
                 #pass
-        self.completion_progress = self.completion_progress_total
+        return completed
 
 
     def attributes_to_path(self, parameter, attributes):
@@ -496,6 +666,31 @@ class ProcessCompletionEngine(traits.HasTraits):
             .attributes_to_path(self.process, parameter, attributes)
 
 
+    def attributes_to_paths(self, parameter, attributes, table, size=None):
+        ''' Build paths from several sets of attributes values for a given
+        parameter in a process, see :meth:`PathCompletionEngine.attributes_to_paths`.
+
+        Parameters
+        ----------
+        parameter: str
+        attributes: ProcessAttributes instance (Controller)
+            attributes values common to all rows
+        table: dict
+            {attribute: values list}: one column per varying attribute, each
+            row gives a set of attributes values
+        size: int (optional)
+            number of rows. Default: the length of the table columns
+
+        Returns
+        -------
+        paths: list
+            one path (or None) per row
+        '''
+        return self.get_path_completion_engine() \
+            .attributes_to_paths(self.process, parameter, attributes, table,
+                                 size)
+
+
     def set_parameters(self, process_inputs):
         ''' Set the given parameters dict to the given process.
         process_inputs may include regular parameters of the underlying
@@ -525,7 +720,9 @@ class ProcessCompletionEngine(traits.HasTraits):
     def attributes_changed(self, obj, name, old, new):
         ''' Traits changed callback which triggers parameters update.
 
-        This method basically calls complete_parameters() (after some checks).
+        This method basically calls update_completion() (after some checks),
+        which only completes again the nodes depending on the changed
+        attribute.
 
         Users do not normally have to use it directly, it is used internally
         when install_auto_completion() has been called.
@@ -536,14 +733,15 @@ class ProcessCompletionEngine(traits.HasTraits):
                 and self.completion_ongoing is False:
             #setattr(self.capsul_attributes, name, new)
             self.completion_ongoing = True
-            self.complete_parameters({'capsul_attributes': {name: new}})
+            self.update_completion([name], {'capsul_attributes': {name: new}})
             self.completion_ongoing = False
 
 
     def nodes_selection_changed(self, obj, name, old, new):
         ''' Traits changed callback which triggers parameters update.
 
-        This method basically calls complete_parameters() (after some checks).
+        This method basically calls update_completion() (after some checks),
+        which completes again the switch and the nodes it has enabled.
 
         Users do not normally have to use it directly, it is used internally
         when install_auto_completion() has been called.
@@ -553,7 +751,7 @@ class ProcessCompletionEngine(traits.HasTraits):
         if not self.completion_ongoing:
             self.completion_ongoing = True
             self._rebuild_attributes = True
-            self.complete_parameters()
+            self.update_completion(changed_nodes=[obj])
             self.completion_ongoing = False
 
 
@@ -940,6 +1138,50 @@ class PathCompletionEngine(object):
         '''
         return None
 
+    def attributes_to_paths(self, process, parameter, attributes, table,
+                            size=None):
+        ''' Build paths from several sets of attributes values for a given
+        parameter in a process.
+
+        The table gives one column per varying attribute: row i of the table
+        gives the attributes values used to build the i-th path, other
+        attributes values are taken from the attributes controller. This is
+        used to complete iterations in a single pass.
+
+        The default implementation sets each row values on a copy of the
+        attributes controller and calls :meth:`attributes_to_path`.
+        Subclasses may specialize it to resolve patterns once for all rows.
+
+        Parameters
+        ----------
+        process: Node or Process instance
+        parameter: str
+        attributes: ProcessAttributes instance (Controller)
+        table: dict
+            {attribute: values list}
+        size: int (optional)
+            number of rows. Default: the length of the table columns
+
+        Returns
+        -------
+        paths: list
+            one path (or None) per row
+        '''
+        if size is None:
+            size = max([len(values) for values in table.values()] + [0])
+        if table:
+            attributes = attributes.copy(with_values=True)
+        paths = []
+        for row in range(size):
+            for attribute, values in six.iteritems(table):
+                setattr(attributes, attribute, values[row])
+            try:
+                paths.append(self.attributes_to_path(process, parameter,
+                                                     attributes))
+            except Exception:
+                paths.append(None)
+        return paths
+
     def allowed_formats(self, process, parameter):
         ''' List of possible formats names associated with a parameter
         '''
@@ -182,6 +182,98 @@ class ProcessCompletionEngineIteration(ProcessCompletionEngine):
             psize = 0
         size = max(size, psize)
 
+        self.completion_progress_total = size
+        if self._table_completion_allowed(completion_engine, step_attributes,
+                                          iterated_attributes, size):
+            # iterated parameters can be completed from the whole attributes
+            # table, without completing each step
+            iterative_parameters = self._complete_table(
+                completion_engine, attributes_set, step_attributes,
+                iterated_attributes, parameters, size)
+        else:
+            iterative_parameters = self._complete_steps(
+                completion_engine, attributes_set, step_attributes,
+                iterated_attributes, parameters, size)
+        for parameter, values in six.iteritems(iterative_parameters):
+            try:
+                setattr(process, parameter, values)
+            except Exception as e:
+                print('assign iteration parameter', parameter, ':\n', e,
+                      file=sys.stderr)
+
+
+    def complete_attributes_table(self, table, process_inputs={}):
+        ''' Complete the iteration from a table of iterated attributes values.
+
+        Parameters
+        ----------
+        table: dict
+            {attribute: values list}: columns are iterated attributes (see
+            :meth:`get_iterated_attributes`), and each row gives the
+            attributes values of an iteration step.
+        process_inputs: dict (optional)
+            other parameters and attributes, as in :meth:`complete_parameters`
+        '''
+        attributes_set = self.get_attribute_values()
+        if attributes_set is None:
+            return
+        iterated_attributes = self.get_iterated_attributes()
+        for attribute, values in six.iteritems(table):
+            if attribute not in iterated_attributes:
+                raise KeyError('%s is not an iterated attribute' % attribute)
+            setattr(attributes_set, attribute, list(values))
+        self.complete_parameters(process_inputs)
+
+
+    def _table_completion_allowed(self, completion_engine, step_attributes,
+                                  iterated_attributes, size):
+        ''' Tell if the iteration can be completed from the attributes table
+        in a single pass (see :meth:`_complete_table`), which gives the same
+        results as completing each step.
+
+        This is the case for a simple process, completed by the standard
+        completion engine, when iterated parameters and attributes are not
+        lists.
+        '''
+        from capsul.pipeline.pipeline import Pipeline
+
+        process = self.process
+        if isinstance(process, ProcessNode):
+            process = process.process
+        inner_process = process.process
+        engine_class = completion_engine.__class__
+        if isinstance(inner_process, (Pipeline, ProcessIteration)) \
+                or isinstance(completion_engine,
+                              ProcessCompletionEngineIteration) \
+                or engine_class.complete_parameters \
+                    is not ProcessCompletionEngine.complete_parameters \
+                or engine_class.attributes_to_path \
+                    is not ProcessCompletionEngine.attributes_to_path:
+            return False
+        if any([isinstance(t.trait_type, traits.List)
+                for t in step_attributes.user_traits().values()]):
+            return False
+        attributes_set = self.get_attribute_values()
+        if size != 0 and any([len(getattr(attributes_set, attribute)) == 0
+                              for attribute in iterated_attributes]):
+            return False
+        for parameter in process.iterative_parameters:
+            trait = inner_process.trait(parameter)
+            if trait is None or isinstance(trait.trait_type, traits.List):
+                return False
+        return True
+
+
+    def _complete_steps(self, completion_engine, attributes_set,
+                        step_attributes, iterated_attributes, parameters,
+                        size):
+        ''' Complete each iteration step, and return the iterated parameters
+        values: {parameter: values list}
+        '''
+        process = self.process
+        if isinstance(process, ProcessNode):
+            process = process.process
+
         # complete each step to get iterated parameters.
         # This is generally "too much" but it's difficult to perform a partial
         # completion only on iterated parameters
@@ -189,7 +281,6 @@ class ProcessCompletionEngineIteration(ProcessCompletionEngine):
         iterative_parameters = dict(
             [(key, []) for key in process.iterative_parameters])
 
-        self.completion_progress_total = size
         for it_step in range(size):
             self.capsul_iteration_step = it_step
             for attribute in iterated_attributes:
@@ -207,12 +298,72 @@ class ProcessCompletionEngineIteration(ProcessCompletionEngine):
                 value = getattr(process.process, parameter)
                 iterative_parameters[parameter].append(value)
             self.completion_progress = it_step + 1
-        for parameter, values in six.iteritems(iterative_parameters):
-            try:
-                setattr(process, parameter, values)
-            except Exception as e:
-                print('assign iteration parameter', parameter, ':\n', e,
-                      file=sys.stderr)
+        return iterative_parameters
+
+
+    def _complete_table(self, completion_engine, attributes_set,
+                        step_attributes, iterated_attributes, parameters,
+                        size):
+        ''' Complete the iterated parameters for all steps at once, and
+        return their values: {parameter: values list}
+
+        Paths are built from the whole table of iterated attributes values
+        using :meth:`~capsul.attributes.completion_engine.ProcessCompletionEngine.attributes_to_paths`,
+        once per parameter. Values are the same as those obtained by
+        completing each step (:meth:`_complete_steps`): when a path cannot be
+        built, the input value of the step is used, or the value of the
+        previous step. The last step is completed on the iterated process, so
+        that it is left in the same state.
+        '''
+        process = self.process
+        if isinstance(process, ProcessNode):
+            process = process.process
+        inner_process = process.process
+
+        table = {}
+        for attribute in iterated_attributes:
+            iterated_values = getattr(attributes_set, attribute)
+            last = len(iterated_values) - 1
+            table[attribute] = [iterated_values[min(last, it_step)]
+                                for it_step in range(size)]
+
+        iterative_parameters = {}
+        for parameter in process.iterative_parameters:
+            inputs = None
+            if not process.trait(parameter).forbid_completion:
+                inputs = getattr(process, parameter)
+                if not isinstance(inputs, list):
+                    inputs = None
+            paths = None
+            if size != 0 \
+                    and not inner_process.trait(parameter).forbid_completion \
+                    and not inner_process.is_parameter_protected(parameter) \
+                    and parameter in step_attributes.parameter_attributes:
+                paths = completion_engine.attributes_to_paths(
+                    parameter, step_attributes, table, size)
+            value = getattr(inner_process, parameter)
+            values = []
+            for it_step in range(size):
+                if inputs is not None and len(inputs) > it_step:
+                    value = inputs[it_step]
+                if paths is not None and paths[it_step] is not None:
+                    value = paths[it_step]
+                values.append(value)
+            iterative_parameters[parameter] = values
+
+        if size != 0:
+            # leave the iterated process in the state of the last step
+            it_step = size - 1
+            self.capsul_iteration_step = it_step
+            for attribute, values in six.iteritems(table):
+                setattr(step_attributes, attribute, values[it_step])
+            for parameter in process.iterative_parameters:
+                values = iterative_parameters[parameter]
+                if parameter in parameters or values[it_step] is not None:
+                    parameters[parameter] = values[it_step]
+            completion_engine.complete_parameters(parameters)
+        self.completion_progress = size
+        return iterative_parameters
 
 
     def complete_iteration_step(self, step):
@@ -34,6 +34,7 @@ from capsul.attributes.completion_engine_iteration \
 from capsul.pipeline.process_iteration import ProcessIteration
 from capsul.attributes.attributes_schema import ProcessAttributes, \
     EditableAttributes
+from capsul.engine.module.fom import find_fom_path
 from soma.fom import DirectoryAsDict
 from soma.path import split_path
 from soma.sorted_dictionary import SortedDictionary
@@ -362,6 +363,62 @@ class FomPathCompletionEngine(PathCompletionEngine):
         parameter: str
         attributes: ProcessAttributes instance (Controller)
         '''
+        atp, name = self._parameter_atp(process, parameter)
+        cache = self._paths_cache(process)
+        parameter_attributes = self._discriminant_attributes(
+            atp, name, parameter, attributes, cache)
+        d = dict((i, getattr(attributes, i)) for i in parameter_attributes)
+        return self._find_path(atp, name, parameter, d, cache)
+
+
+    def attributes_to_paths(self, process, parameter, attributes, table,
+                            size=None):
+        ''' Build paths for several sets of attributes values, see
+        :meth:`PathCompletionEngine.attributes_to_paths
+        <capsul.attributes.completion_engine.PathCompletionEngine.attributes_to_paths>`.
+
+        The FOM patterns of the parameter are resolved once, and rows which
+        have the same discriminant attributes values share the same path.
+        '''
+        if size is None:
+            size = max([len(values) for values in table.values()] + [0])
+        atp, name = self._parameter_atp(process, parameter)
+        cache = self._paths_cache(process)
+        parameter_attributes = self._discriminant_attributes(
+            atp, name, parameter, attributes, cache)
+        fixed = dict((i, getattr(attributes, i))
+                     for i in parameter_attributes if i not in table)
+        columns = [(i, table[i]) for i in parameter_attributes if i in table]
+        paths = []
+        known_paths = {}
+        for row in range(size):
+            d = dict(fixed)
+            for attribute, values in columns:
+                d[attribute] = values[row]
+            try:
+                key = tuple(sorted(d.items()))
+                path_value = known_paths.get(key, False)
+            except TypeError:
+                # unhashable attributes values
+                key = None
+                path_value = False
+            if path_value is False:
+                try:
+                    path_value = self._find_path(atp, name, parameter, d,
+                                                 cache)
+                except Exception:
+                    path_value = None
+                if key is not None:
+                    known_paths[key] = path_value
+            paths.append(path_value)
+        return paths
+
+
+    @staticmethod
+    def _parameter_atp(process, parameter):
+        ''' Get the AttributesToPaths object and the FOM process name used to
+        complete a parameter
+        '''
         FomProcessCompletionEngine.setup_fom(process)
 
         input_fom = process.study_config.modules_data.foms['input']
@@ -398,7 +455,24 @@ class FomPathCompletionEngine(PathCompletionEngine):
         else:
             raise KeyError('Process not found in FOMs amongst %s' \
                 % repr(names_search_list))
+        return atp, name
+
+
+    @staticmethod
+    def _paths_cache(process):
+        ''' Paths cache of the FOM engine module
+        (:class:`~capsul.engine.module.fom.FomPathsCache`), or None
+        '''
+        return getattr(process.study_config.modules_data, 'fom_paths_cache',
+                       None)
+
 
+    @staticmethod
+    def _discriminant_attributes(atp, name, parameter, attributes,
+                                 cache=None):
+        ''' Attributes of the attributes controller which are discriminant
+        for the given parameter
+        '''
         allowed_attributes = set(attributes.user_traits().keys())
         allowed_attributes.discard('parameter')
         allowed_attributes.discard('process_name')
@@ -411,25 +485,22 @@ class FomPathCompletionEngine(PathCompletionEngine):
         # Select only the attributes that are discriminant for this
         # parameter otherwise other attibutes can prevent the appropriate
         # rule to match
-        parameter_attributes = atp.find_discriminant_attributes(
-            fom_parameter=parameter, fom_process=name)
-        d = dict((i, getattr(attributes, i)) \
-            for i in parameter_attributes if i in allowed_attributes)
-        d['fom_process'] = name
-        d['fom_parameter'] = parameter
-        d['fom_format'] = 'fom_preferred'
-        path_value = None
-        #path_values = []
-        #debug = getattr(self, 'debug', None)
-        for h in atp.find_paths(d):  # , debug=debug):
-            path_value = h[0]
-            # find_paths() is a generator which can sometimes generate
-            # several values (formats). We are only interested in the
-            # first one.
-            #path_values.append(h[0])
-            break
+        if cache is not None:
+            parameter_attributes = cache.discriminant_attributes(
+                atp, name, parameter)
+        else:
+            parameter_attributes = atp.find_discriminant_attributes(
+                fom_parameter=parameter, fom_process=name)
+        return [i for i in parameter_attributes if i in allowed_attributes]
+
 
-        return path_value
+    @staticmethod
+    def _find_path(atp, name, parameter, d, cache=None):
+        ''' First path matching the discriminant attributes values d
+        '''
+        if cache is not None:
+            return cache.find_path(atp, name, parameter, d)
+        return find_fom_path(atp, name, parameter, d)
 
 
     def open_values_attributes(self, process, parameter):
@@ -44,6 +44,34 @@ class DummyListProcess(Process):
                 '{\n    truc=%s,\n    bidule=%s\n}' % (self.truc, self.bidule))
 
 
+class DummyGroupProcess(Process):
+    truc = File(output=False)
+    result = File(output=True)
+
+    def _run_process(self):
+        with open(self.result, 'w') as f:
+            f.write(self.truc)
+
+
+class DummyChainPipeline(Pipeline):
+    do_autoexport_nodes_parameters = False
+
+    def pipeline_definition(self):
+        self.add_process(
+            'a', 'capsul.attributes.test.test_attributed_process.DummyProcess')
+        self.add_process(
+            'b', 'capsul.attributes.test.test_attributed_process.DummyProcess')
+        self.add_process(
+            'g',
+            'capsul.attributes.test.test_attributed_process.DummyGroupProcess')
+        self.add_link('a.bidule->b.truc')
+        self.add_link('b.bidule->g.truc')
+        self.export_parameter('a', 'truc')
+        self.export_parameter('a', 'f')
+        self.add_link('f->b.f')
+        self.export_parameter('g', 'result')
+
+
 class CustomAttributesSchema(AttributesSchema):
     factory_id = 'custom_ex'
 
@@ -77,6 +105,15 @@ class DummyListProcessAttributes(ProcessAttributes):
         self.set_parameter_attributes('result', 'output', 'Group', {})
 
 
+class DummyGroupProcessAttributes(ProcessAttributes):
+    factory_id = 'DummyGroupProcess'
+
+    def __init__(self, process, schema_dict):
+        super(DummyGroupProcessAttributes, self).__init__(process,
+                                                          schema_dict)
+        self.set_parameter_attributes('result', 'output', 'Group', {})
+
+
 class MyPathCompletion(PathCompletionEngineFactory, PathCompletionEngine):
     factory_id = 'custom_ex'
 
@@ -219,6 +256,97 @@ class TestCompletion(unittest.TestCase):
                              '/tmp/out/DummyProcess_bidule_muppets_stalter',
                              '/tmp/out/DummyProcess_bidule_muppets_waldorf']])
 
+    def test_iteration_table(self):
+        study_config = self.study_config
+        pipeline = study_config.get_iteration_pipeline(
+            'iter',
+            'dummy',
+            'capsul.attributes.test.test_attributed_process.DummyProcess',
+            ['truc', 'bidule'])
+        iter_cm = ProcessCompletionEngine.get_completion_engine(
+            pipeline.nodes['dummy'])
+        subjects = ['kermit', 'piggy', 'stalter', 'waldorf', 'kermit']
+        iter_cm.complete_attributes_table({'center': ['muppets'],
+                                           'subject': subjects})
+        self.assertEqual(
+            [os.path.normpath(p) for p in pipeline.bidule],
+            [os.path.normpath('/tmp/out/DummyProcess_bidule_muppets_%s%s'
+                              % (subject, ''))
+             for subject in subjects])
+        # same results as step by step completion
+        iterated_process = pipeline.nodes['dummy'].process.process
+        for step in range(len(subjects)):
+            iter_cm.complete_iteration_step(step)
+            self.assertEqual(iterated_process.truc, pipeline.truc[step])
+            self.assertEqual(iterated_process.bidule, pipeline.bidule[step])
+        self.assertRaises(KeyError, iter_cm.complete_attributes_table,
+                          {'group': ['cartoon']})
+
+    def test_incremental_completion(self):
+        study_config = self.study_config
+        pipeline = study_config.get_process_instance(DummyChainPipeline)
+        ref_pipeline = study_config.get_process_instance(DummyChainPipeline)
+        cm = ProcessCompletionEngine.get_completion_engine(pipeline)
+        ref_cm = ProcessCompletionEngine.get_completion_engine(ref_pipeline)
+
+        def parameters(pipeline):
+            return dict((node_name, node.process.export_to_dict())
+                        for node_name, node in pipeline.nodes.items()
+                        if node_name != '')
+
+        for engine in (cm, ref_cm):
+            atts = engine.get_attribute_values()
+            atts.center = 'muppets'
+            atts.subject = 'kermit'
+            atts.group = 'frogs'
+            engine.complete_parameters()
+        self.assertEqual(pipeline.nodes['g'].process.result,
+                         '/tmp/out/DummyChainPipeline_result_frogs')
+
+        paths = []
+        attributes_to_path = MyPathCompletion.attributes_to_path
+
+        def counting_attributes_to_path(self, process, parameter, attributes):
+            paths.append((process.name, parameter))
+            return attributes_to_path(self, process, parameter, attributes)
+
+        MyPathCompletion.attributes_to_path = counting_attributes_to_path
+        try:
+            # only the node depending on group is completed again
+            for engine in (cm, ref_cm):
+                engine.get_attribute_values().group = 'pigs'
+            cm.update_completion(['group'])
+            self.assertTrue(('DummyGroupProcess', 'result') in paths)
+            self.assertFalse([p for p in paths if p[0] == 'DummyProcess'])
+            ref_cm.complete_parameters()
+            self.assertEqual(parameters(pipeline), parameters(ref_pipeline))
+            self.assertEqual(pipeline.nodes['g'].process.result,
+                             '/tmp/out/DummyChainPipeline_result_pigs')
+
+            # values propagated from completed nodes are overwritten as in a
+            # full completion
+            del paths[:]
+            for engine in (cm, ref_cm):
+                engine.get_attribute_values().subject = 'piggy'
+            cm.update_completion(['subject'])
+            self.assertFalse([p for p in paths
+                              if p[0] == 'DummyGroupProcess'])
+            ref_cm.complete_parameters()
+            self.assertEqual(parameters(pipeline), parameters(ref_pipeline))
+            self.assertEqual(pipeline.nodes['b'].process.truc,
+                             '/tmp/in/DummyProcess_truc_muppets_piggy')
+
+            # auto-completion is incremental
+            del paths[:]
+            cm.install_auto_completion()
+            cm.get_attribute_values().group = 'frogs'
+            cm.remove_auto_completion()
+            self.assertFalse([p for p in paths if p[0] == 'DummyProcess'])
+            self.assertEqual(pipeline.nodes['g'].process.result,
+                             '/tmp/out/DummyChainPipeline_result_frogs')
+        finally:
+            MyPathCompletion.attributes_to_path = attributes_to_path
+
     def test_list_completion(self):
         study_config = self.study_config
         process = study_config.get_process_instance(
@@ -149,6 +149,39 @@ class TestCompletion(unittest.TestCase):
                          os.path.normpath('/tmp/out/DummyProcess_bidule_jojo_barbapapa.txt'))
 
 
+    def test_paths_cache(self):
+        study_config = self.study_config
+        process = study_config.get_process_instance(
+            'capsul.attributes.test.test_attributed_process.DummyProcess')
+        patt = ProcessCompletionEngine.get_completion_engine(process)
+        atts = patt.get_attribute_values()
+        atts.center = 'jojo'
+        atts.subject = 'barbapapa'
+        patt.complete_parameters()
+        cache = study_config.modules_data.fom_paths_cache
+        stats = cache.stats()
+        self.assertTrue(stats['misses'] >= 2)
+        patt.complete_parameters()
+        # paths are not built again
+        self.assertEqual(cache.stats()['misses'], stats['misses'])
+        self.assertTrue(cache.stats()['hits'] >= stats['hits'] + 2)
+        self.assertTrue(cache.stats()['hit_rate'] > 0.)
+
+        # changing the FOM configuration drops cached paths
+        study_config.input_directory = '/tmp/in2'
+        self.assertTrue(
+            cache.stats()['invalidations'] > stats['invalidations'])
+        self.assertEqual(cache.stats()['size'], 0)
+        patt.complete_parameters()
+        self.assertEqual(os.path.normpath(process.truc),
+                         os.path.normpath(
+                            '/tmp/in2/DummyProcess_truc_jojo_barbapapa.txt'))
+
+        cache.clear()
+        cache.max_size = 1
+        patt.complete_parameters()
+        self.assertEqual(cache.stats()['size'], 1)
+
     def test_iteration(self):
         study_config = self.study_config
         pipeline = study_config.get_iteration_pipeline(
@@ -175,6 +208,32 @@ class TestCompletion(unittest.TestCase):
                 '/tmp/out/DummyProcess_bidule_muppets_stalter.txt',
                 '/tmp/out/DummyProcess_bidule_muppets_waldorf.txt']])
 
+    def test_iteration_table(self):
+        study_config = self.study_config
+        pipeline = study_config.get_iteration_pipeline(
+            'iter',
+            'dummy',
+            'capsul.attributes.test.test_attributed_process.DummyProcess',
+            ['truc', 'bidule'])
+        iter_cm = ProcessCompletionEngine.get_completion_engine(
+            pipeline.nodes['dummy'])
+        subjects = ['kermit', 'piggy', 'stalter', 'waldorf', 'kermit']
+        iter_cm.complete_attributes_table({'center': ['muppets'],
+                                           'subject': subjects})
+        self.assertEqual(
+            [os.path.normpath(p) for p in pipeline.bidule],
+            [os.path.normpath('/tmp/out/DummyProcess_bidule_muppets_%s%s'
+                              % (subject, '.txt'))
+             for subject in subjects])
+        # same results as step by step completion
+        iterated_process = pipeline.nodes['dummy'].process.process
+        for step in range(len(subjects)):
+            iter_cm.complete_iteration_step(step)
+            self.assertEqual(iterated_process.truc, pipeline.truc[step])
+            self.assertEqual(iterated_process.bidule, pipeline.bidule[step])
+        self.assertRaises(KeyError, iter_cm.complete_attributes_table,
+                          {'group': ['cartoon']})
+
     def test_list_completion(self):
         study_config = self.study_config
         process = study_config.get_process_instance(
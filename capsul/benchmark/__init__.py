@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+'''
+Performance benchmarks of CAPSUL, run on synthetic pipelines.
+
+Benchmarks are written in the `asv <https://asv.readthedocs.io>`_ style:
+classes which methods named ``time_*`` are timed, after a call to their
+``setup()`` method, for each value of their ``params`` attribute. They are
+grouped in the ``bench_*`` modules of this package, and use the synthetic
+pipelines of :mod:`capsul.benchmark.synthetic`.
+
+They can be run without asv, and offline, using
+:mod:`capsul.benchmark.runner`::
+
+    python -m capsul.benchmark [pattern]
+'''
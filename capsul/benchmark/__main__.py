@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+
+# run benchmarks with 'python -m capsul.benchmark'
+
+from __future__ import absolute_import
+import sys
+from capsul.benchmark import runner
+
+sys.exit(runner.main())
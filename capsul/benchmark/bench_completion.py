@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+'''
+Benchmarks of parameters completion.
+
+Classes
+=======
+:class:`CompletionSuite`
+------------------------
+:class:`IterationCompletionSuite`
+---------------------------------
+'''
+
+# System import
+from __future__ import absolute_import
+
+# Capsul import
+from capsul.study_config.study_config import StudyConfig
+from capsul.attributes.completion_engine import ProcessCompletionEngine
+from capsul.benchmark.synthetic import layered_pipeline
+
+
+class CompletionSuite(object):
+    """ Time complete_parameters() on pipelines, using the builtin
+    completion engines.
+    """
+    params = [(10, 10, 0), (20, 20, 0)]
+    param_names = ['width, depth, iteration_size']
+    number = 1
+    timeout = 300
+
+    def setup(self, shape):
+        self.study_config = StudyConfig(modules=['AttributesConfig'])
+        self.pipeline = layered_pipeline(*shape,
+                                         study_config=self.study_config)
+        self.completion_engine \
+            = ProcessCompletionEngine.get_completion_engine(self.pipeline)
+
+    def time_complete_parameters(self, shape):
+        self.completion_engine.complete_parameters()
+
+
+class IterationCompletionSuite(object):
+    """ Time complete_parameters() on an iterative node.
+    """
+    params = [(1, 1, 100), (1, 1, 500)]
+    param_names = ['width, depth, iteration_size']
+    number = 1
+    timeout = 300
+
+    def setup(self, shape):
+        self.study_config = StudyConfig(modules=['AttributesConfig'])
+        self.pipeline = layered_pipeline(*shape,
+                                         study_config=self.study_config)
+        self.completion_engine \
+            = ProcessCompletionEngine.get_completion_engine(
+                self.pipeline.nodes['iter'].process)
+
+    def time_complete_parameters(self, shape):
+        self.completion_engine.complete_parameters()
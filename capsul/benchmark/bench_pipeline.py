@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+'''
+Benchmarks of pipelines construction and nodes activation.
+
+Classes
+=======
+:class:`PipelineConstructionSuite`
+----------------------------------
+:class:`RepeatedConstructionSuite`
+----------------------------------
+:class:`AddLinkSuite`
+---------------------
+:class:`ActivationSuite`
+------------------------
+:class:`ValuePropagationSuite`
+------------------------------
+'''
+
+# System import
+from __future__ import absolute_import
+
+# Capsul import
+from capsul.api import Pipeline
+from capsul.benchmark.synthetic import (layered_pipeline_class,
+                                        layered_pipeline, add_layered_nodes,
+                                        add_layered_links)
+
+# Trait import
+from traits.api import Undefined
+
+
+class PipelineConstructionSuite(object):
+    """ Time the instantiation of pipeline classes.
+    """
+    params = [(10, 10, 0), (25, 40, 0), (1, 1, 500)]
+    param_names = ['width, depth, iteration_size']
+    number = 1
+    timeout = 300
+
+    def setup(self, shape):
+        self.pipeline_class = layered_pipeline_class(*shape)
+
+    def time_instantiation(self, shape):
+        self.pipeline_class()
+
+
+class RepeatedConstructionSuite(object):
+    """ Time the instantiation of many pipelines of the same class, as done
+    by iterations or GUI reloads.
+    """
+    params = [(10, 10, 0)]
+    param_names = ['width, depth, iteration_size']
+    number = 1
+    timeout = 300
+    instances = 20
+
+    def setup(self, shape):
+        self.pipeline_class = layered_pipeline_class(*shape)
+
+    def time_repeated_instantiation(self, shape):
+        for i in range(self.instances):
+            self.pipeline_class()
+
+
+class AddLinkSuite(object):
+    """ Time links creation in a built pipeline: nodes activations are
+    updated after each link.
+    """
+    params = [(5, 10, 0), (10, 10, 0)]
+    param_names = ['width, depth, iteration_size']
+    number = 1
+    timeout = 300
+
+    def setup(self, shape):
+        self.pipeline = Pipeline()
+        add_layered_nodes(self.pipeline, shape[0], shape[1])
+
+    def time_add_link(self, shape):
+        add_layered_links(self.pipeline, shape[0], shape[1])
+
+
+class ActivationSuite(object):
+    """ Time full and incremental nodes activations updates.
+    """
+    params = [(10, 10, 0), (25, 40, 0)]
+    param_names = ['width, depth, iteration_size']
+    number = 1
+    timeout = 300
+
+    def setup(self, shape):
+        self.pipeline = layered_pipeline(*shape)
+
+    def time_update_activation(self, shape):
+        self.pipeline.update_nodes_and_plugs_activation()
+
+    def time_node_enabled(self, shape):
+        # disable then enable a node in the middle of the pipeline
+        node = self.pipeline.nodes['n_%d_%d' % (shape[1] // 2, shape[0] // 2)]
+        node.enabled = False
+        node.enabled = True
+
+
+class ValuePropagationSuite(object):
+    """ Time the propagation of values through links: a value is set to the
+    output of each internal node, then reset, as done with temporary files
+    names when a pipeline is converted into a workflow.
+    """
+    params = [(10, 10, 0), (25, 40, 0)]
+    param_names = ['width, depth, iteration_size']
+    number = 1
+    timeout = 300
+
+    def setup(self, shape):
+        self.pipeline = layered_pipeline(*shape)
+        self.processes = [
+            self.pipeline.nodes['n_%d_%d' % (layer, i)].process
+            for layer in range(shape[1] - 1) for i in range(shape[0])]
+
+    def time_propagate_values(self, shape):
+        for i, process in enumerate(self.processes):
+            process.output = '/tmp/temporary_%d' % i
+        for process in self.processes:
+            process.output = Undefined
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+'''
+Benchmark of the conversion of pipelines into soma-workflow workflows.
+
+Classes
+=======
+:class:`WorkflowFromPipelineSuite`
+----------------------------------
+'''
+
+# System import
+from __future__ import absolute_import
+
+# Capsul import
+from capsul.study_config.study_config import StudyConfig
+from capsul.pipeline.pipeline_workflow import workflow_from_pipeline
+from capsul.benchmark.synthetic import layered_pipeline
+
+
+class WorkflowFromPipelineSuite(object):
+    """ Time workflow_from_pipeline() on layered pipelines of 100 and 1000
+    nodes, and on an iterative node.
+
+    About half of the conversion time of layered pipelines is spent setting
+    temporary files names on nodes outputs, and resetting them: this part
+    is timed separately by
+    :class:`~capsul.benchmark.bench_pipeline.ValuePropagationSuite`.
+    """
+    params = [(10, 10, 0), (25, 40, 0), (1, 1, 500)]
+    param_names = ['width, depth, iteration_size']
+    number = 1
+    timeout = 300
+
+    def setup(self, shape):
+        self.study_config = StudyConfig(modules=[])
+        self.pipeline = layered_pipeline(*shape,
+                                         study_config=self.study_config)
+        # engine settings are initialized by the first conversion
+        workflow_from_pipeline(self.pipeline, check_requirements=False)
+
+    def time_workflow_from_pipeline(self, shape):
+        workflow_from_pipeline(self.pipeline, check_requirements=False)
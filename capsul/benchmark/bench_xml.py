@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+'''
+Benchmarks of pipelines XML IO.
+
+Classes
+=======
+:class:`XmlPipelineSuite`
+-------------------------
+'''
+
+# System import
+from __future__ import absolute_import
+import os
+import shutil
+import tempfile
+
+# Capsul import
+from capsul.pipeline.xml import save_xml_pipeline, create_xml_pipeline
+from capsul.benchmark.synthetic import layered_pipeline
+
+
+class XmlPipelineSuite(object):
+    """ Time save_xml_pipeline() and create_xml_pipeline() on layered
+    pipelines.
+    """
+    params = [(10, 10, 0), (25, 40, 0)]
+    param_names = ['width, depth, iteration_size']
+    number = 1
+    timeout = 300
+
+    def setup(self, shape):
+        self.tmp_dir = tempfile.mkdtemp(prefix='capsul_bench_')
+        self.pipeline = layered_pipeline(*shape)
+        self.xml_file = os.path.join(self.tmp_dir, 'pipeline.xml')
+        save_xml_pipeline(self.pipeline, self.xml_file)
+        self.pipeline_class = create_xml_pipeline(
+            'capsul.benchmark.synthetic', None, self.xml_file)
+
+    def teardown(self, shape):
+        shutil.rmtree(self.tmp_dir)
+
+    def time_save_xml_pipeline(self, shape):
+        save_xml_pipeline(self.pipeline,
+                          os.path.join(self.tmp_dir, 'saved.xml'))
+
+    def time_create_xml_pipeline(self, shape):
+        create_xml_pipeline('capsul.benchmark.synthetic', None,
+                            self.xml_file)
+
+    def time_xml_pipeline_instantiation(self, shape):
+        self.pipeline_class()
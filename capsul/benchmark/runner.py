@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+'''
+Run benchmarks without asv, store and compare their results.
+
+Benchmarks are the ``time_*`` methods of the classes of the
+``capsul.benchmark.bench_*`` modules, called for each value of the ``params``
+class attribute (if any). Each benchmark is run ``repeat`` times, after a call
+to the ``setup()`` method of a new instance of its class, and the best time
+is kept.
+
+Results are stored in JSON files. A baseline, ``baseline.json``, is shipped
+in this package: timings depend on the machine, so a new baseline should be
+saved before comparing results on another machine::
+
+    python -m capsul.benchmark --save my_baseline.json
+    # ... later
+    python -m capsul.benchmark --compare my_baseline.json
+
+Functions
+=========
+:func:`find_benchmarks`
+-----------------------
+:func:`run_benchmarks`
+----------------------
+:func:`save_results`
+--------------------
+:func:`load_results`
+--------------------
+:func:`compare_results`
+-----------------------
+:func:`main`
+------------
+'''
+
+# System import
+from __future__ import absolute_import
+from __future__ import print_function
+import os
+import sys
+import gc
+import re
+import json
+import time
+import platform
+import importlib
+import pkgutil
+from optparse import OptionParser
+
+import capsul.benchmark
+
+#: default baseline results file
+baseline_file = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+
+def _param_string(param):
+    if isinstance(param, tuple):
+        return ', '.join(str(p) for p in param)
+    return str(param)
+
+
+def find_benchmarks(pattern=None):
+    """ List the benchmarks of the capsul.benchmark package
+
+    Parameters
+    ----------
+    pattern: str (optional)
+        regular expression: only benchmarks which names match it are listed.
+
+    Returns
+    -------
+    benchmarks: list
+        [(name, suite_class, method_name, param), ...]. The benchmark name is
+        ``<module>.<class>.<method>(<param>)``, param is None for
+        benchmarks without parameters.
+    """
+    benchmarks = []
+    for module_info in pkgutil.iter_modules(capsul.benchmark.__path__):
+        module_name = module_info[1]
+        if not module_name.startswith('bench_'):
+            continue
+        module = importlib.import_module('capsul.benchmark.%s' % module_name)
+        for class_name in sorted(dir(module)):
+            suite = getattr(module, class_name)
+            if not isinstance(suite, type) \
+                    or suite.__module__ != module.__name__:
+                continue
+            params = getattr(suite, 'params', [None])
+            for method_name in sorted(dir(suite)):
+                if not method_name.startswith('time_'):
+                    continue
+                for param in params:
+                    name = '%s.%s.%s' % (module_name, class_name,
+                                         method_name)
+                    if param is not None:
+                        name += '(%s)' % _param_string(param)
+                    if pattern and not re.search(pattern, name):
+                        continue
+                    benchmarks.append((name, suite, method_name, param))
+    return benchmarks
+
+
+def run_benchmark(suite, method_name, param=None, repeat=3):
+    """ Run a benchmark, and return the best time of repeat runs, in seconds
+    """
+    args = ()
+    if param is not None:
+        args = (param, )
+    times = []
+    for i in range(repeat):
+        instance = suite()
+        if hasattr(instance, 'setup'):
+            instance.setup(*args)
+        method = getattr(instance, method_name)
+        gc.collect()
+        t0 = time.time()
+        method(*args)
+        times.append(time.time() - t0)
+        if hasattr(instance, 'teardown'):
+            instance.teardown(*args)
+    return min(times)
+
+
+def run_benchmarks(pattern=None, repeat=3, verbose=True):
+    """ Run benchmarks
+
+    Parameters
+    ----------
+    pattern: str (optional)
+        regular expression selecting the benchmarks to run, see
+        :func:`find_benchmarks`
+    repeat: int (optional)
+        number of runs of each benchmark
+    verbose: bool (optional)
+        print each benchmark time
+
+    Returns
+    -------
+    results: dict
+        {benchmark_name: best_time}
+    """
+    results = {}
+    for name, suite, method_name, param in find_benchmarks(pattern):
+        results[name] = run_benchmark(suite, method_name, param,
+                                      repeat=repeat)
+        if verbose:
+            print('%-80s %9.4fs' % (name, results[name]))
+            sys.stdout.flush()
+    return results
+
+
+def save_results(results, filename):
+    """ Save benchmarks results in a JSON file, with the machine description
+    """
+    data = {
+        'machine': platform.node(),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'results': results,
+    }
+    with open(filename, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+
+def load_results(filename):
+    """ Load benchmarks results saved by :func:`save_results`
+
+    Returns
+    -------
+    results: dict
+        {benchmark_name: time}
+    """
+    with open(filename) as f:
+        return json.load(f)['results']
+
+
+def compare_results(results, baseline, threshold=1.5):
+    """ Compare benchmarks results with baseline ones
+
+    Parameters
+    ----------
+    results: dict
+        {benchmark_name: time}
+    baseline: dict
+        {benchmark_name: time}
+    threshold: float (optional)
+        a benchmark is a regression if its time is more than threshold times
+        its baseline time.
+
+    Returns
+    -------
+    comparison: list
+        [(name, time, baseline_time, ratio, regression), ...] for benchmarks
+        which are both in results and baseline.
+    """
+    comparison = []
+    for name in sorted(results):
+        if name not in baseline:
+            continue
+        time_value = results[name]
+        baseline_time = baseline[name]
+        ratio = time_value / baseline_time if baseline_time else 1.
+        comparison.append((name, time_value, baseline_time, ratio,
+                           ratio > threshold))
+    return comparison
+
+
+def main(argv=None):
+    """ Command line entry point: ``python -m capsul.benchmark``
+
+    Returns
+    -------
+    status: int
+        1 if a regression has been found compared to a baseline, else 0
+    """
+    parser = OptionParser(
+        usage='python -m capsul.benchmark [options] [pattern]',
+        description='Run CAPSUL benchmarks. If a pattern (regular '
+        'expression) is given, only the matching benchmarks are run.')
+    parser.add_option('-r', '--repeat', dest='repeat', type='int', default=3,
+                      help='number of runs of each benchmark (the best time '
+                      'is kept), default: %default')
+    parser.add_option('-s', '--save', dest='save', default=None,
+                      help='save results in this JSON file')
+    parser.add_option('-c', '--compare', dest='compare', default=None,
+                      help='compare results with this baseline JSON file '
+                      '("default" for the baseline shipped in capsul)')
+    parser.add_option('-t', '--threshold', dest='threshold', type='float',
+                      default=1.5, help='time ratio above which a '
+                      'benchmark is a regression, default: %default')
+    parser.add_option('-l', '--list', dest='list', action='store_true',
+                      help='list benchmarks, do not run them')
+    options, args = parser.parse_args(argv)
+    pattern = args[0] if args else None
+
+    if options.list:
+        for benchmark in find_benchmarks(pattern):
+            print(benchmark[0])
+        return 0
+
+    results = run_benchmarks(pattern, repeat=options.repeat)
+    if options.save:
+        save_results(results, options.save)
+    status = 0
+    if options.compare:
+        compare = options.compare
+        if compare == 'default':
+            compare = baseline_file
+        comparison = compare_results(results, load_results(compare),
+                                     options.threshold)
+        print()
+        for name, time_value, baseline_time, ratio, regression \
+                in comparison:
+            print('%-80s %7.2fx%s' % (name, ratio,
+                                      ' REGRESSION' if regression else ''))
+            if regression:
+                status = 1
+    return status
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+'''
+Synthetic pipelines generators, used by benchmarks and tests.
+
+Classes
+=======
+:class:`SyntheticProcess`
+-------------------------
+:class:`LayeredPipeline`
+------------------------
+
+Functions
+=========
+:func:`add_layered_nodes`
+-------------------------
+:func:`add_layered_links`
+-------------------------
+:func:`layered_pipeline_class`
+------------------------------
+:func:`layered_pipeline`
+------------------------
+'''
+
+# System import
+from __future__ import absolute_import
+
+# Capsul import
+from capsul.api import Process, Pipeline
+
+# Trait import
+from traits.api import File
+
+
+class SyntheticProcess(Process):
+    """ A process with two input files and an output file, which does
+    nothing.
+    """
+    input = File(optional=True)
+    input2 = File(optional=True)
+    output = File(output=True, optional=True)
+
+    def _run_process(self):
+        pass
+
+
+class LayeredPipeline(Pipeline):
+    """ A pipeline of width x depth process nodes, and an optional iterative
+    node.
+
+    Nodes are organized in depth layers of width nodes. The node i of a layer
+    gets its inputs from the outputs of the nodes i and i + 1 of the previous
+    layer. Inputs of the first layer and outputs of the last one are exported,
+    other outputs are temporary files.
+
+    Nodes are named ``n_<layer>_<i>``, exported parameters ``input_<i>`` and
+    ``output_<i>``.
+
+    If iteration_size is not 0, an iterative node ``iter`` iterates a
+    :class:`SyntheticProcess` on the ``iter_input`` and ``iter_output`` lists
+    parameters, initialized with iteration_size files names.
+
+    The shape is given by the class attributes width, depth and
+    iteration_size: use :func:`layered_pipeline_class` to get a pipeline
+    class of a given shape.
+    """
+    do_autoexport_nodes_parameters = False
+    width = 10
+    depth = 10
+    iteration_size = 0
+
+    def pipeline_definition(self):
+        add_layered_nodes(self, self.width, self.depth)
+        add_layered_links(self, self.width, self.depth)
+        if self.iteration_size:
+            self.add_iterative_process(
+                'iter', 'capsul.benchmark.synthetic.SyntheticProcess',
+                iterative_plugs=['input', 'output'])
+            self.export_parameter('iter', 'input', 'iter_input')
+            self.export_parameter('iter', 'output', 'iter_output')
+            self.iter_input = ['/tmp/iter_input_%d.nii' % i
+                               for i in range(self.iteration_size)]
+            self.iter_output = ['/tmp/iter_output_%d.nii' % i
+                                for i in range(self.iteration_size)]
+
+
+def add_layered_nodes(pipeline, width, depth):
+    """ Add the process nodes of a layered pipeline (see
+    :class:`LayeredPipeline`), without links
+    """
+    for layer in range(depth):
+        for i in range(width):
+            pipeline.add_process(
+                'n_%d_%d' % (layer, i),
+                'capsul.benchmark.synthetic.SyntheticProcess')
+
+
+def add_layered_links(pipeline, width, depth):
+    """ Link the nodes added by :func:`add_layered_nodes`, and export the
+    inputs of the first layer and the outputs of the last one
+    """
+    for layer in range(depth):
+        for i in range(width):
+            node_name = 'n_%d_%d' % (layer, i)
+            if layer == 0:
+                pipeline.export_parameter(node_name, 'input', 'input_%d' % i)
+            else:
+                pipeline.add_link('n_%d_%d.output->%s.input'
+                                  % (layer - 1, i, node_name))
+                pipeline.add_link('n_%d_%d.output->%s.input2'
+                                  % (layer - 1, (i + 1) % width, node_name))
+    if depth != 0:
+        for i in range(width):
+            pipeline.export_parameter('n_%d_%d' % (depth - 1, i), 'output',
+                                      'output_%d' % i)
+
+
+def layered_pipeline_class(width=10, depth=10, iteration_size=0):
+    """ Get a :class:`LayeredPipeline` subclass of the given shape
+
+    Parameters
+    ----------
+    width: int
+        number of nodes in each layer
+    depth: int
+        number of layers
+    iteration_size: int
+        number of iterations of the iterative node (0: no iterative node)
+
+    Returns
+    -------
+    pipeline_class: LayeredPipeline subclass
+    """
+    name = 'LayeredPipeline_%d_%d_%d' % (width, depth, iteration_size)
+    return type(name, (LayeredPipeline, ),
+                {'width': width, 'depth': depth,
+                 'iteration_size': iteration_size,
+                 '__module__': __name__})
+
+
+def layered_pipeline(width=10, depth=10, iteration_size=0, study_config=None):
+    """ Build a :class:`LayeredPipeline` of the given shape
+
+    Parameters
+    ----------
+    width: int
+        number of nodes in each layer
+    depth: int
+        number of layers
+    iteration_size: int
+        number of iterations of the iterative node (0: no iterative node)
+    study_config: StudyConfig (optional)
+        the pipeline is attached to this study config
+
+    Returns
+    -------
+    pipeline: LayeredPipeline
+    """
+    pipeline = layered_pipeline_class(width, depth, iteration_size)()
+    if study_config is not None:
+        pipeline.set_study_config(study_config)
+    return pipeline
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+# System import
+from __future__ import absolute_import
+from __future__ import print_function
+import unittest
+import tempfile
+import shutil
+import os
+
+# Capsul import
+from capsul.benchmark import runner
+from capsul.benchmark.synthetic import (layered_pipeline,
+                                        layered_pipeline_class)
+
+
+class TestBenchmark(unittest.TestCase):
+    """ Synthetic pipelines and benchmarks runner
+    """
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_layered_pipeline(self):
+        pipeline = layered_pipeline(3, 4)
+        self.assertEqual(len(pipeline.nodes), 13)
+        plug = pipeline.nodes['n_2_1'].plugs['input2']
+        self.assertEqual([(link[0], link[1]) for link in plug.links_from],
+                         [('n_1_2', 'output')])
+        self.assertEqual(
+            sorted(name for name in pipeline.user_traits()
+                   if name.startswith('output_')),
+            ['output_0', 'output_1', 'output_2'])
+        self.assertTrue(all(node.activated
+                            for node in pipeline.nodes.values()))
+
+        pipeline_class = layered_pipeline_class(1, 2, 5)
+        self.assertTrue(layered_pipeline_class(1, 2, 5) is not pipeline_class)
+        pipeline = pipeline_class()
+        self.assertEqual(len(pipeline.iter_input), 5)
+        self.assertEqual(len(pipeline.nodes['iter'].process.output), 5)
+
+    def test_runner(self):
+        benchmarks = runner.find_benchmarks(r'workflow_from_pipeline\(10,')
+        self.assertEqual([b[0] for b in benchmarks],
+                         ['bench_workflow.WorkflowFromPipelineSuite.'
+                          'time_workflow_from_pipeline(10, 10, 0)'])
+        all_benchmarks = [b[0] for b in runner.find_benchmarks()]
+        for name in ('instantiation', 'repeated_instantiation', 'add_link',
+                     'update_activation', 'propagate_values',
+                     'workflow_from_pipeline', 'complete_parameters',
+                     'save_xml_pipeline', 'create_xml_pipeline'):
+            self.assertTrue([b for b in all_benchmarks if name in b], name)
+
+        results = runner.run_benchmarks(r'workflow_from_pipeline\(10,',
+                                        repeat=1, verbose=False)
+        self.assertEqual(list(results), [benchmarks[0][0]])
+        results_file = os.path.join(self.tmp_dir, 'results.json')
+        runner.save_results(results, results_file)
+        self.assertEqual(runner.load_results(results_file), results)
+
+        baseline = dict((name, value / 2.) for name, value in results.items())
+        comparison = runner.compare_results(results, baseline, threshold=1.5)
+        self.assertEqual(len(comparison), 1)
+        self.assertTrue(comparison[0][4])
+        comparison = runner.compare_results(results, baseline, threshold=3.)
+        self.assertFalse(comparison[0][4])
+        self.assertEqual(runner.compare_results(results, {}), [])
+
+    def test_baseline(self):
+        baseline = runner.load_results(runner.baseline_file)
+        self.assertEqual(sorted(baseline),
+                         sorted(b[0] for b in runner.find_benchmarks()))
+
+
+def test():
+    """ Function to execute unitest
+    """
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestBenchmark)
+    runtime = unittest.TextTestRunner(verbosity=2).run(suite)
+    return runtime.wasSuccessful()
+
+
+if __name__ == "__main__":
+    print("RETURNCODE: ", test())
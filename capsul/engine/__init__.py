@@ -40,6 +40,7 @@ from soma.utils.weak_proxy import get_ref
 
 from .database_json import JSONDBEngine
 from .database_populse import PopulseDBEngine
+from .database_sqlite import SQLiteDBEngine
 
 from .settings import Settings
 from .module import default_modules
@@ -302,7 +303,7 @@ class CapsulEngine(Controller):
         return self.database.named_directory(name)
 
     def named_directories(self):
-        return self.database.set_named_directories()
+        return self.database.named_directories()
 
     def set_json_value(self, name, json_value):
         return self.database.set_json_value(name, json_value)
@@ -314,7 +315,17 @@ class CapsulEngine(Controller):
         return self.database.set_path_metadata(path, metadata, named_directory)
 
     def path_metadata(self, path, named_directory=None):
-        return self.database.set_path_metadata(path, named_directory)
+        return self.database.path_metadata(path, named_directory)
+
+    def set_paths_metadata(self, paths_metadata, named_directory=None):
+        return self.database.set_paths_metadata(paths_metadata,
+                                                named_directory)
+
+    def paths_metadata(self, paths, named_directory=None):
+        return self.database.paths_metadata(paths, named_directory)
+
+    def query_metadata(self, filter=None, named_directory=None):
+        return self.database.query_metadata(filter, named_directory)
 
     def import_configs(self, environment, config_dict):
         '''
@@ -385,18 +396,16 @@ class CapsulEngine(Controller):
         the process execution and can be used to get the status of the
         execution or wait for its termination.
 
-        TODO:
-        if history is True, an entry of the process execution is stored in
-        the database. The content of this entry is to be defined but it will
-        contain the process parameters (to restart the process) and will be
-        updated on process termination (for instance to store execution time
-        if possible).
+        If history is True, an entry of the process execution is stored in
+        the database. It contains the process parameters (to restart the
+        process) and is updated on process termination by :meth:`wait`
+        (status, jobs execution times, output paths). See :meth:`history`.
 
         Parameters
         ----------
         process: Process or Pipeline instance
         history: bool (optional)
-            TODO: not implemented yet.
+            record the execution in the database history.
         get_pipeline: bool (optional)
             if True, start() will return a tuple (execution_id, pipeline). The
             pipeline is normally the input pipeline (process) if it is actually
@@ -493,6 +502,66 @@ class CapsulEngine(Controller):
         '''
         run.raise_for_status(self, status, execution_id)
 
+    def history(self, process=None, status=None, since=None, until=None,
+                parameters=None, limit=None):
+        '''
+        Query the executions history stored in the database by :meth:`start`.
+
+        Parameters
+        ----------
+        process: str, Process, or list of them (optional)
+            processes (or processes identifiers)
+        status: str or list (optional)
+            execution status: "running", "done" or "failed"
+        since: float or datetime (optional)
+            executions started after this date
+        until: float or datetime (optional)
+            executions started before this date
+        parameters: dict (optional)
+            executions whose given parameters have the given values
+        limit: int (optional)
+            maximum number of returned records
+
+        Returns
+        -------
+        executions: list of dict
+            execution records, the most recent first. See
+            :meth:`capsul.engine.database.DatabaseEngine.set_execution`.
+        '''
+        if process is not None:
+            if not isinstance(process, (list, tuple)):
+                process = [process]
+            process = [getattr(p, 'id', p) for p in process]
+        return self.database.executions(
+            process=process, status=status, since=since, until=until,
+            parameters=parameters, limit=limit)
+
+    def history_entry(self, execution_id):
+        '''
+        Get an execution record from the history, or None. execution_id is
+        either the history entry identifier, or the soma-workflow id of an
+        execution in the connected computing resource (its most recent
+        record is then returned).
+        '''
+        execution = self.database.execution(execution_id)
+        if execution is None:
+            execution = run._history_execution(self, execution_id)
+        return execution
+
+    def expected_duration(self, process, limit=20):
+        '''
+        Mean duration of the last successful executions of a process (or
+        process identifier) in the history, or None if it has never been
+        run.
+        '''
+        durations = [execution['duration']
+                     for execution in self.history(process, status='done',
+                                                   limit=limit)
+                     if execution.get('duration') is not None]
+        if not durations:
+            return None
+        return sum(durations) / len(durations)
+
 
 _populsedb_url_re = re.compile(r'^\w+(\+\w+)?://(.*)')
 
@@ -502,6 +571,11 @@ def database_factory(database_location):
     Create a DatabaseEngine from its location string. This location can be
     either a sqlite file path (ending with '.sqlite' or ':memory:' for an 
     in memory database for testing) or a populse_db URL, or None.
+
+    A sqlite file path prefixed with 'sqlite3:' (for instance
+    'sqlite3:/home/me/capsul.sqlite' or 'sqlite3::memory:') selects the
+    :class:`~capsul.engine.database_sqlite.SQLiteDBEngine` backend, which is
+    suited to large amounts of path metadata.
     '''
     global _populsedb_url_re 
 
@@ -509,6 +583,16 @@ def database_factory(database_location):
 
     if database_location is None:
         database_location = ':memory:'
+    if database_location.startswith('sqlite3:'):
+        path = database_location[len('sqlite3:'):]
+        if path.startswith('//'):
+            # URL-like location: sqlite3:///absolute/path
+            path = path[2:]
+        engine = SQLiteDBEngine(path)
+        if path != ':memory:':
+            engine.set_named_directory(
+                'capsul_engine', osp.abspath(osp.dirname(path)))
+        return engine
     match = _populsedb_url_re.match(database_location)
     if match:
         path = match.groups(2)
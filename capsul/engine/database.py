@@ -1,6 +1,11 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import
+import os
 import os.path as osp
+import json
+import time
+import datetime
+import six
 
 class DatabaseEngine(object):
     '''
@@ -10,11 +15,16 @@ class DatabaseEngine(object):
     name).
     
     To instanciate a :py:class:`DatabaseEngine` one must use the factory 
-    To date, two concrete :py:class:`DatabaseEngine` implementations exist:
+    To date, three concrete :py:class:`DatabaseEngine` implementations exist:
 
     - :py:class:`capsul.engine.database_json.JSONDBEngine`
     - :py:class:`capsul.engine.database_populse.PopulseDBEngine`
+    - :py:class:`capsul.engine.database_sqlite.SQLiteDBEngine`
     
+    Absolute paths are resolved relatively to the named directories using
+    a prefix tree of the named directories paths, built when needed.
+    Implementations must call :meth:`_named_directories_changed` when named
+    directories are modified.
     '''
     
     def check_path_metadata(self, path, metadata, named_directory=None):
@@ -33,7 +43,8 @@ class DatabaseEngine(object):
         
         If named_directory is not given, path must be absolute or a 
         ValueError is raised. Then, either the corresponding named 
-        directory is found or 'absolute' is used.
+        directory is found or 'absolute' is used. When several named
+        directories contain the path, the deepest one is used.
         
         If name_directory is given, the path must be relative (unless
         named_directory == 'absolute') or begin with the path of the 
@@ -41,14 +52,7 @@ class DatabaseEngine(object):
         '''
         if named_directory is None:
             if osp.isabs(path):
-                for nd in self.named_directories():
-                    base_path = nd['path']
-                    if path.startswith(base_path):
-                        named_directory = nd['name']
-                        path = path[len(base_path)+1:]
-                        break
-                else:
-                    named_directory = 'absolute'
+                named_directory, path = self._find_named_directory(path)
             else:
                 raise ValueError('Cannot determine base named directory for relative path "%s"' % path)
         else:
@@ -56,7 +60,8 @@ class DatabaseEngine(object):
                 if not osp.isabs(path):
                     raise ValueError('Using "absolute" named directory requires an absolute path, not "%s"' % path)
             else:
-                base_path = self.named_directory(named_directory)
+                base_path = self._named_directories_index()[1].get(
+                    named_directory)
                 if base_path is None:
                     raise ValueError('Unknown named directory "%s"' % named_directory)
                 if osp.isabs(path):
@@ -64,6 +69,73 @@ class DatabaseEngine(object):
                         raise ValueError('Path "%s" is defined as relative to named directory %s but it does not start with "%s"' % (path, named_directory, base_path))
                     path = path[len(base_path)+1:]
         return (named_directory, path)
+
+    def _named_directories_changed(self):
+        '''
+        Forget the named directories index, which will be built again when
+        needed. Must be called by implementations when a named directory is
+        set or removed.
+        '''
+        self._named_directories_cache = None
+
+    def _named_directories_index(self):
+        '''
+        Named directories prefix tree and paths.
+
+        Returns
+        -------
+        trie: dict
+            {path_element: sub_tree}. The name of the named directory whose
+            path ends at a node is the value of the None key of the node.
+        paths: dict
+            {name: path}
+        '''
+        cache = getattr(self, '_named_directories_cache', None)
+        if cache is None:
+            trie = {}
+            paths = {}
+            for nd in self.named_directories():
+                name, path = nd['name'], nd['path']
+                paths[name] = path
+                node = trie
+                for part in self._path_parts(path):
+                    node = node.setdefault(part, {})
+                node[None] = name
+            cache = (trie, paths)
+            self._named_directories_cache = cache
+        return cache
+
+    @staticmethod
+    def _path_parts(path):
+        return [part for part in path.split(os.sep) if part]
+
+    def _find_named_directory(self, path):
+        '''
+        Find the deepest named directory containing an absolute path.
+
+        Returns
+        -------
+        named_directory: str
+            named directory name, or 'absolute' if no named directory
+            contains path
+        path: str
+            path relative to the named directory, or the unchanged path
+        '''
+        node = self._named_directories_index()[0]
+        parts = self._path_parts(path)
+        found = None
+        for depth, part in enumerate(parts):
+            if None in node:
+                found = (node[None], depth)
+            node = node.get(part)
+            if node is None:
+                break
+        else:
+            if None in node:
+                found = (node[None], len(parts))
+        if found is None:
+            return ('absolute', path)
+        return (found[0], os.sep.join(parts[found[1]:]))
     
     
     def set_json_value(self, name, json_value):
@@ -123,3 +195,177 @@ class DatabaseEngine(object):
         '''
         raise NotImplementedError()
 
+    def set_paths_metadata(self, paths_metadata, named_directory=None):
+        '''
+        Set metadata associated to several paths, in a single transaction
+        when the implementation supports it. This is much faster than
+        calling set_path_metadata() for each path.
+
+        Parameters
+        ----------
+        paths_metadata: dict or iterable
+            {path: metadata} dict, or iterable of (path, metadata) pairs
+        named_directory: str (optional)
+            named directory of all paths, see check_path()
+        '''
+        if isinstance(paths_metadata, dict):
+            paths_metadata = six.iteritems(paths_metadata)
+        for path, metadata in paths_metadata:
+            self.set_path_metadata(path, metadata, named_directory)
+
+    def paths_metadata(self, paths, named_directory=None):
+        '''
+        Retrieve metadata associated with several paths.
+
+        Returns
+        -------
+        metadata: list
+            metadata of each path, in the paths order (None for paths
+            without metadata)
+        '''
+        return [self.path_metadata(path, named_directory) for path in paths]
+
+    def query_metadata(self, filter=None, named_directory=None):
+        '''
+        Select path metadata.
+
+        Parameters
+        ----------
+        filter: dict (optional)
+            {key: value}: only metadata containing all these items are
+            selected. A value may also be a list, tuple or set of accepted
+            values.
+        named_directory: str (optional)
+            select only metadata of paths in this named directory ('absolute'
+            for paths which are not in a named directory)
+
+        Returns
+        -------
+        metadata: list
+            selected metadata dicts, which contain 'path' and
+            'named_directory' items
+        '''
+        raise NotImplementedError()
+
+    @staticmethod
+    def _match_metadata(metadata, filter):
+        '''
+        Check that metadata match a query_metadata() filter
+        '''
+        for key, value in six.iteritems(filter):
+            if key not in metadata:
+                return False
+            if isinstance(value, (list, tuple, set)):
+                if metadata[key] not in value:
+                    return False
+            elif metadata[key] != value:
+                return False
+        return True
+
+    def set_execution(self, execution):
+        '''
+        Store an execution record in the executions history. An existing
+        record with the same identifier is replaced.
+
+        An execution record is a JSON compatible dictionary which contains
+        at least an "execution_id" (string) item. Records stored by
+        :class:`~capsul.engine.CapsulEngine` also contain the following
+        items (some of them are set when the execution is finished):
+
+        - workflow_id: soma-workflow workflow identifier
+        - process: process identifier
+        - name: process name
+        - status: "running", "done" or "failed"
+        - start_time, end_time: timestamps (as returned by time.time())
+        - duration: execution duration in seconds
+        - host: name of the submitting machine
+        - resource: computing resource name
+        - parameters: dictionary of the process parameters
+        - output_paths: list of output files and directories
+        - jobs: list of jobs dictionaries (name, status, start_time,
+          end_time, duration)
+        '''
+        raise NotImplementedError()
+
+    def update_execution(self, execution_id, values):
+        '''
+        Update some values (given as a dict) of an existing execution record
+        '''
+        execution = self.execution(execution_id)
+        if execution is None:
+            raise KeyError('No execution %s in history' % execution_id)
+        execution.update(values)
+        self.set_execution(execution)
+
+    def execution(self, execution_id):
+        '''
+        Retrieve an execution record from its identifier, or None
+        '''
+        raise NotImplementedError()
+
+    def remove_execution(self, execution_id):
+        '''
+        Remove an execution record from the executions history
+        '''
+        raise NotImplementedError()
+
+    def executions(self, process=None, status=None, since=None, until=None,
+                   parameters=None, limit=None, workflow_id=None):
+        '''
+        Query the executions history.
+
+        All criteria are optional and combined. process, status and
+        workflow_id may be either a single value or a list of accepted
+        values.
+
+        Parameters
+        ----------
+        process: str or list
+            process identifiers
+        status: str or list
+            execution status
+        since: float or datetime
+            select executions started after this date
+        until: float or datetime
+            select executions started before this date
+        parameters: dict
+            select executions whose given parameters have the given values
+        limit: int
+            maximum number of returned records
+        workflow_id: int or list
+            soma-workflow workflow identifiers
+
+        Returns
+        -------
+        executions: list of dict
+            execution records, the most recent first
+        '''
+        raise NotImplementedError()
+
+    @staticmethod
+    def _timestamp(date):
+        '''
+        Convert a datetime to a timestamp. Other values are left unchanged.
+        '''
+        if isinstance(date, datetime.datetime):
+            return time.mktime(date.timetuple()) + date.microsecond * 1e-6
+        return date
+
+    @staticmethod
+    def _parameter_value_key(value):
+        '''
+        Normalized string representation of a parameter value, used to index
+        executions by parameters values
+        '''
+        return json.dumps(value, sort_keys=True, default=str)
+
+    @staticmethod
+    def _values_list(value):
+        '''
+        Make a list of a query criterion
+        '''
+        if value is None:
+            return None
+        if isinstance(value, (list, tuple, set)):
+            return list(value)
+        return [value]
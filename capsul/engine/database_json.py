@@ -21,18 +21,27 @@ class JSONDBEngine(DatabaseEngine):
     
     def read_json(self):
         if self.json_filename is not None and osp.exists(self.json_filename):
-            self.json_dict = json.load(open(self.json_filename))
+            with open(self.json_filename) as f:
+                self.json_dict = json.load(f)
             self.modified = False
         else:
             self.json_dict = {}
             self.modified = True
+        # executions indexes, built when needed
+        self._execution_index = None
+        self._named_directories_changed()
             
     def commit(self):
         if self.modified and self.json_filename is not None:
             parent = osp.dirname(self.json_filename)
             if not osp.exists(parent):
                 os.makedirs(parent)
-            json.dump(self.json_dict, open(self.json_filename, 'w'), indent=2)
+            # write a new file then replace the former one, so that an
+            # interrupted commit does not leave a truncated file
+            tmp_filename = '%s.tmp' % self.json_filename
+            with open(tmp_filename, 'w') as f:
+                json.dump(self.json_dict, f, indent=2)
+            os.replace(tmp_filename, self.json_filename)
             self.modified = False
 
     def rollback(self):
@@ -50,6 +59,7 @@ class JSONDBEngine(DatabaseEngine):
             if named_directory is not None:
                 named_directory.pop(name, None)
                 self.modified = True
+        self._named_directories_changed()
 
     def named_directory(self, name):
         return self.json_dict.get('named_directory', {}).get(name, {}).get('path')
@@ -70,11 +80,114 @@ class JSONDBEngine(DatabaseEngine):
         metadata = self.check_path_metadata(path, metadata, named_directory)
         path = metadata['path']
         named_directory = metadata['named_directory']
-        self.json_dict.setdefault('path_metadata', {})[
-            (named_directory, path)] = metadata
+        # {named_directory: {path: metadata}}: JSON keys must be strings
+        self.json_dict.setdefault('path_metadata', {}).setdefault(
+            named_directory, {})[path] = metadata
         self.modified = True
             
 
     def path_metadata(self, path, named_directory=None):
         named_directory, path = self.check_path(path, named_directory)
-        return self.json_dict.get('path_metadata', {}).get((named_directory, path))
+        return self.json_dict.get('path_metadata', {}).get(
+            named_directory, {}).get(path)
+
+    def query_metadata(self, filter=None, named_directory=None):
+        all_metadata = self.json_dict.get('path_metadata', {})
+        if named_directory is not None:
+            directories = [all_metadata.get(named_directory, {})]
+        else:
+            directories = six.itervalues(all_metadata)
+        return [metadata for directory in directories
+                for metadata in six.itervalues(directory)
+                if not filter or self._match_metadata(metadata, filter)]
+
+
+    def _index_execution(self, execution, remove=False):
+        index = self._execution_index
+        execution_id = execution['execution_id']
+        keys = [('process', execution.get('process')),
+                ('status', execution.get('status')),
+                ('workflow_id', execution.get('workflow_id'))]
+        keys += [('parameter', (name, self._parameter_value_key(value)))
+                 for name, value in six.iteritems(
+                     execution.get('parameters') or {})]
+        for kind, key in keys:
+            if remove:
+                index[kind].get(key, set()).discard(execution_id)
+            else:
+                index[kind].setdefault(key, set()).add(execution_id)
+
+    def _executions_index(self):
+        if self._execution_index is None:
+            self._execution_index = {'process': {}, 'status': {},
+                                     'workflow_id': {}, 'parameter': {}}
+            for execution in six.itervalues(
+                    self.json_dict.get('execution', {})):
+                self._index_execution(execution)
+        return self._execution_index
+
+    def set_execution(self, execution):
+        execution_id = execution['execution_id']
+        executions = self.json_dict.setdefault('execution', {})
+        self._executions_index()
+        old = executions.get(execution_id)
+        if old is not None:
+            self._index_execution(old, remove=True)
+        execution = dict(execution)
+        executions[execution_id] = execution
+        self._index_execution(execution)
+        self.modified = True
+
+    def execution(self, execution_id):
+        execution = self.json_dict.get('execution', {}).get(execution_id)
+        if execution is not None:
+            execution = dict(execution)
+        return execution
+
+    def remove_execution(self, execution_id):
+        execution = self.json_dict.get('execution', {}).pop(execution_id,
+                                                            None)
+        if execution is not None:
+            self._executions_index()
+            self._index_execution(execution, remove=True)
+            self.modified = True
+
+    def executions(self, process=None, status=None, since=None, until=None,
+                   parameters=None, limit=None, workflow_id=None):
+        all_executions = self.json_dict.get('execution', {})
+        index = self._executions_index()
+        selected = None
+        criteria = []
+        for kind, values in (('process', self._values_list(process)),
+                             ('status', self._values_list(status)),
+                             ('workflow_id', self._values_list(workflow_id))):
+            if values is not None:
+                criteria.append(set().union(
+                    *[index[kind].get(value, set()) for value in values]))
+        for name, value in six.iteritems(parameters or {}):
+            criteria.append(index['parameter'].get(
+                (name, self._parameter_value_key(value)), set()))
+        for ids in criteria:
+            if selected is None:
+                selected = set(ids)
+            else:
+                selected.intersection_update(ids)
+        if selected is None:
+            selected = all_executions.keys()
+        since = self._timestamp(since)
+        until = self._timestamp(until)
+        result = []
+        for execution_id in selected:
+            execution = all_executions[execution_id]
+            start_time = execution.get('start_time')
+            if since is not None and (start_time is None
+                                      or start_time < since):
+                continue
+            if until is not None and (start_time is None
+                                      or start_time > until):
+                continue
+            result.append(dict(execution))
+        result.sort(key=lambda e: e.get('start_time') or 0, reverse=True)
+        if limit:
+            result = result[:limit]
+        return result
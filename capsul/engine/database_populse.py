@@ -3,6 +3,7 @@ from __future__ import absolute_import
 import os.path as osp
 import six
 import uuid
+import json
 
 from capsul.engine.database import DatabaseEngine
 
@@ -26,6 +27,7 @@ class PopulseDBEngine(DatabaseEngine):
                               description='Reference to a base directory whose '
                               'path is stored in named_directory collection')
         #self.dbs = self.db.__enter__()
+        self._execution_schema = False
             
     
     def __del__(self):
@@ -74,6 +76,7 @@ class PopulseDBEngine(DatabaseEngine):
                     dbs.set_value('named_directory', name, 'path', path)
                 else:
                     dbs.remove_document('named_directory', name)
+        self._named_directories_changed()
 
     def named_directory(self, name):
         #return self.dbs.get_value('named_directory', name, 'path')
@@ -83,7 +86,9 @@ class PopulseDBEngine(DatabaseEngine):
     def named_directories(self):
         #return self.dbs.filter_documents('named_directory', 'all')
         with self.db as dbs:
-            return dbs.filter_documents('named_directory', 'all')
+            return [{'name': doc.name, 'path': doc.path}
+                    for doc in dbs.filter_documents('named_directory',
+                                                    'all')]
 
     def set_json_value(self, name, json_value):
         #doc = self.dbs.get_document('json_value', name)
@@ -117,43 +122,192 @@ class PopulseDBEngine(DatabaseEngine):
                 return doc['json_dict']['value']
             return None
 
-    def set_path_metadata(self, path, metadata):
-        named_directory = metadata.get('named_directory')
-        if named_directory:
-            base_path = self.named_directory('capsul_engine')
-            if base_path:
-                if not path.startswith(named_directory):
-                    raise ValueError('Path "%s" is defined as relative to named directory %s but it does not start with "%s"' % (path, named_directory, base_path))
-                path = path[len(base_path)+1:]
-            else:
-                if osp.isabs(path):
-                    raise ValueError('Cannot determine relative path for "%s" because its base named directory "%s" is unknown' % (path, named_directory))
+    def set_path_metadata(self, path, metadata, named_directory=None):
+        self.set_paths_metadata([(path, metadata)], named_directory)
+
+    def path_metadata(self, path, named_directory=None):
+        return self.paths_metadata([path], named_directory)[0]
+
+    @staticmethod
+    def _path_metadata_key(named_directory, path):
+        # a single primary key identifies paths in all named directories
+        return '%s:%s' % (named_directory, path)
+
+    def _check_path_metadata_schema(self, dbs):
+        '''
+        Create the field storing metadata documents if it does not exist
+        '''
+        if dbs.get_field('path_metadata', 'metadata') is None:
+            dbs.add_field('path_metadata', 'metadata', 'json')
+
+    def set_paths_metadata(self, paths_metadata, named_directory=None):
+        if isinstance(paths_metadata, dict):
+            paths_metadata = six.iteritems(paths_metadata)
+        docs = [self.check_path_metadata(path, metadata, named_directory)
+                for path, metadata in paths_metadata]
+        with self.db as dbs:
+            self._check_path_metadata_schema(dbs)
+            for doc in docs:
+                key = self._path_metadata_key(doc['named_directory'],
+                                              doc['path'])
+                if dbs.get_document('path_metadata', key) is not None:
+                    dbs.remove_document('path_metadata', key)
+                dbs.add_document('path_metadata',
+                                 {'path': key,
+                                  'named_directory': doc['named_directory'],
+                                  'metadata': doc})
+
+    def paths_metadata(self, paths, named_directory=None):
+        keys = [self._path_metadata_key(*self.check_path(path,
+                                                         named_directory))
+                for path in paths]
+        with self.db as dbs:
+            self._check_path_metadata_schema(dbs)
+            result = []
+            for key in keys:
+                doc = dbs.get_document('path_metadata', key,
+                                       fields=['metadata'], as_list=True)
+                result.append(None if doc is None else doc[0])
+        return result
+
+    def query_metadata(self, filter=None, named_directory=None):
+        if named_directory is None:
+            query = 'ALL'
         else:
-            if osp.isabs(path):
-                for nd in self.named_directories():
-                    if path.startswith(nd.path):
-                        named_directory = nd.name()
-                        path = path[len(nd.path)+1]
-                        break
-                else:
-                    named_directory = None
-            else:
-                # capsul_engine is the default named directory for relative paths
-                named_directory = 'capsul_engine'
+            query = '{named_directory} == %s' % json.dumps(named_directory)
+        with self.db as dbs:
+            self._check_path_metadata_schema(dbs)
+            docs = [doc[0] for doc in dbs.filter_documents(
+                'path_metadata', query, fields=['metadata'], as_list=True)]
+        return [doc for doc in docs
+                if not filter or self._match_metadata(doc, filter)]
 
-        doc = metadata.copy()
-        doc['path'] = path
-        if named_directory:
-            doc['named_directory'] = named_directory
+
+    # executions history fields, indexed ones are used in queries
+    _execution_fields = [
+        ('workflow_id', 'int', True),
+        ('process', 'string', True),
+        ('name', 'string', False),
+        ('status', 'string', True),
+        ('start_time', 'float', True),
+        ('end_time', 'float', False),
+        ('duration', 'float', False),
+        ('host', 'string', False),
+        ('resource', 'string', False),
+        ('parameters', 'json', False),
+        ('output_paths', 'list_string', False),
+        ('jobs', 'list_json', False),
+    ]
+
+    def _check_execution_schema(self, dbs):
+        '''
+        Create the executions history collections if they do not exist
+        '''
+        if self._execution_schema:
+            return
+        if not dbs.get_collection('execution'):
+            dbs.add_collection('execution', 'execution_id')
+            for name, field_type, index in self._execution_fields:
+                dbs.add_field('execution', name, field_type, index=index)
+            # one document per (execution, parameter), to query executions
+            # by parameters values
+            dbs.add_collection('execution_parameter', 'key')
+            dbs.add_field('execution_parameter', 'execution_id', 'string',
+                          index=True)
+            dbs.add_field('execution_parameter', 'name', 'string',
+                          index=True)
+            dbs.add_field('execution_parameter', 'value', 'string',
+                          index=True)
+        self._execution_schema = True
+
+    @staticmethod
+    def _document_dict(doc):
+        return dict((key, doc[key]) for key in doc.keys()
+                    if doc[key] is not None)
+
+    def set_execution(self, execution):
+        execution_id = execution['execution_id']
+        doc = dict((key, value) for key, value in six.iteritems(execution)
+                   if value is not None)
         with self.db as dbs:
-            dbs.add_document('path_metadata', doc)
-            
+            self._check_execution_schema(dbs)
+            if dbs.get_document('execution', execution_id) is not None:
+                self._remove_execution(dbs, execution_id)
+            dbs.add_document('execution', doc)
+            for name, value in six.iteritems(
+                    execution.get('parameters') or {}):
+                dbs.add_document(
+                    'execution_parameter',
+                    {'key': '%s/%s' % (execution_id, name),
+                     'execution_id': execution_id,
+                     'name': name,
+                     'value': self._parameter_value_key(value)})
+
+    def execution(self, execution_id):
+        with self.db as dbs:
+            self._check_execution_schema(dbs)
+            doc = dbs.get_document('execution', execution_id)
+            if doc is None:
+                return None
+            return self._document_dict(doc)
+
+    def _remove_execution(self, dbs, execution_id):
+        dbs.remove_document('execution', execution_id)
+        keys = [doc.key for doc in dbs.filter_documents(
+            'execution_parameter',
+            '{execution_id} == %s' % json.dumps(execution_id))]
+        for key in keys:
+            dbs.remove_document('execution_parameter', key)
 
-    def path_metadata(self, path):
-        if osp.isabs(path):
-            for nd in self.named_directories():
-                if path.startswith(nd.path):
-                    path = path[len(nd.path)+1:]
-                    break
+    def remove_execution(self, execution_id):
         with self.db as dbs:
-            return dbs.get_document('path_metadata', path)
+            self._check_execution_schema(dbs)
+            if dbs.get_document('execution', execution_id) is not None:
+                self._remove_execution(dbs, execution_id)
+
+    def executions(self, process=None, status=None, since=None, until=None,
+                   parameters=None, limit=None, workflow_id=None):
+        conditions = []
+        for field, values in (('process', self._values_list(process)),
+                              ('status', self._values_list(status)),
+                              ('workflow_id', self._values_list(workflow_id))):
+            if values is not None:
+                conditions.append('{%s} IN [%s]'
+                                  % (field, ', '.join(json.dumps(value)
+                                                      for value in values)))
+        since = self._timestamp(since)
+        until = self._timestamp(until)
+        if since is not None:
+            conditions.append('{start_time} >= %r' % float(since))
+        if until is not None:
+            conditions.append('{start_time} <= %r' % float(until))
+        with self.db as dbs:
+            self._check_execution_schema(dbs)
+            if parameters:
+                selected = None
+                for name, value in six.iteritems(parameters):
+                    ids = set(
+                        doc.execution_id for doc in dbs.filter_documents(
+                            'execution_parameter',
+                            '{name} == %s AND {value} == %s'
+                            % (json.dumps(name), json.dumps(
+                                self._parameter_value_key(value)))))
+                    if selected is None:
+                        selected = ids
+                    else:
+                        selected.intersection_update(ids)
+                if not selected:
+                    return []
+                conditions.append('{execution_id} IN [%s]'
+                                  % ', '.join(json.dumps(execution_id)
+                                              for execution_id in selected))
+            if conditions:
+                query = ' AND '.join('(%s)' % c for c in conditions)
+            else:
+                query = 'ALL'
+            result = [self._document_dict(doc)
+                      for doc in dbs.filter_documents('execution', query)]
+        result.sort(key=lambda e: e.get('start_time') or 0, reverse=True)
+        if limit:
+            result = result[:limit]
+        return result
@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import os
+import os.path as osp
+import six
+import json
+import sqlite3
+import threading
+
+from capsul.engine.database import DatabaseEngine
+
+from populse_db.database import Database
+
+
+class SQLiteDBEngine(DatabaseEngine):
+    '''
+    An implementation of :py:class:`capsul.engine.database.DatabaseEngine`
+    using the sqlite3 module of the Python standard library.
+
+    Each kind of data is stored in its own table, with a primary key on the
+    lookup key, thus path metadata are retrieved without reading the whole
+    database: (named_directory, path) is the key of the path_metadata table.
+
+    Path metadata writes are buffered, and written by batches of
+    :py:attr:`batch_size` documents in a single transaction, when
+    :meth:`commit` or :meth:`close` are called, or when the buffer is full.
+    :meth:`set_paths_metadata` writes all its documents at once.
+    Other modifications are written immediately. The database uses a
+    write-ahead log: a transaction is either fully written or not at all,
+    even if the program is interrupted.
+
+    CapsulEngine settings are stored by populse_db, in the same database
+    file (using other tables): the :py:attr:`db` attribute is the populse_db
+    Database.
+    '''
+
+    #: number of path metadata documents written in a single transaction
+    batch_size = 1000
+
+    _schema = [
+        'CREATE TABLE IF NOT EXISTS capsul_named_directory ('
+        '  name TEXT PRIMARY KEY,'
+        '  path TEXT NOT NULL)',
+        'CREATE TABLE IF NOT EXISTS capsul_json_value ('
+        '  name TEXT PRIMARY KEY,'
+        '  value TEXT)',
+        'CREATE TABLE IF NOT EXISTS capsul_path_metadata ('
+        '  named_directory TEXT NOT NULL,'
+        '  path TEXT NOT NULL,'
+        '  metadata TEXT NOT NULL,'
+        '  PRIMARY KEY (named_directory, path)) WITHOUT ROWID',
+        'CREATE TABLE IF NOT EXISTS capsul_execution ('
+        '  execution_id TEXT PRIMARY KEY,'
+        '  process TEXT,'
+        '  status TEXT,'
+        '  start_time REAL,'
+        '  record TEXT NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS capsul_execution_process '
+        '  ON capsul_execution (process)',
+        'CREATE INDEX IF NOT EXISTS capsul_execution_status '
+        '  ON capsul_execution (status)',
+        'CREATE INDEX IF NOT EXISTS capsul_execution_start_time '
+        '  ON capsul_execution (start_time)',
+        'CREATE INDEX IF NOT EXISTS capsul_execution_workflow_id '
+        '  ON capsul_execution (json_extract(record, \'$.workflow_id\'))',
+        'CREATE TABLE IF NOT EXISTS capsul_execution_parameter ('
+        '  execution_id TEXT NOT NULL,'
+        '  name TEXT NOT NULL,'
+        '  value TEXT NOT NULL,'
+        '  PRIMARY KEY (execution_id, name))',
+        'CREATE INDEX IF NOT EXISTS capsul_execution_parameter_value '
+        '  ON capsul_execution_parameter (name, value)',
+    ]
+
+    def __init__(self, database_file):
+        '''
+        Open (and create if needed) a database file. database_file may be
+        ':memory:' for a temporary in memory database.
+        '''
+        if database_file == ':memory:':
+            self.database_file = database_file
+            # settings cannot share a connection to an in memory database
+            settings_url = 'sqlite:///:memory:'
+        else:
+            self.database_file = osp.normpath(osp.abspath(database_file))
+            parent = osp.dirname(self.database_file)
+            if not osp.exists(parent):
+                os.makedirs(parent)
+            settings_url = 'sqlite:///%s' % self.database_file
+        self._lock = threading.RLock()
+        self.connection = sqlite3.connect(self.database_file,
+                                          check_same_thread=False)
+        if self.database_file != ':memory:':
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+        with self.connection:
+            for sql in self._schema:
+                self.connection.execute(sql)
+        # buffered path metadata: {(named_directory, path): metadata}
+        self._pending_metadata = {}
+        self._named_directories = dict(self.connection.execute(
+            'SELECT name, path FROM capsul_named_directory'))
+        self.db = Database(settings_url)
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            # the interpreter may be shutting down
+            pass
+
+    def close(self):
+        if self.connection is not None:
+            self.commit()
+            self.connection.close()
+            self.connection = None
+        self.db = None
+
+    def commit(self):
+        '''
+        Write buffered path metadata
+        '''
+        with self._lock:
+            if self._pending_metadata:
+                with self.connection:
+                    self.connection.executemany(
+                        'INSERT OR REPLACE INTO capsul_path_metadata '
+                        '(named_directory, path, metadata) VALUES (?, ?, ?)',
+                        [(key[0], key[1], json.dumps(metadata))
+                         for key, metadata
+                         in six.iteritems(self._pending_metadata)])
+                self._pending_metadata = {}
+
+    def rollback(self):
+        '''
+        Forget buffered path metadata which have not been written yet
+        '''
+        with self._lock:
+            self._pending_metadata = {}
+
+    def set_named_directory(self, name, path):
+        with self._lock, self.connection:
+            if path:
+                path = osp.normpath(osp.abspath(path))
+                self.connection.execute(
+                    'INSERT OR REPLACE INTO capsul_named_directory '
+                    '(name, path) VALUES (?, ?)', (name, path))
+                self._named_directories[name] = path
+            else:
+                self.connection.execute(
+                    'DELETE FROM capsul_named_directory WHERE name = ?',
+                    (name, ))
+                self._named_directories.pop(name, None)
+        self._named_directories_changed()
+
+    def named_directory(self, name):
+        return self._named_directories.get(name)
+
+    def named_directories(self):
+        return [{'name': name, 'path': path}
+                for name, path in six.iteritems(self._named_directories)]
+
+    def set_json_value(self, name, json_value):
+        with self._lock, self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO capsul_json_value (name, value) '
+                'VALUES (?, ?)', (name, json.dumps(json_value)))
+
+    def json_value(self, name):
+        with self._lock:
+            row = self.connection.execute(
+                'SELECT value FROM capsul_json_value WHERE name = ?',
+                (name, )).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def set_path_metadata(self, path, metadata, named_directory=None):
+        metadata = self.check_path_metadata(path, metadata, named_directory)
+        key = (metadata['named_directory'], metadata['path'])
+        with self._lock:
+            self._pending_metadata[key] = metadata
+            if len(self._pending_metadata) >= self.batch_size:
+                self.commit()
+
+    def path_metadata(self, path, named_directory=None):
+        return self.paths_metadata([path], named_directory)[0]
+
+    def set_paths_metadata(self, paths_metadata, named_directory=None):
+        if isinstance(paths_metadata, dict):
+            paths_metadata = six.iteritems(paths_metadata)
+        with self._lock:
+            for path, metadata in paths_metadata:
+                metadata = self.check_path_metadata(path, metadata,
+                                                    named_directory)
+                self._pending_metadata[(metadata['named_directory'],
+                                        metadata['path'])] = metadata
+            self.commit()
+
+    def paths_metadata(self, paths, named_directory=None):
+        keys = [self.check_path(path, named_directory) for path in paths]
+        result = []
+        with self._lock:
+            for key in keys:
+                metadata = self._pending_metadata.get(key)
+                if metadata is not None:
+                    result.append(dict(metadata))
+                    continue
+                row = self.connection.execute(
+                    'SELECT metadata FROM capsul_path_metadata '
+                    'WHERE named_directory = ? AND path = ?', key).fetchone()
+                result.append(None if row is None else json.loads(row[0]))
+        return result
+
+    def query_metadata(self, filter=None, named_directory=None):
+        conditions = []
+        values = []
+        if named_directory is not None:
+            conditions.append('named_directory = ?')
+            values.append(named_directory)
+        # scalar values are filtered by sqlite, others after JSON decoding
+        other_filter = {}
+        for key, value in six.iteritems(filter or {}):
+            if isinstance(value, six.string_types + six.integer_types
+                          + (float, )) and not isinstance(value, bool):
+                conditions.append('json_extract(metadata, ?) = ?')
+                values += ['$.%s' % json.dumps(key), value]
+            else:
+                other_filter[key] = value
+        sql = 'SELECT metadata FROM capsul_path_metadata'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        with self._lock:
+            self.commit()
+            result = [json.loads(row[0])
+                      for row in self.connection.execute(sql, values)]
+        if other_filter:
+            result = [metadata for metadata in result
+                      if self._match_metadata(metadata, other_filter)]
+        return result
+
+    def set_execution(self, execution):
+        execution_id = execution['execution_id']
+        with self._lock, self.connection:
+            self._remove_execution(execution_id)
+            self.connection.execute(
+                'INSERT INTO capsul_execution '
+                '(execution_id, process, status, start_time, record) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (execution_id, execution.get('process'),
+                 execution.get('status'), execution.get('start_time'),
+                 json.dumps(execution)))
+            self.connection.executemany(
+                'INSERT INTO capsul_execution_parameter '
+                '(execution_id, name, value) VALUES (?, ?, ?)',
+                [(execution_id, name, self._parameter_value_key(value))
+                 for name, value in six.iteritems(
+                     execution.get('parameters') or {})])
+
+    def execution(self, execution_id):
+        with self._lock:
+            row = self.connection.execute(
+                'SELECT record FROM capsul_execution WHERE execution_id = ?',
+                (execution_id, )).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def _remove_execution(self, execution_id):
+        self.connection.execute(
+            'DELETE FROM capsul_execution WHERE execution_id = ?',
+            (execution_id, ))
+        self.connection.execute(
+            'DELETE FROM capsul_execution_parameter WHERE execution_id = ?',
+            (execution_id, ))
+
+    def remove_execution(self, execution_id):
+        with self._lock, self.connection:
+            self._remove_execution(execution_id)
+
+    def executions(self, process=None, status=None, since=None, until=None,
+                   parameters=None, limit=None, workflow_id=None):
+        conditions = []
+        values = []
+        for field, field_values in (
+                ('process', self._values_list(process)),
+                ('status', self._values_list(status)),
+                ("json_extract(record, '$.workflow_id')",
+                 self._values_list(workflow_id))):
+            if field_values is not None:
+                conditions.append('%s IN (%s)'
+                                  % (field, ', '.join(['?'] *
+                                                      len(field_values))))
+                values += field_values
+        since = self._timestamp(since)
+        until = self._timestamp(until)
+        if since is not None:
+            conditions.append('start_time >= ?')
+            values.append(float(since))
+        if until is not None:
+            conditions.append('start_time <= ?')
+            values.append(float(until))
+        for name, value in six.iteritems(parameters or {}):
+            conditions.append(
+                'execution_id IN (SELECT execution_id '
+                'FROM capsul_execution_parameter WHERE name = ? AND value = ?)')
+            values += [name, self._parameter_value_key(value)]
+        sql = 'SELECT record FROM capsul_execution'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        # NULL start times come last
+        sql += ' ORDER BY start_time DESC'
+        if limit:
+            sql += ' LIMIT ?'
+            values.append(int(limit))
+        with self._lock:
+            return [json.loads(row[0])
+                    for row in self.connection.execute(sql, values)]
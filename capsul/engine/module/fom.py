@@ -6,6 +6,8 @@ Classes
 =======
 :class:`FomConfig`
 ------------------
+:class:`FomPathsCache`
+----------------------
 '''
 
 from __future__ import absolute_import
@@ -16,8 +18,143 @@ from soma.fom import AttributesToPaths, PathToAttributes
 from soma.application import Application
 from soma.sorted_dictionary import SortedDictionary
 import weakref
+import threading
 import capsul.engine
 from functools import partial
+from collections import OrderedDict
+
+
+class FomPathsCache(object):
+    ''' Bounded memory of paths built from FOM attributes.
+
+    Building a path from attributes through a FOM
+    (:class:`soma.fom.AttributesToPaths`) involves looking for discriminant
+    attributes and matching rules, which is done many times with the same
+    values during completion. This cache keeps the results, keyed on the
+    FOM schema (the AttributesToPaths object), FOM process, parameter,
+    discriminant attributes values and format.
+
+    Entries are dropped when FOMs are (re)loaded or updated (see
+    :func:`update_fom`, :func:`load_fom`), and the least recently used ones
+    are dropped when the cache exceeds max_size entries.
+
+    Attributes
+    ----------
+    max_size: int
+        maximum number of paths kept
+    hits: int
+        number of paths found in the cache
+    misses: int
+        number of paths which have been built
+    invalidations: int
+        number of times the cache has been cleared
+    '''
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._paths = OrderedDict()
+        self._discriminant_attributes = {}
+        self._lock = threading.RLock()
+
+    def clear(self):
+        ''' Drop all cached paths
+        '''
+        with self._lock:
+            self._paths.clear()
+            self._discriminant_attributes.clear()
+            self.invalidations += 1
+
+    def discriminant_attributes(self, atp, fom_process, parameter):
+        ''' Cached :meth:`soma.fom.AttributesToPaths.find_discriminant_attributes`
+        '''
+        key = (atp, fom_process, parameter)
+        attributes = self._discriminant_attributes.get(key)
+        if attributes is None:
+            attributes = atp.find_discriminant_attributes(
+                fom_parameter=parameter, fom_process=fom_process)
+            with self._lock:
+                self._discriminant_attributes[key] = attributes
+        return attributes
+
+    def find_path(self, atp, fom_process, parameter, attributes,
+                  fom_format='fom_preferred'):
+        ''' Get the first path matching the given attributes, from the cache
+        if possible. See :func:`find_fom_path`.
+        '''
+        try:
+            key = (atp, fom_process, parameter,
+                   tuple(sorted(attributes.items())), fom_format)
+            hash(key)
+        except TypeError:
+            # unhashable attributes values: no caching
+            with self._lock:
+                self.misses += 1
+            return find_fom_path(atp, fom_process, parameter, attributes,
+                                 fom_format)
+        with self._lock:
+            if key in self._paths:
+                self.hits += 1
+                path = self._paths.pop(key)
+                self._paths[key] = path  # most recently used
+                return path
+            self.misses += 1
+        path = find_fom_path(atp, fom_process, parameter, attributes,
+                             fom_format)
+        with self._lock:
+            self._paths[key] = path
+            while len(self._paths) > self.max_size:
+                self._paths.popitem(last=False)
+        return path
+
+    def stats(self):
+        ''' Cache usage counters
+
+        Returns
+        -------
+        stats: dict
+            {'hits': int, 'misses': int, 'hit_rate': float,
+            'size': int, 'max_size': int, 'invalidations': int}
+        '''
+        with self._lock:
+            total = self.hits + self.misses
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'hit_rate': float(self.hits) / total if total else 0.,
+                    'size': len(self._paths),
+                    'max_size': self.max_size,
+                    'invalidations': self.invalidations}
+
+
+def find_fom_path(atp, fom_process, parameter, attributes,
+                  fom_format='fom_preferred'):
+    ''' First path built by a FOM for the given process parameter and
+    attributes values, or None if no FOM rule matches.
+
+    Parameters
+    ----------
+    atp: soma.fom.AttributesToPaths
+    fom_process: str
+        process name in the FOM
+    parameter: str
+        process parameter
+    attributes: dict
+        discriminant attributes values
+    fom_format: str
+        format selection, 'fom_preferred' by default
+    '''
+    d = dict(attributes)
+    d['fom_process'] = fom_process
+    d['fom_parameter'] = parameter
+    d['fom_format'] = fom_format
+    for h in atp.find_paths(d):
+        # find_paths() is a generator which can sometimes generate
+        # several values (formats). We are only interested in the
+        # first one.
+        return h[0]
+    return None
 
 
 def init_settings(capsul_engine):
@@ -67,6 +204,7 @@ def init_settings(capsul_engine):
     store['all_foms'] = SortedDictionary()
     store['fom_atp'] = {'all': {}}
     store['fom_pta'] = {'all': {}}
+    store['paths_cache'] = FomPathsCache()
 
     capsul_engine.settings.module_notifiers['capsul.engine.module.fom'] \
         = [partial(fom_config_updated, weakref.proxy(capsul_engine), 'global')]
@@ -176,12 +314,15 @@ def update_fom(capsul_engine, environment='global', param=None, value=None):
 
         for atp in store['fom_atp']['all'].values():
             atp.directories = directories
+        store['paths_cache'].clear()
 
         # backward compatibility for StudyConfig
         capsul_engine.study_config.modules_data.foms = store['foms']
         capsul_engine.study_config.modules_data.all_foms = store['all_foms']
         capsul_engine.study_config.modules_data.fom_atp = store['fom_atp']
         capsul_engine.study_config.modules_data.fom_pta = store['fom_pta']
+        capsul_engine.study_config.modules_data.fom_paths_cache \
+            = store['paths_cache']
 
 
 def update_formats(capsul_engine, environment):
@@ -223,6 +364,7 @@ def update_formats(capsul_engine, environment):
                 for t in ('input', 'output', 'shared'):
                     if store['fom_atp'].get(t) is old_atp:
                         store['fom_atp'][t] = atp
+        store['paths_cache'].clear()
 
 
 def load_fom(capsul_engine, schema, config, session, environment='global'):
@@ -271,6 +413,7 @@ def load_fom(capsul_engine, schema, config, session, environment='global'):
     store['fom_atp']['all'][schema] = atp
     pta = PathToAttributes(fom, selection={})
     store['fom_pta']['all'][schema] = pta
+    store['paths_cache'].clear()
     #print('   load fom done:', time.time() - t0, 's')
     return fom, atp, pta
 
@@ -11,11 +11,16 @@ from __future__ import print_function
 
 from capsul.pipeline.pipeline import Pipeline
 from capsul.pipeline.pipeline_nodes import ProcessNode
+from capsul.study_config import instrumentation
 from traits.api import Undefined
 import six
 import tempfile
 import os
 import io
+import time
+import json
+import socket
+import uuid
 
 
 class WorkflowExecutionError(Exception):
@@ -120,19 +125,21 @@ def start(engine, process, history=True, get_pipeline=False, **kwargs):
     the process execution and can be used to get the status of the
     execution or wait for its termination.
 
-    TODO:
-    if history is True, an entry of the process execution is stored in
-    the database. The content of this entry is to be defined but it will
-    contain the process parameters (to restart the process) and will be
-    updated on process termination (for instance to store execution time
-    if possible).
+    If history is True, an entry of the process execution is stored in
+    the engine database. It contains the process parameters (to restart the
+    process), and is updated on process termination by :func:`wait` (or
+    :func:`interrupt` and :func:`dispose`), from any engine connected to the
+    same database and computing resource, with the execution status, jobs
+    timings and output paths. See
+    :meth:`capsul.engine.database.DatabaseEngine.set_execution` and
+    :meth:`capsul.engine.CapsulEngine.history`.
 
     Parameters
     ----------
     engine: CapsulEngine
     process: Process or Pipeline instance
     history: bool (optional)
-        TODO: not implemented yet.
+        record the execution in the engine database history.
     get_pipeline: bool (optional)
         if True, start() will return a tuple (execution_id, pipeline). The
         pipeline is normally the input pipeline (process) if it is actually
@@ -169,7 +176,11 @@ def start(engine, process, history=True, get_pipeline=False, **kwargs):
     from capsul.pipeline.pipeline_workflow import workflow_from_pipeline
     import soma_workflow.client as swclient
 
+    t0 = time.time()
     workflow = workflow_from_pipeline(process)
+    instrumentation.emit('workflow_build', name=process.name,
+                         process=process.id, wall_time=time.time() - t0,
+                         jobs=len(workflow.jobs))
 
     swm = engine.study_config.modules['SomaWorkflowConfig']
     swm.connect_resource(engine.connected_to())
@@ -187,6 +198,8 @@ def start(engine, process, history=True, get_pipeline=False, **kwargs):
     workflow_name = process.name
     wf_id = controller.submit_workflow(workflow=workflow, name=workflow_name,
                                        queue=queue)
+    if history:
+        _history_start(engine, process, wf_id)
     swclient.Helper.transfer_input_files(wf_id, controller)
 
     if get_pipeline:
@@ -211,7 +224,10 @@ def wait(engine, execution_id, timeout=-1, pipeline=None):
     controller.wait_workflow(wf_id, timeout=timeout)
     workflow_status = controller.workflow_status(wf_id)
     if workflow_status != constants.WORKFLOW_DONE:
-        # not finished
+        # not finished, or not existing any longer
+        if workflow_status not in (constants.WORKFLOW_NOT_STARTED,
+                                   constants.WORKFLOW_IN_PROGRESS):
+            _history_end(engine, wf_id, workflow_status, controller)
         return workflow_status
 
     # get output values
@@ -242,9 +258,178 @@ def wait(engine, execution_id, timeout=-1, pipeline=None):
                             del out_params[param]
                     process.import_from_dict(out_params)
 
+    jobs = None
+    if instrumentation.is_active():
+        jobs = _jobs_information(controller, wf_id)
+        for job in jobs:
+            instrumentation.emit('node_end', kind='job', name=job['name'],
+                                 status=job['status'],
+                                 wall_time=job['duration'])
+
     # TODO: should we transfer if the WF fails ?
     swclient.Helper.transfer_output_files(wf_id, controller)
-    return status(engine, execution_id)
+    workflow_status = status(engine, execution_id)
+    _history_end(engine, wf_id, workflow_status, controller, jobs=jobs,
+                 pipeline=pipeline)
+    return workflow_status
+
+
+def _jobs_information(controller, workflow_id):
+    '''
+    Status and timings of the jobs of a finished workflow, from their
+    soma-workflow execution dates.
+
+    Returns
+    -------
+    jobs: list of dict
+        with the keys name, status ("done" or "failed"), start_time,
+        end_time (timestamps) and duration (seconds)
+    '''
+    from soma_workflow import constants
+
+    eng_wf = controller.workflow(workflow_id)
+    jobs = dict((eng_wf.job_mapping[job].job_id, job) for job in eng_wf.jobs)
+    elements_status = controller.workflow_elements_status(workflow_id)
+    result = []
+    for element in elements_status[0]:
+        job = jobs.get(element[0])
+        if job is None:
+            continue
+        exit_info = element[3]
+        job_status = 'done'
+        if element[1] == constants.FAILED \
+                or exit_info[0] not in (constants.FINISHED_REGULARLY, None) \
+                or exit_info[1] not in (0, None):
+            job_status = 'failed'
+        execution_date, ending_date = element[4][1:3]
+        duration = None
+        if execution_date is not None and ending_date is not None:
+            duration = (ending_date - execution_date).total_seconds()
+        result.append({
+            'name': job.name,
+            'status': job_status,
+            'start_time': _timestamp(execution_date),
+            'end_time': _timestamp(ending_date),
+            'duration': duration})
+    return result
+
+
+def _timestamp(date):
+    if date is None:
+        return None
+    return time.mktime(date.timetuple()) + date.microsecond * 1e-6
+
+
+def _json_parameters(process):
+    '''
+    Process parameters, as JSON compatible values
+    '''
+    parameters = process.export_to_dict(exclude_undefined=True)
+    for name in ('nodes_activation', 'pipeline_steps', 'visible_groups'):
+        parameters.pop(name, None)
+    return json.loads(json.dumps(parameters, default=str))
+
+
+def _output_paths(process):
+    '''
+    Values of the output files and directories parameters of a process
+    '''
+    from soma.controller.trait_utils import is_file_trait
+
+    paths = []
+    for name, trait in six.iteritems(process.user_traits()):
+        if not trait.output or not is_file_trait(trait, allow_dir=True):
+            continue
+        todo = [getattr(process, name)]
+        while todo:
+            value = todo.pop(0)
+            if isinstance(value, (list, tuple)):
+                todo += list(value)
+            elif isinstance(value, six.string_types) and value:
+                paths.append(value)
+    return paths
+
+
+def _history_start(engine, process, workflow_id):
+    '''
+    Record the start of an execution in the engine database history
+    '''
+    execution_id = str(uuid.uuid4())
+    engine.database.set_execution({
+        'execution_id': execution_id,
+        'workflow_id': workflow_id,
+        'process': process.id,
+        'name': process.name,
+        'status': 'running',
+        'start_time': time.time(),
+        'host': socket.gethostname(),
+        'resource': engine.connected_to() or 'localhost',
+        'parameters': _json_parameters(process),
+        'output_paths': _output_paths(process),
+    })
+    return execution_id
+
+
+def _history_execution(engine, workflow_id, status=None):
+    '''
+    Most recent record of a workflow, submitted to the connected computing
+    resource, in the engine database history, or None
+    '''
+    resource = engine.connected_to() or 'localhost'
+    for execution in engine.database.executions(workflow_id=workflow_id,
+                                                status=status):
+        if execution.get('resource') == resource:
+            return execution
+    return None
+
+
+def _history_end(engine, workflow_id, workflow_status, controller, jobs=None,
+                 pipeline=None):
+    '''
+    Record the end of an execution in the engine database history, if it is
+    recorded there and has not been recorded as finished yet
+
+    The end time is the end of the last job, and the duration is counted
+    from the start of the first job (or from the submission if no job has
+    been started), so that they do not depend on when the execution end is
+    recorded.
+    '''
+    from soma_workflow import constants
+
+    execution = _history_execution(engine, workflow_id, status='running')
+    if execution is None:
+        return
+    if jobs is None:
+        try:
+            jobs = _jobs_information(controller, workflow_id)
+        except Exception:
+            # the workflow does not exist any longer
+            jobs = []
+    start_times = [job['start_time'] for job in jobs
+                   if job['start_time'] is not None]
+    end_times = [job['end_time'] for job in jobs
+                 if job['end_time'] is not None]
+    start_time = min(start_times) if start_times \
+        else execution['start_time']
+    if end_times:
+        # jobs dates are rounded to the second: the end time must not
+        # precede the submission
+        end_time = max(max(end_times), execution['start_time'])
+    else:
+        end_time = time.time()
+    values = {
+        'status': 'done' if workflow_status == constants.WORKFLOW_DONE
+            else 'failed',
+        'end_time': end_time,
+        'duration': end_time - start_time,
+        'jobs': jobs,
+    }
+    if pipeline is not None:
+        # output values may have been set during the execution
+        output_paths = _output_paths(pipeline)
+        if output_paths:
+            values['output_paths'] = output_paths
+    engine.database.update_execution(execution['execution_id'], values)
 
 
 def interrupt(engine, execution_id):
@@ -256,6 +441,8 @@ def interrupt(engine, execution_id):
     swm.connect_resource(engine.connected_to())
     controller = swm.get_workflow_controller()
     controller.stop_workflow(execution_id)
+    # the execution is recorded as failed in the history
+    _history_end(engine, execution_id, None, controller)
 
 
 def status(engine, execution_id):
@@ -306,23 +493,27 @@ def dispose(engine, execution_id, conditional=False):
     If ``conditional`` is set to True, then dispose is only done if the
     configuration does not specify to keep succeeded / failed workflows.
     '''
+    from soma_workflow import constants
+
     keep = False
     if conditional:
         if not engine.study_config.somaworkflow_keep_succeeded_workflows:
             keep = False
             if engine.study_config.somaworkflow_keep_failed_workflows:
                 # must see it it failed or not
-                from soma_workflow import constants
-
                 status = engine.status(execution_id)
                 if status != constants.WORKFLOW_DONE:
                     keep = True
+    swm = engine.study_config.modules['SomaWorkflowConfig']
+    swm.connect_resource(engine.connected_to())
+    controller = swm.get_workflow_controller()
+    workflow_status = engine.status(execution_id)
+    if not keep or workflow_status not in (constants.WORKFLOW_NOT_STARTED,
+                                           constants.WORKFLOW_IN_PROGRESS):
+        # finished, or stopped by the workflow removal
+        _history_end(engine, execution_id, workflow_status, controller)
     if not keep:
-        swm = engine.study_config.modules['SomaWorkflowConfig']
-        swm.connect_resource(engine.connected_to())
-        controller = swm.get_workflow_controller()
         controller.delete_workflow(execution_id)
-        # TODO: update engine DB
 
 
 def call(engine, process, history=True, **kwargs):
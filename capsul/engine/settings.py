@@ -16,6 +16,8 @@ CapsulEngine settings are organized in modules. Each module defines and document
 
 Settings cannot be used directly to configure the execution of a software. It is necessary to first select a single configuration document for each module. This configurations selection step is done by the :meth:`Settings.select_configurations` method.
 
+Selected configurations, and requirements resolutions (:meth:`Settings.resolve_requirements`), are cached by :class:`Settings`: selecting again the configurations for the same environment and requirements does not query the database, until settings are modified through a :class:`SettingsSession` or a :class:`SettingsConfig`. Settings modified directly in the populse_db database (or through another :class:`Settings` instance using the same database) are not seen until :meth:`Settings.clear_cache` is called.
+
 '''
 
 #
@@ -39,6 +41,8 @@ Settings cannot be used directly to configure the execution of a software. It is
 #
 
 import importlib
+import copy
+import threading
 from uuid import uuid4
 
 
@@ -72,17 +76,51 @@ class Settings:
         '''
         self.populse_db = populse_db
         self.module_notifiers = {}
+        # populse_db uses a single database session, entered recursively:
+        # the settings session wrapping it is also reused
+        self._session = None
+        # selected configurations: {(environment, uses): configurations}
+        self._configurations_cache = {}
+        # requirements resolutions: {(environment, uses): (config, missing)}
+        self._requirements_cache = {}
+        # incremented each time settings are modified
+        self.revision = 0
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
 
     def __enter__(self):
         '''
         Starts a session to read or write settings
         '''
         dbs = self.populse_db.__enter__()
-        return SettingsSession(dbs, module_notifiers=self.module_notifiers)
+        session = self._session
+        if session is None or session._dbs is not dbs:
+            session = SettingsSession(dbs,
+                                      module_notifiers=self.module_notifiers,
+                                      on_change=self.clear_cache)
+            self._session = session
+        return session
 
     def __exit__(self, *args):
+        if args and args[0] is not None:
+            # modifications are rolled back: configurations selected during
+            # the session may not be valid any longer
+            self.clear_cache()
         self.populse_db.__exit__(*args)
 
+    def clear_cache(self):
+        '''
+        Forget the configurations selected by
+        :meth:`select_configurations`. This is done automatically when
+        settings are modified through a :class:`SettingsSession` or a
+        :class:`SettingsConfig`.
+        '''
+        with self._cache_lock:
+            self._configurations_cache = {}
+            self._requirements_cache = {}
+            self.revision += 1
+
     @staticmethod
     def module_name(module_name):
         '''
@@ -123,6 +161,84 @@ class Settings:
 
             config = ce.select_configurations('my_environment',
                                               uses={'spm': 'version > 8'})
+
+        Selections are cached (see :meth:`clear_cache`), the returned
+        dictionary is a copy which may be modified by the caller.
+        '''
+        key = self._cache_key(environment, uses)
+        configurations = None
+        if key is not None:
+            configurations = self._configurations_cache.get(key)
+        if configurations is not None:
+            self.cache_hits += 1
+            return copy.deepcopy(configurations)
+        self.cache_misses += 1
+        revision = self.revision
+        configurations = self._select_configurations(environment, uses)
+        if key is not None:
+            with self._cache_lock:
+                # do not record a selection which may have been made before
+                # a settings modification
+                if revision == self.revision:
+                    self._configurations_cache[key] \
+                        = copy.deepcopy(configurations)
+        return configurations
+
+    def resolve_requirements(self, environment, requirements):
+        '''
+        Match requirements, as returned by
+        :meth:`Process.requirements() <capsul.process.process.Process.requirements>`,
+        against settings: select the configurations of the required modules
+        (see :meth:`select_configurations`) and find the required modules
+        which have no matching configuration.
+
+        Resolutions are cached until settings are modified (see
+        :meth:`clear_cache`), and are thus shared by all processes with the
+        same requirements.
+
+        Returns
+        -------
+        config: dict
+            the selected configurations. This dictionary is shared by all
+            callers: it must not be modified.
+        missing: list
+            keys of requirements for which no configuration is found
+        '''
+        key = self._cache_key(environment, requirements)
+        if key is not None:
+            resolution = self._requirements_cache.get(key)
+            if resolution is not None:
+                return resolution
+        revision = self.revision
+        config = self.select_configurations(environment, uses=requirements)
+        missing = [module for module in requirements
+                   if self.module_name(module) not in config]
+        resolution = (config, missing)
+        if key is not None:
+            with self._cache_lock:
+                if revision == self.revision:
+                    self._requirements_cache[key] = resolution
+        return resolution
+
+    @staticmethod
+    def _cache_key(environment, uses):
+        '''
+        Cache key of a configurations selection, or None if queries cannot
+        be used as a key
+        '''
+        if uses is None:
+            return (environment, None)
+        key = (environment, tuple(sorted(uses.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def _select_configurations(self, environment, uses):
+        '''
+        Select configurations in the database, see
+        :meth:`select_configurations`
         '''
         configurations = {}
         with self as settings:
@@ -247,16 +363,25 @@ class SettingsSession:
     Settings use/modifiction session, returned by "with settings as session:"
     '''
 
-    def __init__(self, populse_session, module_notifiers=None):
+    def __init__(self, populse_session, module_notifiers=None,
+                 on_change=None):
         '''
         SettingsSession are created with Settings.__enter__ using a `with`
         statement.
+
+        on_change, if given, is called without argument each time settings
+        are modified through this session or the configs it returns.
         '''
         self._dbs = populse_session
         if module_notifiers is None:
             self.module_notifiers = {}
         else:
             self.module_notifiers = module_notifiers
+        self._on_change = on_change
+
+    def _changed(self):
+        if self._on_change is not None:
+            self._on_change()
 
     @staticmethod
     def collection_name(module):
@@ -282,12 +407,14 @@ class SettingsSession:
             self._dbs.add_field(collection, 
                                 Settings.environment_field, 
                                 'string', index=True)
+            self._changed()
         for field in fields:
             name = field['name']
             if self._dbs.get_field(collection, name) is None:
                 self._dbs.add_field(collection, name=name,
                                     field_type=field['type'],
                                     description=field['description'])
+                self._changed()
         return collection
     
     def new_config(self, module, environment, values):
@@ -311,7 +438,8 @@ class SettingsSession:
         config = SettingsConfig(
             self._dbs, collection, id,
             notifiers=self.module_notifiers.get(Settings.module_name(module),
-                                                []))
+                                                []),
+            on_change=self._on_change)
         config.notify()
         return config
 
@@ -322,6 +450,7 @@ class SettingsSession:
         '''
         collection = self.collection_name(module)
         self._dbs.remove_document(collection, config_id)
+        self._changed()
 
     def configs(self, module, environment, selection=None):
         '''
@@ -343,7 +472,8 @@ class SettingsSession:
                 yield SettingsConfig(
                     self._dbs, collection, id,
                     notifiers=self.module_notifiers.get(Settings.module_name(
-                        module), []))
+                        module), []),
+                    on_change=self._on_change)
 
     def config(self, module, environment, selection=None, any=True):
         '''
@@ -402,11 +532,13 @@ class SettingsSession:
         return environments
 
 class SettingsConfig(object):
-    def __init__(self, populse_session, collection, id, notifiers=[]):
+    def __init__(self, populse_session, collection, id, notifiers=[],
+                 on_change=None):
         super(SettingsConfig, self).__setattr__('_dbs', populse_session)
         super(SettingsConfig, self).__setattr__('_collection', collection)
         super(SettingsConfig, self).__setattr__('_id', id)
         super(SettingsConfig, self).__setattr__('_notifiers', notifiers)
+        super(SettingsConfig, self).__setattr__('_on_change', on_change)
 
     def __setattr__(self, name, value):
         if getattr(self, name) != value:
@@ -427,6 +559,8 @@ class SettingsConfig(object):
                 self.notify(name, value)
 
     def notify(self, name=None, value=None):
+        if self._on_change is not None:
+            self._on_change()
         for notifier in self._notifiers:
             notifier(name, value)
     
@@ -10,13 +10,36 @@ import sys
 import os.path as osp
 import shutil
 import json
+import time
 
 from capsul.api import capsul_engine
 from capsul.api import Process, Pipeline
 from capsul.engine import activate_configuration
+from capsul.engine import WorkflowExecutionError
+from capsul.engine.database_json import JSONDBEngine
+from capsul.engine.database_sqlite import SQLiteDBEngine
+from capsul.engine.database_populse import PopulseDBEngine
 from capsul import engine
 from soma_workflow import configuration as swconfig
-from traits.api import File
+from traits.api import File, Int, Float
+
+
+class SleepProcess(Process):
+    duration = Float(optional=False)
+
+    def _run_process(self):
+        time.sleep(self.duration)
+
+
+class WriteProcess(Process):
+    value = Int(optional=False)
+    output_file = File(output=True)
+
+    def _run_process(self):
+        if self.value < 0:
+            raise ValueError('negative value')
+        with open(self.output_file, 'w') as f:
+            f.write(str(self.value))
 
 
 def setUpModule():
@@ -193,6 +216,63 @@ class TestCapsulEngine(unittest.TestCase):
                     {'capsul.engine.module.spm': 'version=="12"',
                      'capsul.engine.module.matlab': 'any'}}})
 
+    def test_settings_cache(self):
+        cif = self.ce.settings.config_id_field
+        settings = self.ce.settings
+        with settings as session:
+            fsl = session.new_config('fsl', 'global', {cif: '5'})
+            fsl.directory = '/there'
+        uses = {'fsl': '%s == "5"' % cif}
+        misses = settings.cache_misses
+        conf = settings.select_configurations('global', uses=uses)
+        for i in range(100):
+            conf2 = settings.select_configurations('global', uses=uses)
+        self.assertEqual(settings.cache_misses, misses + 1)
+        self.assertEqual(conf2, conf)
+        self.assertEqual(conf['capsul.engine.module.fsl']['directory'],
+                         '/there')
+        # returned configurations are copies
+        conf2['capsul.engine.module.fsl']['directory'] = '/elsewhere'
+        conf2 = settings.select_configurations('global', uses=uses)
+        self.assertEqual(conf2['capsul.engine.module.fsl']['directory'],
+                         '/there')
+        # modifications invalidate the cache
+        with settings as session:
+            session.config('fsl', 'global', uses['fsl']).directory = '/here'
+        conf2 = settings.select_configurations('global', uses=uses)
+        self.assertEqual(conf2['capsul.engine.module.fsl']['directory'],
+                         '/here')
+        with settings as session:
+            session.remove_config('fsl', 'global', '5')
+        self.assertEqual(
+            settings.select_configurations('global', uses=uses),
+            {'capsul_engine':
+                {'uses': {'capsul.engine.module.fsl': uses['fsl']}}})
+
+    def test_requirements_cache(self):
+        settings = self.ce.settings
+        process1 = self.ce.get_process_instance(MatlabProcess)
+        process2 = self.ce.get_process_instance(MatlabProcess)
+        self.assertEqual(process1.check_requirements(), None)
+        revision = settings.revision
+        with settings as session:
+            session.new_config('matlab', 'global',
+                               {'executable': '/bin/false'})
+        self.assertTrue(settings.revision > revision)
+        config, missing = settings.resolve_requirements('global',
+                                                        {'matlab': 'any'})
+        self.assertEqual(missing, [])
+        self.assertTrue(settings.resolve_requirements(
+            'global', {'matlab': 'any'})[0] is config)
+        conf1 = process1.check_requirements()
+        conf2 = process2.check_requirements()
+        self.assertEqual(conf1, config)
+        self.assertEqual(conf2, config)
+        # each process gets its own copy
+        self.assertTrue(conf1 is not config)
+        conf1['capsul.engine.module.matlab']['executable'] = '/bin/true'
+        self.assertEqual(process2.check_requirements(), config)
+
     def test_fsl_config(self):
         # fake the FSL "bet" command to have test working without FSL installed
         path = os.environ.get('PATH')
@@ -372,6 +452,217 @@ print(sys.argv)
             #print('tdir:', tdir)
             shutil.rmtree(tdir)
 
+    def test_execution_history(self):
+        tdir = tempfile.mkdtemp(prefix='capsul_history')
+        ce = self.ce
+        try:
+            proc = ce.get_process_instance(
+                'capsul.engine.test.test_capsul_engine.WriteProcess')
+            proc.output_file = osp.join(tdir, 'out.txt')
+            ce.check_call(proc, value=2)
+            # the record is found from the workflow id
+            self.assertEqual(
+                ce.history_entry(ce.history(proc)[0]['workflow_id'])['status'],
+                'done')
+            proc.value = -1
+            self.assertRaises(WorkflowExecutionError, ce.check_call, proc)
+            ce.check_call(proc, history=False, value=3)
+
+            history = ce.history(proc)
+            self.assertEqual(len(history), 2)
+            failed, done = history
+            self.assertEqual(done['status'], 'done')
+            self.assertEqual(failed['status'], 'failed')
+            self.assertEqual(done['parameters']['value'], 2)
+            self.assertEqual(done['output_paths'], [proc.output_file])
+            jobs = dict((job['name'], job) for job in done['jobs'])
+            # the process is the "main" node of the workflow pipeline
+            self.assertEqual(jobs['main']['status'], 'done')
+            self.assertTrue(done['duration'] >= jobs['main']['duration'])
+            self.assertTrue(done['end_time'] >= done['start_time'])
+            self.assertEqual(ce.history_entry(done['execution_id']), done)
+
+            # queries
+            self.assertEqual(ce.history(status='failed'), [failed])
+            self.assertEqual(ce.history(parameters={'value': 2}), [done])
+            self.assertEqual(ce.history(since=failed['start_time']),
+                             [failed])
+            self.assertEqual(ce.history(until=failed['start_time'] - 0.001),
+                             [done])
+            self.assertEqual(ce.history('other.process'), [])
+            self.assertEqual(ce.expected_duration(proc), done['duration'])
+        finally:
+            shutil.rmtree(tdir)
+
+    def test_execution_history_end(self):
+        ce = self.ce
+        proc = ce.get_process_instance(
+            'capsul.engine.test.test_capsul_engine.SleepProcess')
+        proc.duration = 2.
+        wf_id = ce.start(proc)
+        try:
+            ce.wait(wf_id, timeout=0)
+            self.assertEqual(ce.history_entry(wf_id)['status'], 'running')
+            # waiting from another engine using the same database
+            other = capsul_engine(self.sqlite_file)
+            other.wait(wf_id)
+            done = ce.history_entry(wf_id)
+            self.assertEqual(done['status'], 'done')
+            # the end time is the end of the job, not the time of the wait
+            time.sleep(0.5)
+            ce.wait(wf_id)
+            self.assertEqual(ce.history_entry(wf_id), done)
+            job = done['jobs'][0]
+            self.assertEqual(done['end_time'], job['end_time'])
+            self.assertTrue(done['duration'] >= proc.duration)
+        finally:
+            ce.dispose(wf_id)
+
+        proc.duration = 10.
+        wf_id = ce.start(proc)
+        try:
+            ce.interrupt(wf_id)
+            self.assertEqual(ce.history_entry(wf_id)['status'], 'failed')
+        finally:
+            ce.dispose(wf_id)
+
+    def test_json_history(self):
+        self.check_executions_history(JSONDBEngine(None))
+
+    def check_executions_history(self, db):
+        for i in range(6):
+            db.set_execution({'execution_id': str(i),
+                              'process': 'proc%d' % (i % 2),
+                              'status': 'failed' if i == 4 else 'done',
+                              'start_time': 1000. + i,
+                              'workflow_id': 10 + i % 3,
+                              'parameters': {'a': i % 3, 'b': [1, 2]}})
+        ids = lambda executions: [e['execution_id'] for e in executions]
+        self.assertEqual(ids(db.executions()), ['5', '4', '3', '2', '1', '0'])
+        self.assertEqual(ids(db.executions(process='proc0', limit=2)),
+                         ['4', '2'])
+        self.assertEqual(ids(db.executions(process=['proc0', 'proc1'],
+                                           status='failed')), ['4'])
+        self.assertEqual(ids(db.executions(parameters={'a': 1, 'b': [1, 2]})),
+                         ['4', '1'])
+        self.assertEqual(ids(db.executions(since=1002, until=1003.5)),
+                         ['3', '2'])
+        self.assertEqual(ids(db.executions(workflow_id=11)), ['4', '1'])
+        self.assertEqual(ids(db.executions(workflow_id=[10, 12], limit=3)),
+                         ['5', '3', '2'])
+        db.update_execution('4', {'status': 'done', 'parameters': {'a': 0}})
+        self.assertEqual(ids(db.executions(status='failed')), [])
+        self.assertEqual(ids(db.executions(parameters={'a': 1})), ['1'])
+        db.remove_execution('1')
+        self.assertEqual(db.execution('1'), None)
+        self.assertEqual(ids(db.executions(parameters={'a': 0})),
+                         ['4', '3', '0'])
+
+    def test_json_path_metadata(self):
+        json_file = tempfile.mktemp(suffix='.json')
+        try:
+            db = JSONDBEngine(json_file)
+            db.set_named_directory('data', '/data')
+            db.set_path_metadata('/data/s1/t1.nii', {'subject': 's1'})
+            db.commit()
+            db = JSONDBEngine(json_file)
+            self.assertEqual(db.path_metadata('s1/t1.nii', 'data'),
+                             {'subject': 's1', 'path': 's1/t1.nii',
+                              'named_directory': 'data'})
+        finally:
+            if os.path.exists(json_file):
+                os.remove(json_file)
+
+    def test_bulk_metadata(self):
+        for db in (JSONDBEngine(None), SQLiteDBEngine(':memory:'),
+                   PopulseDBEngine('sqlite:///:memory:')):
+            db.set_named_directory('data', '/data')
+            db.set_named_directory('derivatives', '/data/derivatives')
+            items = [('/data/s%d/t1_%d.nii' % (i % 5, i),
+                      {'subject': 's%d' % (i % 5), 'index': i})
+                     for i in range(50)]
+            items.append(('/data/derivatives/s0/t1.nii', {'subject': 's0'}))
+            items.append(('/other/t1.nii', {'subject': 's1'}))
+            db.set_paths_metadata(items)
+            metadata = db.paths_metadata([path for path, m in items]
+                                         + ['/data/unknown.nii'])
+            self.assertEqual([m['subject'] for m in metadata[:-1]],
+                             [m['subject'] for p, m in items])
+            self.assertEqual(metadata[-1], None)
+            # the deepest named directory is used
+            self.assertEqual(
+                (metadata[-3]['named_directory'], metadata[-3]['path']),
+                ('derivatives', 's0/t1.nii'))
+            self.assertEqual(
+                (metadata[-2]['named_directory'], metadata[-2]['path']),
+                ('absolute', '/other/t1.nii'))
+            self.assertEqual(db.paths_metadata(['s1/t1_1.nii'], 'data'),
+                             [metadata[1]])
+            self.assertEqual(len(db.query_metadata({'subject': 's0'})), 11)
+            self.assertEqual(
+                sorted(m['index'] for m in db.query_metadata(
+                    {'subject': ['s0', 's1'], 'index': [0, 1, 2]})),
+                [0, 1])
+            self.assertEqual(
+                len(db.query_metadata({'subject': 's0'},
+                                      named_directory='data')), 10)
+            db.set_paths_metadata({'/other/t1.nii': {'subject': 's2'}})
+            self.assertEqual(db.query_metadata(named_directory='absolute'),
+                             [{'subject': 's2', 'path': '/other/t1.nii',
+                               'named_directory': 'absolute'}])
+
+    def test_sqlite3_database(self):
+        tmp_dir = tempfile.mkdtemp(prefix='capsul_test_db')
+        try:
+            db_file = osp.join(tmp_dir, 'engine.sqlite')
+            ce = capsul_engine('sqlite3:%s' % db_file)
+            db = ce.database
+            self.assertTrue(isinstance(db, SQLiteDBEngine))
+            self.assertEqual(db.named_directory('capsul_engine'), tmp_dir)
+            db.set_named_directory('data', '/data')
+            db.set_json_value('value', {'a': [1, 2]})
+            db.batch_size = 10
+            for i in range(25):
+                db.set_path_metadata('/data/s%d/t1.nii' % i,
+                                     {'subject': 's%d' % i})
+            # buffered metadata are visible before they are written
+            self.assertEqual(db.path_metadata('s24/t1.nii', 'data'),
+                             {'subject': 's24', 'path': 's24/t1.nii',
+                              'named_directory': 'data'})
+            self.assertEqual(len(db._pending_metadata), 5)
+            db.rollback()
+            self.assertEqual(db.path_metadata('/data/s24/t1.nii'), None)
+            self.assertEqual(db.path_metadata('/data/s19/t1.nii')['subject'],
+                             's19')
+            db.set_path_metadata('/data/s24/t1.nii', {'subject': 's24'})
+            db.commit()
+            with ce.settings as session:
+                fsl = session.new_config('fsl', 'global',
+                                         {ce.settings.config_id_field: '5'})
+                fsl.directory = '/there'
+            db.close()
+            ce = None
+            gc.collect()
+
+            ce = capsul_engine('sqlite3:%s' % db_file)
+            db = ce.database
+            self.assertEqual(db.json_value('value'), {'a': [1, 2]})
+            self.assertEqual(db.named_directory('data'), '/data')
+            self.assertEqual(db.path_metadata('/data/s24/t1.nii')['subject'],
+                             's24')
+            self.assertEqual(db.path_metadata('/data/s3/t1.nii')['subject'],
+                             's3')
+            conf = ce.settings.select_configurations(
+                'global', uses={'fsl': 'config_id == "5"'})
+            self.assertEqual(conf['capsul.engine.module.fsl']['directory'],
+                             '/there')
+            self.check_executions_history(db)
+            db.close()
+            ce = None
+            gc.collect()
+        finally:
+            shutil.rmtree(tmp_dir)
+
 
 def test():
     suite = unittest.TestLoader().loadTestsFromTestCase(TestCapsulEngine)
@@ -99,8 +99,8 @@ class MapNode(Node):
             self.add_trait(pname, ptype)
             plug = Plug(name=output % i, optional=True, output=True)
             self.plugs[pname] = plug
-            plug.on_trait_change(
-                self.pipeline.update_nodes_and_plugs_activation, "enabled")
+            plug.on_trait_change(self._activation_changed, "enabled")
+            self.pipeline._set_activation_dirty([self])
         for i, val in enumerate(value):
             setattr(self, output % i, val)
         # update lengths
@@ -114,8 +114,8 @@ class ReduceNode(Node):
                 self.add_trait(pname, ptype2)
                 plug = Plug(name=pname, optional=False, output=False)
                 self.plugs[pname] = plug
-                plug.on_trait_change(
-                    self.pipeline.update_nodes_and_plugs_activation, "enabled")
+                plug.on_trait_change(self._activation_changed, "enabled")
+                self.pipeline._set_activation_dirty([self])
             if oval != val:
                 ovalue = [getattr(self, pname_p % i) for i in range(val)]
                 if isinstance(ptype,
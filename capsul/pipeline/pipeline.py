@@ -12,12 +12,16 @@ from __future__ import absolute_import
 
 # System import
 import logging
+import itertools
 from copy import deepcopy
 import tempfile
 import os
 import shutil
 import sys
+import threading
+import weakref
 import six
+from collections import OrderedDict
 from soma.utils.weak_proxy import weak_proxy, get_ref
 from six.moves import range
 from six.moves import zip
@@ -39,7 +43,9 @@ except ImportError:
 from capsul.process.process import Process, NipypeProcess
 from .topological_sort import GraphNode
 from .topological_sort import Graph
+from .topological_sort import DependencyIndex
 from .pipeline_nodes import Plug
+from .pipeline_nodes import Node
 from .pipeline_nodes import ProcessNode
 from .pipeline_nodes import PipelineNode
 from .pipeline_nodes import Switch
@@ -52,6 +58,13 @@ from soma.controller.trait_utils import relax_exists_constraint
 from soma.sorted_dictionary import SortedDictionary
 from soma.utils.functiontools import SomaPartial
 
+# Pipeline.add_process asks the next pipeline instantiated in the current
+# thread to be built lazily (see Pipeline.lazy_sub_pipelines)
+_lazy_construction = threading.local()
+# exported parameters of pipelines classes, used to build lazy instances:
+# {pipeline_class: {autoexport_nodes_parameters: [(name, trait, value)]}}
+_lazy_signatures = weakref.WeakKeyDictionary()
+
 class Pipeline(Process):
     """ Pipeline containing Process nodes, and links between node parameters.
 
@@ -159,6 +172,18 @@ class Pipeline(Process):
     * :meth:`find_empty_parameters`
     * :meth:`count_items`
 
+    **Lazy sub-pipelines**
+
+    When :py:attr:`lazy_sub_pipelines` is True (on a pipeline class, or on
+    the base Pipeline class to enable it everywhere), sub-pipelines added
+    through :meth:`add_process` are built lazily: they only expose their
+    exported parameters, and their inner nodes are built the first time
+    their :py:attr:`nodes` are accessed (which activation, completion and
+    workflow generation do when they need them). The exported parameters of
+    a pipeline class are recorded when it is instantiated for the first
+    time, so the first instance of each class is fully built. The structure
+    of lazy pipelines thus should not depend on the instance context.
+
     Attributes
     ----------
     nodes: dict {node_name: node}
@@ -206,6 +231,18 @@ class Pipeline(Process):
     # this value to False will make it visible.
     hide_nodes_activation = True
 
+    # Nodes activation is updated incrementally after local changes (switch
+    # value, node enabled...). Setting this to False forces a full update of
+    # the whole pipeline each time.
+    incremental_activation = True
+
+    # Sub-pipelines added by add_process are built lazily, on first access
+    # to their nodes.
+    lazy_sub_pipelines = False
+
+    # True while the nodes of a lazy pipeline have not been built yet
+    _lazy_definition = False
+
     def __init__(self, autoexport_nodes_parameters=None, **kwargs):
         """ Initialize the Pipeline class
 
@@ -225,7 +262,7 @@ class Pipeline(Process):
         # this one is only useful to maintain subprocesses/subpipelines life
         self.list_process_in_pipeline = []
         self.nodes_activation = Controller()
-        self.nodes = SortedDictionary()
+        self._nodes = SortedDictionary()
         self._invalid_nodes = set()
         self._skip_invalid_nodes = set()
         # Get node_position from the Pipeline class if it is
@@ -247,29 +284,109 @@ class Pipeline(Process):
             
             
         self.pipeline_node = PipelineNode(self, '', self)
-        self.nodes[''] = self.pipeline_node
+        self._nodes[''] = self.pipeline_node
         self.do_not_export = set()
         self.parent_pipeline = None
         self._disable_update_nodes_and_plugs_activation = 1
         self._must_update_nodes_and_plugs_activation = False
-        self.pipeline_definition()
-
+        self._activation_dirty_nodes = None
+        self._dependency_index = None
+        self._value_propagation_delay = 0
+        self._delayed_values = OrderedDict()
         self.workflow_repr = ""
         self.workflow_list = []
 
-        if autoexport_nodes_parameters is None:
-            autoexport_nodes_parameters = self.do_autoexport_nodes_parameters
-        if autoexport_nodes_parameters:
-            self.autoexport_nodes_parameters()
+        self._autoexport = autoexport_nodes_parameters
+        lazy = getattr(_lazy_construction, 'enabled', False)
+        _lazy_construction.enabled = False
+        signature = _lazy_signatures.get(type(self), {}).get(
+            autoexport_nodes_parameters)
+        if lazy and signature is not None:
+            self._lazy_definition = True
+            for name, trait, value in signature:
+                if name not in self.user_traits():
+                    self.add_trait(name, self._clone_trait(trait))
+                try:
+                    setattr(self, name, value)
+                except traits.TraitError:
+                    pass
+        else:
+            self._pipeline_definition()
+            if lazy:
+                self._record_lazy_signature()
 
-        # Refresh pipeline activation
+        # Refresh pipeline activation (lazy pipelines are updated by their
+        # parent, once they have been added)
         self._disable_update_nodes_and_plugs_activation -= 1
-        self.update_nodes_and_plugs_activation()
+        if not self._lazy_definition:
+            self.update_nodes_and_plugs_activation()
 
     ##############
     # Methods    #
     ##############
 
+    @property
+    def nodes(self):
+        """ Pipeline nodes: {node_name: node}, the pipeline node name being
+        ''. The nodes of a lazy sub-pipeline are built on first access.
+        """
+        if self._lazy_definition:
+            self._build_lazy_definition()
+        return self._nodes
+
+    @nodes.setter
+    def nodes(self, nodes):
+        self._nodes = nodes
+
+    def _record_lazy_signature(self):
+        """ Record the exported parameters of the pipeline class and their
+        values, in order to build lazy instances of the same class.
+        """
+        signature = []
+        for name, trait in six.iteritems(self.user_traits()):
+            if name in ('nodes_activation', 'pipeline_steps'):
+                continue
+            signature.append((name, trait, deepcopy(getattr(self, name))))
+        _lazy_signatures.setdefault(type(self), {})[self._autoexport] \
+            = signature
+
+    def _pipeline_definition(self):
+        """ Call :meth:`pipeline_definition`, then export the nodes
+        parameters if needed.
+        """
+        self.pipeline_definition()
+        autoexport_nodes_parameters = self._autoexport
+        if autoexport_nodes_parameters is None:
+            # may be changed by pipeline_definition
+            autoexport_nodes_parameters = self.do_autoexport_nodes_parameters
+        if autoexport_nodes_parameters:
+            self.autoexport_nodes_parameters()
+
+    def _build_lazy_definition(self):
+        """ Build the nodes of a lazy pipeline, keeping the values of its
+        parameters and its links in the parent pipeline.
+        """
+        self._lazy_definition = False
+        values = [(name, getattr(self, name))
+                  for name in self.user_traits()
+                  if name not in ('nodes_activation', 'pipeline_steps')]
+        self.delay_update_nodes_and_plugs_activation()
+        self._materializing = True
+        try:
+            self._pipeline_definition()
+        finally:
+            self._materializing = False
+        # pipeline_definition may have set parameters values
+        for name, value in values:
+            if getattr(self, name) != value:
+                try:
+                    setattr(self, name, value)
+                except traits.TraitError:
+                    pass
+        self._dependency_index = None
+        self._set_activation_dirty(None)
+        self.restore_update_nodes_and_plugs_activation()
+
     def pipeline_definition(self):
         """ Define pipeline structure, nodes, sub-pipelines, switches, and
         links.
@@ -319,6 +436,11 @@ class Pipeline(Process):
         trait: trait instance (mandatory)
             the trait we want to add
         """
+        if getattr(self, '_materializing', False) \
+                and name in self.user_traits():
+            # already defined in a lazy pipeline which nodes are being built
+            return
+
         # Add the trait
         super(Pipeline, self).add_trait(name, trait)
         #self.get(name)
@@ -329,8 +451,9 @@ class Pipeline(Process):
             optional = bool(trait.optional)
             plug = Plug(output=output, optional=optional)
             self.pipeline_node.plugs[name] = plug
-            plug.on_trait_change(self.update_nodes_and_plugs_activation,
+            plug.on_trait_change(self.pipeline_node._activation_changed,
                                  'enabled')
+            self._set_activation_dirty([self.pipeline_node])
 
     def remove_trait(self, name):
         """ Remove a trait to the pipeline
@@ -379,8 +502,9 @@ class Pipeline(Process):
         if pipeline_name is None:
             pipeline_name = self.name
         process.context_name = '.'.join([pipeline_name, name])
-        # do it recursively if process is a pipeline
-        if isinstance(process, Pipeline):
+        # do it recursively if process is a pipeline (lazy pipelines will
+        # set it when their nodes are built)
+        if isinstance(process, Pipeline) and not process._lazy_definition:
             todo = [process]
             while todo:
                 cur_proc = todo.pop(0)
@@ -391,7 +515,8 @@ class Pipeline(Process):
                     if sub_proc is not None:
                         sub_proc.context_name \
                             = '.'.join([cur_proc.context_name, nname])
-                        if isinstance(sub_proc, Pipeline):
+                        if isinstance(sub_proc, Pipeline) \
+                                and not sub_proc._lazy_definition:
                             todo.append(sub_proc)
 
     def add_process(self, name, process, do_not_export=None,
@@ -480,9 +605,13 @@ class Pipeline(Process):
             self._skip_invalid_nodes.add(name)
         # Create a process node
         try:
-            process = get_process_instance(process,
-                                           study_config=self.study_config,
-                                           **kwargs)
+            _lazy_construction.enabled = self.lazy_sub_pipelines
+            try:
+                process = get_process_instance(process,
+                                               study_config=self.study_config,
+                                               **kwargs)
+            finally:
+                _lazy_construction.enabled = False
         except Exception:
             if skip_invalid:
                 process = None
@@ -506,6 +635,8 @@ class Pipeline(Process):
 
         # Create the pipeline node
         if isinstance(process, Pipeline):
+            if self.lazy_sub_pipelines:
+                process.lazy_sub_pipelines = True
             node = process.pipeline_node
             node.name = name
             node.pipeline = self
@@ -513,6 +644,7 @@ class Pipeline(Process):
         else:
             node = ProcessNode(self, name, process)
         self.nodes[name] = node
+        self._dependency_index = None
 
         # If a default value is given to a parameter, change the corresponding
         # plug so that it gets activated even if not linked
@@ -544,6 +676,8 @@ class Pipeline(Process):
 
         # Add new node in pipeline process list to keep its life
         self.list_process_in_pipeline.append(process)
+        # the pipeline structure has changed
+        self._set_activation_dirty()
 
     def remove_node(self, node_name):
         """ Remove a node from the pipeline
@@ -563,11 +697,14 @@ class Pipeline(Process):
                                  % (node_name, plug_name, dst_node, dst_plug)
                     self.remove_link(link_descr)
         del self.nodes[node_name]
+        self._dependency_index = None
         if hasattr(node, 'process'):
             self.list_process_in_pipeline.remove(node.process)
             self.nodes_activation.on_trait_change(
                 self._set_node_enabled, node_name, remove=True)
             self.nodes_activation.remove_trait(node_name)
+        # the pipeline structure has changed
+        self._set_activation_dirty()
 
     def add_iterative_process(self, name, process, iterative_plugs=None,
                               do_not_export=None, make_optional=None,
@@ -704,6 +841,7 @@ class Pipeline(Process):
         if opt_nodes:
             node._optional_input_nodes = opt_inputs
         self.nodes[name] = node
+        self._dependency_index = None
 
         # Export the switch controller to the pipeline node
         if export_switch:
@@ -716,6 +854,8 @@ class Pipeline(Process):
         study_config = getattr(self, 'study_config', None)
         if study_config:
             node.set_study_config(study_config)
+        # the pipeline structure has changed
+        self._set_activation_dirty()
 
     def add_optional_output_switch(self, name, input, output=None):
         """ Add an optional output switch node in the pipeline
@@ -776,11 +916,14 @@ class Pipeline(Process):
         # Create the node
         node = OptionalOutputSwitch(self, name, input, output)
         self.nodes[name] = node
+        self._dependency_index = None
 
         self._set_subprocess_context_name(node, name)
         study_config = getattr(self, 'study_config', None)
         if study_config:
             node.set_study_config(study_config)
+        # the pipeline structure has changed
+        self._set_activation_dirty()
 
     def add_custom_node(self, name, node_type, parameters=None,
                         make_optional=(), do_not_export=None, **kwargs):
@@ -819,6 +962,7 @@ class Pipeline(Process):
                 "could not build a Node of type '%s' with the given parameters"
                 % node_type)
         self.nodes[name] = node
+        self._dependency_index = None
 
         do_not_export = set(do_not_export or [])
         do_not_export.update(kwargs)
@@ -841,6 +985,9 @@ class Pipeline(Process):
         if study_config:
             node.set_study_config(study_config)
 
+        # the pipeline structure has changed
+        self._set_activation_dirty()
+
         return node
 
     def parse_link(self, link):
@@ -1021,6 +1168,7 @@ class Pipeline(Process):
                                   dest_plug, weak_link))
         dest_plug.links_from.add((source_node_name, source_plug_name,
                                   source_node, source_plug, weak_link))
+        self._dependency_index = None
 
         # Set a connected_output property
         if (isinstance(dest_node, ProcessNode) and
@@ -1043,7 +1191,7 @@ class Pipeline(Process):
         dest_node.connect(dest_plug_name, source_node, source_plug_name)
 
         # Refresh pipeline activation
-        self.update_nodes_and_plugs_activation()
+        self.update_nodes_activation_from([source_node, dest_node])
 
     def remove_link(self, link):
         """ Remove a link between pipeline nodes
@@ -1084,6 +1232,7 @@ class Pipeline(Process):
                                       source_node, source_plug, True))
         dest_plug.links_from.discard((source_node_name, source_plug_name,
                                       source_node, source_plug, False))
+        self._dependency_index = None
 
         # Set a connected_output property
         if (isinstance(dest_node, ProcessNode) and
@@ -1097,7 +1246,7 @@ class Pipeline(Process):
         dest_node.disconnect(dest_plug_name, source_node, source_plug_name)
 
         # Refresh pipeline activation
-        self.update_nodes_and_plugs_activation()
+        self.update_nodes_activation_from([source_node, dest_node])
 
     def export_parameter(self, node_name, plug_name,
                          pipeline_parameter=None, weak_link=False,
@@ -1142,6 +1291,23 @@ class Pipeline(Process):
             raise ValueError("Node {0} ({1}) has no parameter "
                              "{2}".format(node_name, node.name, plug_name))
 
+        if getattr(self, '_materializing', False) \
+                and pipeline_parameter in self.user_traits():
+            # the parameter exists in a lazy pipeline which nodes are being
+            # built: just link it, its value is given to the node
+            if self.trait(pipeline_parameter).output:
+                self.add_link("{0}.{1}->{2}".format(
+                    node_name, plug_name, pipeline_parameter), weak_link)
+            else:
+                self.add_link("{0}->{1}.{2}".format(
+                    pipeline_parameter, node_name, plug_name), weak_link)
+            try:
+                node.set_plug_value(plug_name,
+                                    getattr(self, pipeline_parameter))
+            except traits.TraitError:
+                pass
+            return
+
         # Check the the pipeline parameter name is not already used
         if pipeline_parameter in self.user_traits():
             raise ValueError(
@@ -1208,7 +1374,8 @@ class Pipeline(Process):
         for node in six.itervalues(self.nodes):
             yield node
             if (isinstance(node, PipelineNode) and
-               node is not self.pipeline_node):
+               node is not self.pipeline_node and
+               not node.process._lazy_definition):
                 for sub_node in node.process.all_nodes():
                     if sub_node is not node:
                         yield sub_node
@@ -1330,7 +1497,8 @@ class Pipeline(Process):
                             continue
                         output = plug.output
                         if (isinstance(node, PipelineNode) and
-                          node is not self.pipeline_node and output):
+                          node is not self.pipeline_node and output and
+                          not node.process._lazy_definition):
                             plug_activated = (
                                 check_plug_activation(plug, plug.links_to) and
                                 check_plug_activation(plug, plug.links_from))
@@ -1366,6 +1534,85 @@ class Pipeline(Process):
                         plugs_deactivated.append((plug_name, plug))
         return plugs_deactivated
 
+    def set_parameters_batch(self, parameters):
+        """ Set several parameters values at once, and propagate them through
+        links in batch (see :meth:`delay_value_propagation`).
+
+        Parameters
+        ----------
+        parameters: dict
+            {parameter_name: value}
+        """
+        self.delay_value_propagation()
+        try:
+            for name, value in six.iteritems(parameters):
+                self.set_parameter(name, value)
+        finally:
+            self.restore_value_propagation()
+
+    def delay_value_propagation(self):
+        """ Delay the propagation of values through links until
+        :meth:`restore_value_propagation` is called (calls may be nested).
+
+        Values are recorded instead of being propagated. When propagation is
+        restored, each plug which has received values is set once, with the
+        last one, and the values it propagates in turn are handled the same
+        way. Lists which have already been validated by a list trait with the
+        same items type as the destination one are copied without validating
+        their items again.
+        """
+        if getattr(self, 'parent_pipeline', None) is not None:
+            # Only the top level pipeline can manage propagation
+            self.parent_pipeline.delay_value_propagation()
+            return
+        self._value_propagation_delay += 1
+
+    def restore_value_propagation(self):
+        """ Restore values propagation delayed by
+        :meth:`delay_value_propagation`, and propagate recorded values.
+        """
+        if getattr(self, 'parent_pipeline', None) is not None:
+            # Only the top level pipeline can manage propagation
+            self.parent_pipeline.restore_value_propagation()
+            return
+        if self._value_propagation_delay > 1:
+            self._value_propagation_delay -= 1
+            return
+        try:
+            # propagation stays delayed while recorded values are set: plugs
+            # reached by these values are recorded for the next round
+            while self._delayed_values:
+                delayed_values = self._delayed_values
+                self._delayed_values = OrderedDict()
+                for (dest_node, dest_plug_name), (value, protected) \
+                        in six.iteritems(delayed_values):
+                    Node._propagate_value(dest_node, dest_plug_name, value,
+                                          protected, copy_lists=True)
+        finally:
+            self._delayed_values = OrderedDict()
+            self._value_propagation_delay = 0
+
+    def _propagation_delayed(self, dest_node, dest_plug_name, value,
+                             protected):
+        """ Record a value propagated through a link if propagation is
+        delayed, see :meth:`delay_value_propagation`.
+
+        Returns
+        -------
+        delayed: bool
+            False if the value has to be propagated now.
+        """
+        pipeline = self
+        while getattr(pipeline, 'parent_pipeline', None) is not None:
+            pipeline = pipeline.parent_pipeline
+        if not getattr(pipeline, '_value_propagation_delay', 0):
+            return False
+        key = (get_ref(dest_node), dest_plug_name)
+        # the last value is kept, and set after the other ones
+        pipeline._delayed_values.pop(key, None)
+        pipeline._delayed_values[key] = (value, protected)
+        return True
+
     def delay_update_nodes_and_plugs_activation(self):
         if self.parent_pipeline is not None:
             # Only the top level pipeline can manage activations
@@ -1383,7 +1630,23 @@ class Pipeline(Process):
         self._disable_update_nodes_and_plugs_activation -= 1
         if self._disable_update_nodes_and_plugs_activation == 0 and \
                 self._must_update_nodes_and_plugs_activation:
-            self.update_nodes_and_plugs_activation()
+            self._update_nodes_and_plugs_activation()
+
+    def _set_activation_dirty(self, nodes=None):
+        """ Record nodes which activation has to be checked again at the next
+        activation update. If nodes is None, the whole pipeline has to be
+        recomputed (this is the case after a structural change such as a node
+        insertion or removal).
+        """
+        if self.parent_pipeline is not None:
+            # Only the top level pipeline can manage activations
+            self.parent_pipeline._set_activation_dirty(nodes)
+            return
+        if nodes is None or self._activation_dirty_nodes is None:
+            self._activation_dirty_nodes = None
+        else:
+            self._activation_dirty_nodes.update(get_ref(node)
+                                                for node in nodes)
 
     def update_nodes_and_plugs_activation(self):
         """ Reset all nodes and plugs activations according to the current
@@ -1393,43 +1656,70 @@ class Pipeline(Process):
         if not hasattr(self, 'parent_pipeline'):
             # self is being initialized (the call comes from self.__init__).
             return
+        self._set_activation_dirty(None)
+        self._update_nodes_and_plugs_activation()
+
+    def update_nodes_activation_from(self, nodes):
+        """ Update nodes and plugs activations after a local change.
+
+        The given nodes (or their plugs, or their links) have changed their
+        state. Activations are re-propagated only from these nodes through the
+        part of the pipeline which is actually affected by the change, which
+        is much faster than :meth:`update_nodes_and_plugs_activation` on large
+        pipelines, and gives the same result.
+
+        Parameters
+        ----------
+        nodes: sequence of Node
+            nodes which enabled state, plugs enabled state, or links have
+            changed.
+        """
+        if not hasattr(self, 'parent_pipeline'):
+            # self is being initialized (the call comes from self.__init__).
+            return
+        self._set_activation_dirty(nodes)
+        self._update_nodes_and_plugs_activation()
+
+    def _update_nodes_and_plugs_activation(self):
+        """ Perform pending activation updates, either on the whole pipeline
+        or incrementally from dirty nodes.
+        """
         if self.parent_pipeline is not None:
             # Only the top level pipeline can manage activations
-            self.parent_pipeline.update_nodes_and_plugs_activation()
+            self.parent_pipeline._update_nodes_and_plugs_activation()
             return
         if self._disable_update_nodes_and_plugs_activation:
             self._must_update_nodes_and_plugs_activation = True
             return
 
+        dirty_nodes = self._activation_dirty_nodes
+        self._activation_dirty_nodes = set()
         self._disable_update_nodes_and_plugs_activation += 1
+        try:
+            debug = getattr(self, '_debug_activations', None)
+            if dirty_nodes is None or debug \
+                    or not self.incremental_activation \
+                    or not self._update_activation_incremental(dirty_nodes):
+                self._update_activation_full(debug)
+        finally:
+            self._disable_update_nodes_and_plugs_activation -= 1
+
+    def _propagate_activation_forward(self, nodes, region=None, debug=None):
+        """ Forward activation sweep: try to activate nodes (and their input
+        plugs) and propagate activations to neighbours of activated plugs.
 
-        debug = getattr(self, '_debug_activations', None)
-        if debug:
-            debug = open(debug, 'w')
-            print(self.id, file=debug)
-
-        # Remember all links that are inactive (i.e. at least one of the two
-        # plugs is inactive) in order to execute a callback if they become
-        # active (see at the end of this method)
-        inactive_links = []
-        for node in self.all_nodes():
-            for source_plug_name, source_plug in six.iteritems(node.plugs):
-                for nn, pn, n, p, weak_link in source_plug.links_to:
-                    if not source_plug.activated or not p.activated:
-                        inactive_links.append((node, source_plug_name,
-                                               source_plug, n, pn, p))
-
-        # Initialization : deactivate all nodes and their plugs
-        for node in self.all_nodes():
-            node.activated = False
-            for plug_name, plug in six.iteritems(node.plugs):
-                plug.activated = False
-
-        # Forward activation : try to activate nodes (and their input plugs)
-        # and propagate activations neighbours of activated plugs
-
-        # Starts iterations with all nodes
-        nodes_to_check = set(self.all_nodes())
+        Parameters
+        ----------
+        nodes: list of Node
+            nodes to start the sweep with. Their activation state should
+            have been reset before.
+        region: set of Node (optional)
+            if given, propagation is restricted to these nodes: nodes outside
+            of the region keep their current state.
+        debug: file (optional)
+            activations debug log stream
+        """
+        nodes_to_check = set(nodes)
         iteration = 1
         while nodes_to_check:
             new_nodes_to_check = set()
@@ -1440,19 +1730,25 @@ class Pipeline(Process):
                         print('%d+%s:%s' % (
                             iteration, node.full_name, plug_name), file=debug)
                     for nn, pn, n, p, weak_link in \
-                            plug.links_to.union(plug.links_from):
+                            itertools.chain(plug.links_to, plug.links_from):
                         if not weak_link and p.enabled:
                             new_nodes_to_check.add(n)
                 if (not node_activated) and node.activated:
                     if debug:
                         print('%d+%s' % (iteration, node.full_name),
                               file=debug)
+            if region is not None:
+                new_nodes_to_check.intersection_update(region)
             nodes_to_check = new_nodes_to_check
             iteration += 1
 
-        # Backward deactivation : deactivate plugs that should not been
-        # activated and propagate deactivation to neighbouring plugs
-        nodes_to_check = set(self.all_nodes())
+    def _propagate_activation_backward(self, nodes, region=None, debug=None):
+        """ Backward deactivation sweep: deactivate plugs that should not been
+        activated and propagate deactivation to neighbouring plugs.
+
+        Parameters are the same as in :meth:`_propagate_activation_forward`.
+        """
+        nodes_to_check = set(nodes)
         iteration = 1
         while nodes_to_check:
             new_nodes_to_check = set()
@@ -1468,7 +1764,8 @@ class Pipeline(Process):
                                 iteration, node.full_name, plug_name),
                                 file=debug)
                         for nn, pn, n, p, weak_link in \
-                                plug.links_from.union(plug.links_to):
+                                itertools.chain(plug.links_from,
+                                                plug.links_to):
                             if p.activated:
                                 new_nodes_to_check.add(n)
                     if not node.activated:
@@ -1486,12 +1783,48 @@ class Pipeline(Process):
                                         iteration, node.full_name, plug_name),
                                         file=debug)
                                 for nn, pn, n, p, weak_link in \
-                                        plug.links_from.union(plug.links_to):
+                                        itertools.chain(plug.links_from,
+                                                        plug.links_to):
                                     if p.activated:
                                         new_nodes_to_check.add(n)
+            if region is not None:
+                new_nodes_to_check.intersection_update(region)
             nodes_to_check = new_nodes_to_check
             iteration += 1
 
+    def _update_activation_full(self, debug=None):
+        """ Recompute activations of all nodes and plugs from scratch.
+        """
+        if debug:
+            debug = open(debug, 'w')
+            print(self.id, file=debug)
+
+        # Remember all links that are inactive (i.e. at least one of the two
+        # plugs is inactive) in order to execute a callback if they become
+        # active (see at the end of this method)
+        inactive_links = []
+        for node in self.all_nodes():
+            for source_plug_name, source_plug in six.iteritems(node.plugs):
+                for nn, pn, n, p, weak_link in source_plug.links_to:
+                    if not source_plug.activated or not p.activated:
+                        inactive_links.append((node, source_plug_name,
+                                               source_plug, n, pn, p))
+
+        # Initialization : deactivate all nodes and their plugs
+        all_nodes = list(self.all_nodes())
+        for node in all_nodes:
+            node.activated = False
+            for plug_name, plug in six.iteritems(node.plugs):
+                plug.activated = False
+
+        # Starts iterations with all nodes
+        self._propagate_activation_forward(all_nodes, debug=debug)
+        # the forward activation state is kept for incremental updates
+        self._forward_activation = dict(
+            (plug, plug.activated) for node in all_nodes
+            for plug in six.itervalues(node.plugs))
+        self._propagate_activation_backward(all_nodes, debug=debug)
+
         # Denis 2020/01/03: I don't understand the reason for hidding
         # parameters of inactive plugs: they still get a value (default or
         # forced). So I comment the following out until we make it clear why
@@ -1522,11 +1855,162 @@ class Pipeline(Process):
                 node._callbacks[(source_plug_name, n, pn)](value)
 
         # Refresh views relying on plugs and nodes selection
-        for node in self.all_nodes():
+        for node in all_nodes:
             if isinstance(node, PipelineNode):
                 node.process.selection_changed = True
 
-        self._disable_update_nodes_and_plugs_activation -= 1
+    def _update_activation_incremental(self, dirty_nodes):
+        """ Recompute activations in the region of the pipeline affected by
+        changes on dirty_nodes.
+
+        The region starts with the dirty nodes. Activations are reset and
+        propagated inside the region, nodes outside of it keeping their
+        state (the forward sweep uses the forward activation state recorded
+        during the last update, the backward sweep the final one). If a plug
+        of the region has changed its state (either after
+        the forward sweep or after the backward one), the neighbouring nodes
+        may have to change too: they are added to the region, and the
+        propagation is done again, until the region border is stable. Plugs
+        which are activated by the forward sweep and deactivated by the
+        backward one may also keep each other activated across the border:
+        their nodes are also added to the region.
+
+        Returns
+        -------
+        done: bool
+            False if the region has grown too large and a full update should
+            be performed instead.
+        """
+        if not dirty_nodes:
+            return True
+        forward_activation = getattr(self, '_forward_activation', None)
+        if forward_activation is None:
+            return False
+        all_nodes = list(self.all_nodes())
+        max_region_size = len(all_nodes) // 2
+        if not dirty_nodes.issubset(all_nodes):
+            # some nodes have been removed or moved in the meantime
+            return False
+
+        # activation states before the update, recorded when nodes enter the
+        # region
+        old_state = {}
+        region = []
+        region_set = set()
+        new_nodes = [node for node in all_nodes if node in dirty_nodes]
+        while new_nodes:
+            for node in new_nodes:
+                if node in region_set:
+                    continue
+                region.append(node)
+                region_set.add(node)
+                old_state[node] = node.activated
+                for plug in six.itervalues(node.plugs):
+                    old_state[plug] = plug.activated
+            if len(region) > max_region_size:
+                # restore the initial state before the full update, in order
+                # to trigger the links callbacks appropriately
+                for item, activated in six.iteritems(old_state):
+                    item.activated = activated
+                return False
+
+            # reset activations in the region
+            border = {}
+            for node in region:
+                node.activated = False
+                for plug in six.itervalues(node.plugs):
+                    plug.activated = False
+                    for nn, pn, n, p, weak_link in \
+                            itertools.chain(plug.links_to, plug.links_from):
+                        if n not in region_set:
+                            border[p] = p.activated
+            # the forward sweep sees the border in its forward state, and the
+            # backward sweep in its final state
+            for plug, activated in six.iteritems(border):
+                plug.activated = forward_activation.get(plug, activated)
+            self._propagate_activation_forward(region, region_set)
+            region_forward = dict(
+                (plug, plug.activated) for node in region
+                for plug in six.itervalues(node.plugs))
+            for plug, activated in six.iteritems(border):
+                plug.activated = activated
+            self._propagate_activation_backward(region, region_set)
+
+            # look for changes on the region border
+            new_nodes = []
+            for node in region:
+                for plug in six.itervalues(node.plugs):
+                    forward = region_forward[plug]
+                    if plug.activated == old_state[plug] \
+                            and forward == forward_activation.get(
+                                plug, old_state[plug]):
+                        if plug.activated or not forward:
+                            continue
+                        # the plug has been activated by the forward sweep,
+                        # then deactivated by the backward one. Outside plugs
+                        # in the same situation could keep each other
+                        # activated.
+                        for nn, pn, n, p, weak_link in \
+                                itertools.chain(plug.links_to,
+                                                plug.links_from):
+                            if n not in region_set and not p.activated \
+                                    and forward_activation.get(p, False):
+                                new_nodes.append(n)
+                        continue
+                    for nn, pn, n, p, weak_link in \
+                            itertools.chain(plug.links_to, plug.links_from):
+                        if n not in region_set:
+                            new_nodes.append(n)
+
+        forward_activation.update(region_forward)
+
+        # Execute a callback for all links that have become active.
+        for node in region:
+            for source_plug_name, source_plug in six.iteritems(node.plugs):
+                for nn, pn, n, p, weak_link in source_plug.links_to:
+                    if source_plug.activated and p.activated \
+                            and not (old_state[source_plug]
+                                     and old_state.get(p, p.activated)):
+                        value = node.get_plug_value(source_plug_name)
+                        node._callbacks[(source_plug_name, n, pn)](value)
+                for nn, pn, n, p, weak_link in source_plug.links_from:
+                    # links from outside the region (others are processed
+                    # above)
+                    if n not in region_set and source_plug.activated \
+                            and p.activated and not old_state[source_plug]:
+                        value = n.get_plug_value(pn)
+                        n._callbacks[(pn, node, source_plug_name)](value)
+
+        # Refresh views relying on plugs and nodes selection
+        pipelines = {id(self): self}
+        for node in region:
+            pipeline = get_ref(node.pipeline)
+            pipelines[id(pipeline)] = pipeline
+            if isinstance(node, PipelineNode):
+                pipelines[id(node.process)] = node.process
+        for pipeline in six.itervalues(pipelines):
+            pipeline.selection_changed = True
+
+        return True
+
+    def dependency_index(self):
+        """ Index of the dependencies between the pipeline nodes
+
+        The index is built on first use and kept until the pipeline
+        structure changes: nodes added, removed or renamed, links added or
+        removed. It does not depend on the nodes activation.
+
+        Returns
+        -------
+        index: topological_sort.DependencyIndex
+            successors, predecessors and links of each node
+        """
+        index = getattr(self, '_dependency_index', None)
+        # nodes may also be added or removed directly in the nodes dict
+        if index is None or len(index.nodes) != len(self.nodes):
+            index = DependencyIndex(self)
+            self._dependency_index = index
+        return index
 
     def workflow_graph(self, remove_disabled_steps=True,
                        remove_disabled_nodes=True):
@@ -1567,14 +2051,10 @@ class Pipeline(Process):
                             and trait.input_filename is not False:
                         output = False
 
-            # Main loop
+            # Main loop: links to nodes in a sub-pipeline or in the parent
+            # pipeline are not in the index
             for (dest_node_name, dest_plug_name, dest_node, dest_plug,
-                 weak_link) in plug.links_to:
-
-                # Ignore the link if it is pointing to a node in a
-                # sub-pipeline or in the parent pipeline
-                if pipeline.nodes.get(dest_node_name) is not dest_node:
-                    continue
+                 weak_link) in index.plug_links.get(plug, ()):
 
                 # Plug need to be activated
                 if dest_node.activated:
@@ -1603,6 +2083,7 @@ class Pipeline(Process):
         graph = Graph()
         dependencies = set()
         links = {}
+        index = self.dependency_index()
 
         if remove_disabled_steps:
             steps = getattr(self, 'pipeline_steps', Controller())
@@ -1642,8 +2123,8 @@ class Pipeline(Process):
                 # Add node edges
                 for plug_name, plug in six.iteritems(node.plugs):
 
-                    # Consider only active pipeline node plugs
-                    if plug.activated:
+                    # Consider only active and linked pipeline node plugs
+                    if plug.activated and plug in index.plug_links:
                         insert(self, node_name, node, plug, dependencies,
                                plug_name, links)
 
@@ -1700,6 +2181,79 @@ class Pipeline(Process):
 
         return workflow_list
 
+    def workflow_dependencies(self, remove_disabled_steps=True):
+        """ Generate the execution dependencies between process nodes
+
+        The workflow graph is flattened: sub-pipelines are replaced by their
+        own process nodes, and a dependency on (or from) a sub-pipeline is
+        transferred to its first (or last) inner nodes.
+
+        Parameters
+        ----------
+        remove_disabled_steps: bool (optional)
+            When set, disabled steps (and their children) will not be included
+            in the dependencies.
+            Default: True
+
+        Returns
+        -------
+        dependencies: dict
+            {process_node: set of process nodes which must be executed
+            before it}. All process nodes of the workflow are keys of this
+            dict.
+        """
+        def flatten(graph, dependencies):
+            """ Recursive function which fills dependencies for the graph
+            nodes, and returns the list of process nodes in the graph.
+            """
+            members = {}
+            for name, gnode in six.iteritems(graph._nodes):
+                if isinstance(gnode.meta, list):
+                    members[name] = list(gnode.meta)
+                else:
+                    members[name] = flatten(gnode.meta, dependencies)
+                for node in members[name]:
+                    dependencies.setdefault(node, set())
+
+            # first and last nodes of each graph node, before dependencies
+            # between graph nodes are added
+            sources = {}
+            sinks = {}
+            for name, nodes in six.iteritems(members):
+                sources[name] = [node for node in nodes
+                                 if not dependencies[node]]
+                required = set()
+                for node in nodes:
+                    required.update(dependencies[node])
+                sinks[name] = set(node for node in nodes
+                                  if node not in required)
+
+            # empty sub-pipelines just forward dependencies
+            effective_sinks = {}
+
+            def get_sinks(gnode):
+                if gnode.name not in effective_sinks:
+                    if members[gnode.name]:
+                        effective_sinks[gnode.name] = sinks[gnode.name]
+                    else:
+                        effective_sinks[gnode.name] = set()
+                        for pred in gnode.links_from:
+                            effective_sinks[gnode.name].update(
+                                get_sinks(pred))
+                return effective_sinks[gnode.name]
+
+            for name, gnode in six.iteritems(graph._nodes):
+                for pred in gnode.links_from:
+                    pred_sinks = get_sinks(pred)
+                    for node in sources[name]:
+                        dependencies[node].update(pred_sinks)
+
+            return list(itertools.chain(*members.values()))
+
+        dependencies = {}
+        flatten(self.workflow_graph(remove_disabled_steps), dependencies)
+        return dependencies
+
     def _check_temporary_files_for_node(self, node, temp_files):
         """ Check temporary outputs and allocate files for them.
 
@@ -2405,6 +2959,7 @@ class Pipeline(Process):
         '''
         self.add_trait(selection_parameter, Enum(*selection_groups))
         self.nodes[''].plugs[selection_parameter].has_default_value = True
+        self._set_activation_dirty([self.pipeline_node])
         self.user_traits_changed = True
         self.processes_selection = getattr(self, 'processes_selection', {})
         self.processes_selection[selection_parameter] = selection_groups
@@ -2513,9 +3068,18 @@ class Pipeline(Process):
             if node is self.pipeline_node:
                 continue
             if pipeline_tools.is_node_enabled(self, key, node):
-                conf = node.check_requirements(
-                    environment,
-                    message_list=message_list)
+                process = getattr(node, 'process', None)
+                if isinstance(node, ProcessNode) \
+                        and type(process).check_requirements \
+                            is Process.check_requirements:
+                    # resolution shared with other processes with the same
+                    # requirements: copied only once at the end
+                    conf = process._resolved_requirements(
+                        environment, message_list=message_list)
+                else:
+                    conf = node.check_requirements(
+                        environment,
+                        message_list=message_list)
                 if conf is None:
                     # requirement failed
                     if message_list is None:
@@ -2530,7 +3094,7 @@ class Pipeline(Process):
                         else:
                             confs.append(conf)
         if success:
-            return confs
+            return deepcopy(confs)
         else:
             return None
 
@@ -2577,6 +3141,7 @@ class Pipeline(Process):
             # change the node entry with the new name and delete the former
             self.nodes[new_node_name] = node
             del self.nodes[old_node_name]
+            self._dependency_index = None
 
             # look for the node in the pipeline_steps, if any
             steps = getattr(self, 'pipeline_steps', None)
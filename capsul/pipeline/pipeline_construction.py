@@ -60,6 +60,8 @@ class PipelineConstructor(object):
         # self.__calls is simply a shortcut to 
         # self.pipeline._pipeline_definition_calls
         self._calls = self.pipeline._pipeline_definition_calls
+        # documentation given to set_documentation()
+        self._doc = None
     
 
     def add_process(self, *args, **kwargs):
@@ -106,6 +108,7 @@ class PipelineConstructor(object):
         docstring = ProcessMeta.complement_doc(
             self.pipeline.__class__.__name__, doc)
         self.pipeline.__doc__ = docstring
+        self._doc = docstring
 
 
     def set_node_position(self, node_name, x, y):
@@ -146,6 +149,32 @@ class PipelineConstructor(object):
         self._calls.append(('add_pipeline_step', (step_name, nodes, enabled),
                             {}))
 
+    def definition(self):
+        """ Recorded pipeline definition, as a picklable dict which can be
+        given to :meth:`set_definition` to build the same pipeline class.
+        """
+        definition = {
+            'calls': list(self._calls),
+            'doc': self._doc,
+            'node_position': dict(self.pipeline.node_position),
+        }
+        if 'scene_scale_factor' in self.pipeline.__dict__:
+            definition['scene_scale_factor'] \
+                = self.pipeline.scene_scale_factor
+        return definition
+
+    def set_definition(self, definition):
+        """ Replay a definition returned by :meth:`definition`
+        """
+        self._calls.extend(definition['calls'])
+        if definition['doc'] is not None:
+            self.pipeline.__doc__ = definition['doc']
+            self._doc = definition['doc']
+        self.pipeline.node_position.update(definition['node_position'])
+        if 'scene_scale_factor' in definition:
+            self.pipeline.scene_scale_factor \
+                = definition['scene_scale_factor']
+
 
 class ConstructedPipeline(Pipeline):
     """
@@ -23,6 +23,9 @@ from __future__ import print_function
 # System import
 from __future__ import absolute_import
 import logging
+import copy
+import inspect
+import types
 import six
 from six.moves import zip
 
@@ -52,10 +55,20 @@ from soma.utils.weak_proxy import weak_proxy, get_ref
 
 import os
 
+if hasattr(inspect, 'getfullargspec'):
+    getargspec = inspect.getfullargspec
+else:
+    getargspec = inspect.getargspec
 
-class Plug(Controller):
+
+class Plug(object):
     """ Overload of the traits in oder to keep the pipeline memory.
 
+    Plugs are numerous in large pipelines, thus they are lightweight objects
+    (not Controllers): their attributes are plain slots, and only changes of
+    the enabled attribute are notified, to handlers registered using
+    :meth:`on_trait_change`.
+
     Attributes
     ----------
     enabled : bool
@@ -73,16 +86,22 @@ class Plug(Controller):
     links_from : set (node_name, plug_name, node, plug, is_weak)
         the predecessor plugs of this plug
     """
-    enabled = Bool(default_value=True)
-    activated = Bool(default_value=False)
-    output = Bool(default_value=False)
-    optional = Bool(default_value=False)
+    __slots__ = ('_enabled', 'activated', 'output', 'optional',
+                 'has_default_value', 'links_to', 'links_from',
+                 '_enabled_handlers', '__dict__', '__weakref__')
 
-    def __init__(self, **kwargs):
+    def __init__(self, enabled=True, activated=False, output=False,
+                 optional=False, **kwargs):
         """ Generate a Plug, i.e. a trait with the memory of the
         pipeline adjacent nodes.
+
+        Other keyword arguments are set as additional attributes.
         """
-        super(Plug, self).__init__(**kwargs)
+        self._enabled = bool(enabled)
+        self.activated = bool(activated)
+        self.output = bool(output)
+        self.optional = bool(optional)
+        self._enabled_handlers = None
         # The links correspond to edges in the graph theory
         # links_to = successor
         # links_from = predecessor
@@ -92,6 +111,64 @@ class Plug(Controller):
         # The has_default value flag can be set by setting a value for a
         # parameter in Pipeline.add_process
         self.has_default_value = False
+        for name, value in six.iteritems(kwargs):
+            setattr(self, name, value)
+
+    @property
+    def enabled(self):
+        return self._enabled
+
+    @enabled.setter
+    def enabled(self, value):
+        value = bool(value)
+        old_value = self._enabled
+        if value == old_value:
+            return
+        self._enabled = value
+        for handler, args_count in list(self._enabled_handlers or ()):
+            if args_count == 4:
+                handler(self, 'enabled', old_value, value)
+            elif args_count == 3:
+                handler(self, 'enabled', value)
+            elif args_count == 2:
+                handler('enabled', value)
+            elif args_count == 1:
+                handler(value)
+            else:
+                handler()
+
+    def on_trait_change(self, handler, name='enabled', remove=False):
+        """ Add (or remove) a handler called when the enabled attribute
+        changes, with the same signatures as
+        :meth:`traits.has_traits.HasTraits.on_trait_change` handlers:
+        handler(), handler(new), handler(name, new),
+        handler(object, name, new) or handler(object, name, old, new).
+
+        Changes of other attributes are not notified.
+        """
+        if name != 'enabled':
+            raise ValueError('only changes of the enabled attribute of a '
+                             'plug can be notified, not %s' % repr(name))
+        handlers = self._enabled_handlers or []
+        if remove:
+            handlers = [h for h in handlers if h[0] != handler]
+        else:
+            handlers.append((handler, _handler_args_count(handler)))
+        self._enabled_handlers = handlers or None
+
+    def __getstate__(self):
+        """ Notification handlers are not pickled
+        """
+        state = dict(getattr(self, '__dict__', {}))
+        for name in self.__slots__:
+            if name not in ('_enabled_handlers', '__dict__', '__weakref__'):
+                state[name] = getattr(self, name)
+        return state
+
+    def __setstate__(self, state):
+        self._enabled_handlers = None
+        for name, value in six.iteritems(state):
+            setattr(self, name, value)
 
 
 class Node(Controller):
@@ -194,12 +271,18 @@ class Node(Controller):
             # update plugs list
             self.plugs[plug_name] = plug
             # add an event on plug to validate the pipeline
-            plug.on_trait_change(pipeline.update_nodes_and_plugs_activation,
-                                 "enabled")
+            plug.on_trait_change(self._activation_changed, "enabled")
 
         # add an event on the Node instance traits to validate the pipeline
-        self.on_trait_change(pipeline.update_nodes_and_plugs_activation,
-                             "enabled")
+        self.on_trait_change(self._activation_changed, "enabled")
+
+    def _activation_changed(self):
+        """ Notify the pipeline that the enabled state of the node, or of
+        one of its plugs, has changed, in order to update activations from
+        this node.
+        """
+        self.pipeline.update_nodes_activation_from([self])
+
     @property
     def process(self):
         try:
@@ -224,20 +307,43 @@ class Node(Controller):
     def _value_callback(self, source_plug_name, dest_node, dest_plug_name,
                         value):
         """ Spread the source plug value to the destination plug.
+
+        If values propagation is delayed in the pipeline (see
+        :meth:`~capsul.pipeline.pipeline.Pipeline.delay_value_propagation`),
+        the value is only recorded, and will be set later.
         """
+        protected = self.is_parameter_protected(source_plug_name)
+        propagation_delayed = getattr(self.pipeline, '_propagation_delayed',
+                                      None)
+        if propagation_delayed is not None \
+                and propagation_delayed(dest_node, dest_plug_name, value,
+                                        protected):
+            return
+        Node._propagate_value(dest_node, dest_plug_name, value, protected)
+
+    @staticmethod
+    def _propagate_value(dest_node, dest_plug_name, value, protected,
+                         copy_lists=False):
+        """ Set a value propagated through a link to the destination plug.
+
+        If copy_lists is True, and value is a list already validated by a
+        list trait with the same items type as the destination one, it is
+        copied without validating its items again.
+        """
+        if copy_lists \
+                and _set_validated_list(dest_node, dest_plug_name, value,
+                                        protected):
+            return
         try:
-            dest_node.set_plug_value(
-                dest_plug_name, value,
-                self.is_parameter_protected(source_plug_name))
+            dest_node.set_plug_value(dest_plug_name, value, protected)
         except traits.TraitError:
             if isinstance(value, list) and len(value) == 1:
                 # Nipype MultiObject, when a single object is involved, looks
                 # like a single object but is actually a list. We want to
                 # allow it to be linked to a "single object" plug.
                 try:
-                    dest_node.set_plug_value(
-                        dest_plug_name, value[0],
-                        self.is_parameter_protected(source_plug_name))
+                    dest_node.set_plug_value(dest_plug_name, value[0],
+                                             protected)
                 except traits.TraitError:
                     pass
 
@@ -322,7 +428,7 @@ class Node(Controller):
             the destination plug name
         """
         # add a callback to spread the source plug value
-        value_callback = SomaPartial(
+        value_callback = _LinkValueCallback(
             self.__class__._value_callback, weak_proxy(self),
             source_plug_name, weak_proxy(dest_node), dest_plug_name)
         self._callbacks[(source_plug_name, dest_node,
@@ -520,25 +626,13 @@ class Node(Controller):
         capsul_engine = self.get_study_config().engine
         settings = capsul_engine.settings
         req = self.requirements()
-        config = settings.select_configurations(environment, uses=req)
-        success = True
-        for module in req:
-            module_name = settings.module_name(module)
-            if module_name not in config:
-                if message_list is not None:
-                    message_list.append('requirement: %s is not met in %s'
-                                        % (req, self.name))
-                else:
-                    # if no message is expected, then we can return immediately
-                    # without checking further requirements. Otherwise we
-                    # continue to get a full list of unsatisfied requirements.
-                    return None
-                success = False
-                return None
-        if success:
-            return config
-        else:
+        config, missing = settings.resolve_requirements(environment, req)
+        if missing:
+            if message_list is not None:
+                message_list.append('requirement: %s is not met in %s'
+                                    % (req, self.name))
             return None
+        return copy.deepcopy(config)
 
     def get_missing_mandatory_parameters(self, exclude_links=False):
         ''' Returns a list of parameters which are not optional, and which
@@ -728,11 +822,13 @@ class ProcessNode(Node):
             if True or Fase, force the "protected" status of the plug. If None,
             keep it as is.
         """
-        if value in ["", "<undefined>"]:
-            value = Undefined
-        elif is_trait_pathname(self.process.trait(plug_name)) and value is None:
+        process = self.process
+        if value is None:
+            if is_trait_pathname(process.trait(plug_name)):
+                value = Undefined
+        elif value in ("", "<undefined>"):
             value = Undefined
-        self.process.set_parameter(plug_name, value, protected)
+        process.set_parameter(plug_name, value, protected)
 
     def is_parameter_protected(self, plug_name):
         return self.process.is_parameter_protected(plug_name)
@@ -1062,7 +1158,7 @@ class Switch(Node):
             self.plugs[plug_name].enabled = True
 
         # refresh the pipeline
-        self.pipeline.update_nodes_and_plugs_activation()
+        self.pipeline.update_nodes_activation_from([self])
 
         # Refresh the links to the output plugs
         for output_plug_name in self._outputs:
@@ -1303,3 +1399,90 @@ class OptionalOutputSwitch(Switch):
                 self._Switch__block_output_propagation = True
                 setattr(self, output_plug_name, new)
                 self._Switch__block_output_propagation = False
+
+
+def _set_validated_list(node, plug_name, value, protected=None):
+    """ Set a list value to a node plug without validating its items, if they
+    have already been validated by a trait which validates them the same way
+    as the plug trait. A new list is still built, since a traits list belongs
+    to the object it is set on, but items are not validated, and notifications
+    are fired once.
+
+    Returns
+    -------
+    done: bool
+        False if the value has to be set the normal way.
+    """
+    from traits.trait_list_object import TraitListObject
+
+    if not isinstance(value, TraitListObject):
+        return False
+    if isinstance(node, ProcessNode):
+        owner = node.process
+    else:
+        owner = node
+    trait = owner.trait(plug_name)
+    if trait is None:
+        return False
+    handler = trait.handler
+    source_handler = value.trait
+    if not isinstance(handler, traits.List) \
+            or not isinstance(source_handler, traits.List) \
+            or not handler.minlen <= len(value) <= handler.maxlen:
+        return False
+    item_handler = handler.item_trait.handler
+    source_item_handler = source_handler.item_trait.handler
+    if type(item_handler) is not type(source_item_handler) \
+            or not isinstance(item_handler, (File, Directory, Any)) \
+            or getattr(item_handler, 'exists', False) \
+                != getattr(source_item_handler, 'exists', False):
+        return False
+    if protected is not None:
+        node.protect_parameter(plug_name, protected)
+    old_value = getattr(owner, plug_name)
+    if old_value == value:
+        return True
+    new_value = TraitListObject(handler, owner, plug_name, [])
+    list.extend(new_value, value)
+    owner.__dict__[plug_name] = new_value
+    owner.trait_property_changed(plug_name, old_value, new_value)
+    return True
+
+
+class _LinkValueCallback(SomaPartial):
+    """ Link callback installed by :meth:`Node.connect`: a SomaPartial which
+    takes a single argument, the new value.
+
+    traits inspects the arguments of notification handlers through their
+    ``__code__`` attribute, which SomaPartial computes using a costly
+    introspection. As links are many, the arguments count is given here.
+    """
+    class _code(object):
+        co_argcount = 1
+
+    __code__ = _code
+    func_code = _code
+
+
+def _handler_args_count(handler):
+    """ Number of arguments of a notification handler (0 to 4)
+    """
+    code = getattr(getattr(handler, '__func__', handler), '__code__', None)
+    if isinstance(code, types.CodeType):
+        count = code.co_argcount
+        if inspect.ismethod(handler):
+            count -= 1
+        if code.co_flags & inspect.CO_VARARGS:
+            count = 4
+        return max(0, min(count, 4))
+    try:
+        spec = getargspec(handler)
+    except TypeError:
+        return 0
+    count = len(spec[0])
+    if inspect.ismethod(handler):
+        count -= 1
+    if spec[1] is not None:
+        # *args
+        count = 4
+    return max(0, min(count, 4))
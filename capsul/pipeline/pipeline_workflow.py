@@ -178,7 +178,8 @@ def workflow_from_pipeline(pipeline, study_config=None, disabled_nodes=None,
 
     def build_job(process, temp_map={}, shared_map={}, transfers=[{}, {}],
                   shared_paths={}, forbidden_temp=set(), name='', priority=0,
-                  step_name='', engine=None, environment='global'):
+                  step_name='', engine=None, environment='global',
+                  template=None):
         """ Create a soma-workflow Job from a Capsul Process
 
         Parameters
@@ -208,6 +209,12 @@ def workflow_from_pipeline(pipeline, study_config=None, disabled_nodes=None,
             configuration environment name (default: "global"). See
             :class:`capsul.engine.CapsulEngine` and
             :class:`capsul.engine.settings.Settings`.
+        template: dict (optional)
+            job template shared by several jobs built from the same process
+            (typically iterations of a process). The parts of the job which
+            do not depend on parameters values (configuration, python
+            command) are computed for the first job and stored in it, then
+            reused by the next jobs, which share the same configuration dict.
 
         Returns
         -------
@@ -352,49 +359,64 @@ def workflow_from_pipeline(pipeline, study_config=None, disabled_nodes=None,
         oproc_transfers = transfers[1].get(process, {})
         #proc_transfers = dict(iproc_transfers)
         #proc_transfers.update(oproc_transfers)
-        _replace_in_list(process_cmdline, temp_map)
-        _replace_in_list(process_cmdline, shared_map)
+        if temp_map:
+            _replace_in_list(process_cmdline, temp_map)
+        if shared_map:
+            _replace_in_list(process_cmdline, shared_map)
         _replace_transfers(
             process_cmdline, process, iproc_transfers, oproc_transfers)
 
-        config = {}
-        config = process.check_requirements(environment)
-        if config is None:
-            # here we bypass unmet requirements, it's not our job here.
-            config = {}
-
         use_input_params_file = False
+        if template is None:
+            template = _requirements_template(process, process_cmdline,
+                                              environment)
+        if template is not None and 'config' in template:
+            config = template['config']
+            python_command, path_trick = template['python_command']
+        else:
+            config = process.check_requirements(environment)
+            if config is None:
+                # here we bypass unmet requirements, it's not our job here.
+                config = {}
+            python_command, path_trick = None, ''
+            if process_cmdline[0] == 'capsul_job':
+                # use python executable from config, if any
+                pconf = config.get('capsul.engine.module.python')
+                if not pconf:
+                    pconf = process.get_study_config().engine.settings. \
+                        select_configurations(environment, {'python': 'any'})
+                    if pconf:
+                        if not config:
+                            config = pconf
+                        else:
+                            if 'capsul.engine.module.python' in pconf:
+                                config['capsul.engine.module.python'] \
+                                    = pconf['capsul.engine.module.python']
+                            uses = pconf.get('capsul_engine', {}).get(
+                                'uses', {})
+                            if uses:
+                                config.setdefault(
+                                    'capsul_engine', {}).setdefault(
+                                        'uses', {}).update(uses)
+                python_command = pconf.get(
+                    'capsul.engine.module.python', {}).get('executable')
+                if not python_command:
+                    python_command = os.path.basename(sys.executable)
+                # python path cannot be passed in a library since the access
+                # to this library (capsul module typically) may be
+                # conditioned by this path. We cannot use PYTHONPATH env
+                # either because it would completely erase any user settings
+                # (.bashrc). So we add it here.
+                ppath = pconf.get(
+                    'capsul.engine.module.python', {}).get('path')
+                if ppath:
+                    path_trick = 'import sys; sys.path = %s + sys.path; ' \
+                        % repr(ppath)
+            if template is not None:
+                template['config'] = config
+                template['python_command'] = (python_command, path_trick)
+
         if process_cmdline[0] == 'capsul_job':
-            # use python executable from config, if any
-            pconf = config.get('capsul.engine.module.python')
-            if not pconf:
-                pconf = process.get_study_config().engine.settings. \
-                    select_configurations(environment, {'python': 'any'})
-                if pconf:
-                    if not config:
-                        config = pconf
-                    else:
-                        if 'capsul.engine.module.python' in pconf:
-                            config['capsul.engine.module.python'] \
-                                = pconf['capsul.engine.module.python']
-                        uses = pconf.get('capsul_engine', {}).get('uses', {})
-                        if uses:
-                            config.setdefault('capsul_engine', {}).setdefault(
-                                'uses', {}).update(uses)
-            python_command = pconf.get(
-                'capsul.engine.module.python', {}).get('executable')
-            if not python_command:
-                python_command = os.path.basename(sys.executable)
-            path_trick = ''
-            # python path cannot be passed in a library since the access to
-            # this library (capsul module typically) may be conditioned by
-            # this path. We cannot use PYTHONPATH env either because it would
-            # completely erase any user settings (.bashrc). So we add it here.
-            ppath = pconf.get(
-                'capsul.engine.module.python', {}).get('path')
-            if ppath:
-                path_trick = 'import sys; sys.path = %s + sys.path; ' \
-                    % repr(ppath)
             process_cmdline = [
                 'capsul_job', python_command, '-c',
                 '%sfrom capsul.api import Process; '
@@ -409,8 +431,10 @@ def workflow_from_pipeline(pipeline, study_config=None, disabled_nodes=None,
             if name in param_dict:
                 del param_dict[name]
 
-        _replace_in_dict(param_dict, temp_map)
-        _replace_in_dict(param_dict, shared_map)
+        if temp_map:
+            _replace_in_dict(param_dict, temp_map)
+        if shared_map:
+            _replace_in_dict(param_dict, shared_map)
         _replace_dict_transfers(
             param_dict, process, iproc_transfers, oproc_transfers)
 
@@ -461,6 +485,30 @@ def workflow_from_pipeline(pipeline, study_config=None, disabled_nodes=None,
         job.process_hash = id(process)
         return job
 
+    def _requirements_template(process, process_cmdline, environment):
+        ''' Job template shared by all jobs built from processes with the
+        same requirements.
+
+        The configuration matching processes requirements only depends on
+        the requirements themselves: it is looked up in the engine settings
+        once for each distinct requirements set, instead of once for each
+        job. Processes which reimplement check_requirements() do not share
+        templates.
+
+        Returns
+        -------
+        template: dict or None
+            see the template parameter of build_job()
+        '''
+        if not isinstance(process, Process) \
+                or type(process).check_requirements \
+                    is not Process.check_requirements:
+            return None
+        key = (process.get_study_config(), environment,
+               process_cmdline[0] == 'capsul_job',
+               repr(sorted(six.iteritems(process.requirements()))))
+        return requirements_templates.setdefault(key, {})
+
     def build_custom_job(node, process_cmdline, name,
                          referenced_input_files, referenced_output_files,
                          param_dict):
@@ -673,6 +721,8 @@ def workflow_from_pipeline(pipeline, study_config=None, disabled_nodes=None,
         in_transfers = {}
         out_transfers = {}
         transfers = [in_transfers, out_transfers]
+        if not transfer_paths:
+            return transfers
         todo_nodes = [pipeline.pipeline_node]
         while todo_nodes:
             node = todo_nodes.pop(0)
@@ -734,6 +784,43 @@ def workflow_from_pipeline(pipeline, study_config=None, disabled_nodes=None,
                 expanded_nodes.add(node)
         return expanded_nodes
 
+    def _nodes_enabled_index(pipeline):
+        ''' Enabled state of all nodes of a pipeline and of its
+        sub-pipelines, computed in a single walk through the pipeline.
+
+        A node is enabled if it is enabled and activated, and if it does not
+        belong to a disabled step of its pipeline or of a parent pipeline.
+        This is the state :func:`pipeline_tools.is_node_enabled` returns, but
+        it is not searched again from the top pipeline for each node.
+
+        Returns
+        -------
+        index: dict
+            {node: enabled}
+        '''
+        pipeline_node = pipeline.pipeline_node
+        index = {pipeline_node: bool(pipeline_node.enabled
+                                     and pipeline_node.activated)}
+        todo = [(pipeline, True)]
+        while todo:
+            sub_pipeline, steps_enabled = todo.pop()
+            disabled_steps_nodes = set()
+            steps = getattr(sub_pipeline, 'pipeline_steps', None)
+            if steps is not None:
+                for step, trait in six.iteritems(steps.user_traits()):
+                    if not getattr(steps, step):
+                        disabled_steps_nodes.update(trait.nodes)
+            for node_name, node in six.iteritems(sub_pipeline.nodes):
+                if node is sub_pipeline.pipeline_node:
+                    continue
+                node_steps_enabled = steps_enabled \
+                    and node_name not in disabled_steps_nodes
+                index[node] = bool(node_steps_enabled and node.enabled
+                                   and node.activated)
+                if isinstance(node, PipelineNode):
+                    todo.append((node.process, node_steps_enabled))
+        return index
+
     def _handle_disable_nodes(pipeline, temp_map, transfers, disabled_nodes):
         '''Take into account disabled nodes by changing FileTransfer outputs
         for such nodes to inputs, and recording output temporary files, so as
@@ -777,7 +864,8 @@ def workflow_from_pipeline(pipeline, study_config=None, disabled_nodes=None,
                          shared_map, transfers, shared_paths,
                          disabled_nodes, remove_temp,
                          steps, study_config, iteration, map_job=None,
-                         reduce_job=None, environment='global'):
+                         reduce_job=None, environment='global',
+                         job_templates=None):
         '''
         Build a workflow for a single iteration step of a process/sub-pipeline
 
@@ -786,6 +874,10 @@ def workflow_from_pipeline(pipeline, study_config=None, disabled_nodes=None,
         Jobs inserted are tuples (process, interation) because each job will be
         converted into as many jobs as the number of iterations.
 
+        job_templates is a dict {process: template}, shared by all iterations,
+        see the template parameter of build_job(): only the parameters of
+        the jobs are computed again for each iteration.
+
         Returns
         -------
         (jobs, dependencies, groups, root_jobs, links)
@@ -802,7 +894,8 @@ def workflow_from_pipeline(pipeline, study_config=None, disabled_nodes=None,
                         process, temp_subst_map, shared_map, transfers,
                         shared_paths, disabled_nodes=disabled_nodes,
                         forbidden_temp=remove_temp, steps=steps,
-                        study_config=study_config, environment=environment)
+                        study_config=study_config, environment=environment,
+                        job_templates=job_templates)
                 jobs = {}
                 for proc, job in six.iteritems(jobs1):
                     jobs[(proc, iteration)] = job
@@ -833,6 +926,9 @@ def workflow_from_pipeline(pipeline, study_config=None, disabled_nodes=None,
                                    environment=environment)
         else:
             # single process
+            template = None
+            if job_templates is not None:
+                template = job_templates.setdefault(process, {})
             job = build_job(process, temp_map, shared_map,
                             transfers, shared_paths,
                             forbidden_temp=remove_temp,
@@ -840,7 +936,8 @@ def workflow_from_pipeline(pipeline, study_config=None, disabled_nodes=None,
                             priority=jobs_priority,
                             step_name=step_name,
                             engine=getattr(study_config, 'engine', None),
-                            environment=environment)
+                            environment=environment,
+                            template=template)
             jobs = {(process, iteration): job}
             groups = {}
             dependencies = {}
@@ -859,6 +956,11 @@ def workflow_from_pipeline(pipeline, study_config=None, disabled_nodes=None,
         filled with appropriate parameters for each iteration, and its
         workflow is generated.
 
+        Jobs of all iterations are built from the same templates: the
+        configuration requirements and command of the iterated process(es)
+        are resolved once, and shared by all iteration jobs, which only
+        differ by their parameters.
+
         Returns
         -------
         (jobs, dependencies, groups, root_jobs, links, nodes)
@@ -1076,6 +1178,9 @@ def workflow_from_pipeline(pipeline, study_config=None, disabled_nodes=None,
 
             # iterate the iterates process / pipeline
 
+            completion_engine = ProcessCompletionEngine.get_completion_engine(
+                it_process)
+            job_templates = {}
             for iteration in range(size):
                 for parameter in it_process.iterative_parameters:
                     if it_process.process.trait(parameter).input_filename \
@@ -1091,7 +1196,7 @@ def workflow_from_pipeline(pipeline, study_config=None, disabled_nodes=None,
                             setattr(it_process.process, parameter, values[-1])
 
                 # operate completion
-                complete_iteration(it_process, iteration)
+                complete_iteration(it_process, iteration, completion_engine)
 
                 # build a workflow for the job / pipeline iteration
                 process_name = it_process.process.name + '_%d' % iteration
@@ -1102,7 +1207,8 @@ def workflow_from_pipeline(pipeline, study_config=None, disabled_nodes=None,
                         temp_map, shared_map, transfers,
                         shared_paths, disabled_nodes, remove_temp, steps,
                         study_config, iteration, map_job=map_job,
-                        reduce_job=reduce_job, environment=environment)
+                        reduce_job=reduce_job, environment=environment,
+                        job_templates=job_templates)
                 nodes += sub_nodes
                 jobs.update(sub_jobs)
                 dependencies.update(sub_dependencies)
@@ -1139,9 +1245,10 @@ def workflow_from_pipeline(pipeline, study_config=None, disabled_nodes=None,
         return (jobs, dependencies, groups, root_jobs, links, nodes)
 
 
-    def complete_iteration(it_process, iteration):
-        completion_engine = ProcessCompletionEngine.get_completion_engine(
-            it_process)
+    def complete_iteration(it_process, iteration, completion_engine=None):
+        if completion_engine is None:
+            completion_engine = ProcessCompletionEngine.get_completion_engine(
+                it_process)
         # check if it is an iterative completion engine
         if hasattr(completion_engine, 'complete_iteration_step'):
             completion_engine.complete_iteration_step(iteration)
@@ -1152,7 +1259,8 @@ def workflow_from_pipeline(pipeline, study_config=None, disabled_nodes=None,
             transfers=[{}, {}], shared_paths={},
             disabled_nodes=set(), forbidden_temp=set(),
             jobs_priority=0, steps={}, current_step='',
-            study_config={}, with_links=True, environment='global'):
+            study_config={}, with_links=True, environment='global',
+            job_templates=None, nodes_index=None):
         """ Convert a CAPSUL pipeline into a soma-workflow workflow
 
         Parameters
@@ -1183,6 +1291,14 @@ def workflow_from_pipeline(pipeline, study_config=None, disabled_nodes=None,
             configuration environment name (default: "global"). See
             :class:`capsul.engine.CapsulEngine` and
             :class:`capsul.engine.settings.Settings`.
+        job_templates: dict (optional)
+            {process: template} dict of jobs templates, used when the same
+            pipeline is converted several times (iterations). See
+            build_job().
+        nodes_index: dict (optional)
+            {node: enabled} index of the nodes of the pipeline and of its
+            parent pipelines, as built by _nodes_enabled_index(). Built from
+            the pipeline if not given, and passed to sub-pipelines.
 
         Returns
         -------
@@ -1210,6 +1326,16 @@ def workflow_from_pipeline(pipeline, study_config=None, disabled_nodes=None,
         engine = None
         if study_config:
             engine = getattr(study_config, 'engine', None)
+        if nodes_index is None:
+            nodes_index = _nodes_enabled_index(pipeline)
+
+        def _is_node_enabled(node_pipeline, node):
+            enabled = nodes_index.get(node)
+            if enabled is None:
+                enabled = pipeline_tools.is_node_enabled(node_pipeline,
+                                                         node=node)
+                nodes_index[node] = enabled
+            return enabled
 
         # Go through all graph nodes
         for node_desc in nodes:
@@ -1217,8 +1343,7 @@ def workflow_from_pipeline(pipeline, study_config=None, disabled_nodes=None,
             n_pipeline, node_name, node = node_desc
 
             if node in disabled_nodes \
-                    or not pipeline_tools.is_node_enabled(n_pipeline,
-                                                          node_name=node_name):
+                    or not _is_node_enabled(n_pipeline, node):
                 continue
 
             if not node.is_job():
@@ -1238,7 +1363,8 @@ def workflow_from_pipeline(pipeline, study_config=None, disabled_nodes=None,
                         shared_paths, disabled_nodes,
                         jobs_priority=jobs_priority,
                         steps=steps, current_step=step_name, with_links=False,
-                        environment=environment)
+                        environment=environment, job_templates=job_templates,
+                        nodes_index=nodes_index)
                 group = build_group(node_name,
                                     sum(list(sub_root_jobs.values()), []))
                 groups[node] = group
@@ -1280,13 +1406,17 @@ def workflow_from_pipeline(pipeline, study_config=None, disabled_nodes=None,
                     all_nodes += sub_nodes
                     _update_links(links, sub_links)
                 else:
+                    template = None
+                    if job_templates is not None:
+                        template = job_templates.setdefault(process, {})
                     job = build_job(process, temp_map, shared_map,
                                     transfers, shared_paths,
                                     forbidden_temp=forbidden_temp,
                                     name=node_name,
                                     priority=jobs_priority,
                                     step_name=step_name,
-                                    engine=engine, environment=environment)
+                                    engine=engine, environment=environment,
+                                    template=template)
                     if job:
                         sub_jobs[process] = job
                         root_jobs[process] = [job]
@@ -1294,19 +1424,29 @@ def workflow_from_pipeline(pipeline, study_config=None, disabled_nodes=None,
 
         # links / dependencies
         if with_links:
+            plugs_sources = {}
+
+            def _plug_sources(plug, parent=None):
+                # connection sources of a plug, memoized since switches
+                # sources are walked for each of their destinations
+                sources = plugs_sources.get((plug, parent))
+                if sources is None:
+                    sources = pipeline_tools.find_plug_connection_sources(
+                        plug, parent)
+                    plugs_sources[(plug, parent)] = sources
+                return sources
+
             for node_desc in all_nodes:
                 sub_pipeline, node_name, node = node_desc
                 dproc = getattr(node, 'process', node)
                 if isinstance(dproc, Pipeline):
                     continue  # pipeline nodes are virtual
                 for param, plug in six.iteritems(node.plugs):
-                    sources = pipeline_tools.find_plug_connection_sources(
-                        plug, True)
+                    sources = _plug_sources(plug, True)
                     for source in sources:
                         snode, param_name, parent = source
                         if node in disabled_nodes \
-                                or not pipeline_tools.is_node_enabled(
-                                    pipeline, node=snode):
+                                or not _is_node_enabled(pipeline, snode):
                             continue
                         process = getattr(snode, 'process', snode)
                         if not isinstance(snode, ProcessNode) \
@@ -1317,8 +1457,7 @@ def workflow_from_pipeline(pipeline, study_config=None, disabled_nodes=None,
                             while new_nodes:
                                 mnode = new_nodes.pop(0)
                                 moredep = [
-                                    pipeline_tools.find_plug_connection_sources
-                                    (mlink[3])
+                                    _plug_sources(mlink[3])
                                     for mplug in mnode.plugs.values()
                                     for mlink in mplug.links_from
                                     if not mplug.output
@@ -1406,6 +1545,10 @@ def workflow_from_pipeline(pipeline, study_config=None, disabled_nodes=None,
     for format, values in six.iteritems(formats):
         merged_formats.update(values)
 
+    # job templates shared by processes with the same requirements, see
+    # _requirements_template()
+    requirements_templates = {}
+
     if study_config is None:
         study_config = pipeline.get_study_config()
 
@@ -14,21 +14,97 @@ from __future__ import print_function
 from __future__ import absolute_import
 import sys
 import six
+import multiprocessing
+from concurrent import futures
+from six.moves import queue
 from traits.api import List, Undefined
 
 from capsul.process.process import Process
 from capsul.study_config.process_instance import get_process_instance
+from capsul.study_config.run import run_process, reserve_process_counter
+from capsul.study_config.parallel_run import (_execution_settings,
+                                              _execution_study_config)
 import capsul.study_config as study_cmod
+from capsul.study_config import instrumentation
 from traits.api import File, Directory
 from six.moves import range
 
 if sys.version_info[0] >= 3:
     xrange = range
 
+
+# processes instances used by iterations run in a worker process:
+# {(process_id, execution_settings): process}
+_worker_processes = {}
+
+
+def _run_iterations_in_worker_process(process_id, context_name, iterations,
+                                      outputs, configuration_dict, settings,
+                                      process_counter, measure=False):
+    """ Run iterations of a process in a worker of a process pool.
+
+    Processes attached to a StudyConfig cannot be pickled, thus a process
+    instance is built (once for each worker) from the process identifier, in
+    a StudyConfig holding the execution settings of the calling process. The
+    configuration of the calling process is activated before iterations are
+    run, and the processes counters used by the chunk of iterations start
+    at process_counter. Output values of iterations are sent back with the
+    instrumentation events of their execution if measure is True (hooks are
+    installed in the calling process only).
+    """
+    # Import cannot be done on module due to circular dependencies
+    from capsul import engine
+
+    key = (process_id, tuple(sorted(six.iteritems(settings))))
+    process = _worker_processes.get(key)
+    if process is None:
+        process = get_process_instance(
+            process_id, study_config=_execution_study_config(settings))
+        _worker_processes[key] = process
+    if context_name is not None:
+        process.context_name = context_name
+    process.get_study_config().process_counter = process_counter
+    engine.activated_modules = set()
+    engine.activate_configuration(configuration_dict)
+    events = None
+    if measure:
+        events = []
+    results = ProcessIteration._run_iterations_chunk(
+        process, iterations, outputs, configuration_dict, events)
+    return results, events
+
+
 class ProcessIteration(Process):
+    """ Iterate a process over lists of parameters values.
+
+    Iterations are run sequentially by default. They may be dispatched to a
+    pool of workers, each one holding its own clone of the iterated process,
+    by setting the following attributes (on the class or on an instance):
+
+    parallel_workers: int (default 1)
+        number of workers. 1 runs iterations sequentially, 0 uses the number
+        of CPUs.
+    parallel_chunk_size: int (default None)
+        number of iterations sent at once to a worker. None chooses a size
+        giving about 4 chunks per worker.
+    parallel_mode: str (default 'thread')
+        'thread' or 'process': run iterations in threads, or in worker
+        processes. Processes are then instantiated again in workers from
+        their identifier.
+
+    Completion of each iteration is done sequentially before the processes
+    are dispatched. The configuration (see
+    :meth:`~capsul.process.process.Process.check_requirements`) is activated
+    once for all iterations, thus iterations are run sequentially when
+    nodes of an iterated pipeline need distinct configurations.
+    """
 
     _doc_path = 'api/pipeline.html#processiteration'
 
+    parallel_workers = 1
+    parallel_chunk_size = None
+    parallel_mode = 'thread'
+
     def __init__(self, process, iterative_parameters, study_config=None,
                  context_name=None):
         super(ProcessIteration, self).__init__()
@@ -223,22 +299,26 @@ class ProcessIteration(Process):
 
         for parameter in self.regular_parameters:
             setattr(self.process, parameter, getattr(self, parameter))
-        if no_output_value:
+        configuration_dict = None
+        if self.parallel_workers != 1 and size > 1:
+            configuration_dict = self._iterations_configuration()
+        if configuration_dict is not None:
+            self._run_iterations_parallel(size, no_output_value,
+                                          configuration_dict)
+        elif no_output_value:
             for parameter in self.iterative_parameters:
                 trait = self.trait(parameter)
                 if trait.output:
                     setattr(self, parameter, [])
             outputs = {}
             for iteration in range(size):
+                values = {}
                 for parameter in self.iterative_parameters:
                     #if not no_output_value or not self.trait(parameter).output:
                     value = getattr(self, parameter)
                     if len(value) > iteration:
-                        setattr(self.process, parameter,
-                                getattr(self, parameter)[iteration])
-                # operate completion
-                self.complete_iteration(iteration)
-                self.process()
+                        values[parameter] = value[iteration]
+                self._run_iteration(iteration, values)
                 for parameter in self.iterative_parameters:
                     trait = self.trait(parameter)
                     if trait.output:
@@ -250,12 +330,274 @@ class ProcessIteration(Process):
                 setattr(self, parameter, value)
         else:
             for iteration in range(size):
-                for parameter in self.iterative_parameters:
-                    setattr(self.process, parameter,
-                            getattr(self, parameter)[iteration])
-                # operate completion
-                self.complete_iteration(iteration)
-                self.process()
+                values = dict((parameter, getattr(self, parameter)[iteration])
+                              for parameter in self.iterative_parameters)
+                self._run_iteration(iteration, values)
+
+    def _run_iteration(self, iteration, values):
+        """ Set the iterative parameters values of an iteration on the
+        iterated process, complete, and run it
+        """
+        measure = None
+        if instrumentation.is_active():
+            measure = instrumentation.NodeMeasure(
+                self.process, kind='iteration', iteration=iteration)
+        for parameter, value in six.iteritems(values):
+            setattr(self.process, parameter, value)
+        if measure is not None:
+            measure.lap('propagation_time')
+        # operate completion
+        self.complete_iteration(iteration)
+        if measure is not None:
+            measure.lap('completion_time')
+            measure.start()
+        try:
+            self.process()
+        except Exception:
+            if measure is not None:
+                measure.stop('failed')
+            raise
+        if measure is not None:
+            measure.stop()
+
+    def _iterated_processes(self):
+        """ Processes run by each iteration: the iterated process, or the
+        process nodes of the iterated pipeline
+        """
+        # Import cannot be done on module due to circular dependencies
+        from capsul.pipeline.pipeline import Pipeline
+
+        if isinstance(self.process, Pipeline):
+            return [node.process
+                    for node in self.process.workflow_ordered_nodes()]
+        return [self.process]
+
+    def _iterations_configuration(self):
+        """ Configuration activated once for all iterations run in parallel
+
+        The configuration activation is global, thus all the processes run
+        by iterations must use the same configuration.
+
+        Returns
+        -------
+        configuration_dict: dict
+            None if processes of the iterated pipeline need distinct
+            configurations: iterations are then run sequentially.
+        """
+        configuration_dict = None
+        for process in self._iterated_processes():
+            configuration = process.check_requirements('global') or {}
+            if configuration_dict is None:
+                configuration_dict = configuration
+            elif configuration != configuration_dict:
+                return None
+        if configuration_dict is None:
+            configuration_dict = {}
+        return configuration_dict
+
+    def _run_iterations_parallel(self, size, no_output_value,
+                                 configuration_dict):
+        """ Run iterations in a pool of workers, see the class doc.
+        """
+        # prepare and complete iterations parameters sequentially
+        iterations = []
+        outputs = [parameter for parameter in self.iterative_parameters
+                   if self.trait(parameter).output]
+        for iteration in range(size):
+            for parameter in self.iterative_parameters:
+                value = getattr(self, parameter)
+                if len(value) > iteration:
+                    setattr(self.process, parameter, value[iteration])
+            self.complete_iteration(iteration)
+            iterations.append(
+                (iteration,
+                 dict((name, getattr(self.process, name))
+                      for name in self.process.user_traits())))
+            if no_output_value:
+                for parameter in outputs:
+                    setattr(self.process, parameter, Undefined)
+
+        workers = self.parallel_workers
+        if not workers:
+            workers = multiprocessing.cpu_count()
+        chunk_size = self.parallel_chunk_size
+        if not chunk_size:
+            chunk_size = max(1, size // (workers * 4))
+        chunks = [iterations[i:i + chunk_size]
+                  for i in range(0, size, chunk_size)]
+
+        if self.parallel_mode == 'process':
+            study_config = self.process.get_study_config()
+            settings = _execution_settings(study_config)
+            context_name = getattr(self.process, 'context_name', None)
+            measure = instrumentation.is_active()
+            # processes counters of each chunk are reserved here, a counter
+            # for each process run by an iteration
+            processes_count = len(self._iterated_processes())
+            pool = futures.ProcessPoolExecutor(workers)
+            jobs = [pool.submit(_run_iterations_in_worker_process,
+                                self.process.id, context_name, chunk,
+                                outputs, configuration_dict, settings,
+                                reserve_process_counter(
+                                    study_config,
+                                    len(chunk) * processes_count),
+                                measure)
+                    for chunk in chunks]
+        else:
+            # the configuration is activated once here: workers do not
+            # activate it concurrently
+            from capsul import engine
+            engine.activated_modules = set()
+            engine.activate_configuration(configuration_dict)
+            pool = futures.ThreadPoolExecutor(workers)
+            clones = queue.Queue()
+
+            def run_chunk(chunk):
+                try:
+                    clone = clones.get_nowait()
+                except queue.Empty:
+                    clone = self._clone_process()
+                try:
+                    return self._run_iterations_chunk(clone, chunk, outputs,
+                                                      configuration_dict)
+                finally:
+                    clones.put(clone)
+
+            jobs = [pool.submit(run_chunk, chunk) for chunk in chunks]
+        try:
+            # gather outputs in iterations order
+            results = []
+            for job in jobs:
+                result = job.result()
+                if self.parallel_mode == 'process':
+                    result, events = result
+                    for event in events or []:
+                        instrumentation.emit_event(event)
+                results.extend(result)
+        finally:
+            for job in jobs:
+                job.cancel()
+            pool.shutdown(wait=True)
+
+        if no_output_value:
+            for parameter in outputs:
+                setattr(self, parameter,
+                        [result[parameter] for result in results])
+
+    def _clone_process(self):
+        """ Build a new instance of the iterated process, for a worker
+        """
+        try:
+            clone = get_process_instance(self.process.__class__,
+                                         study_config=self.study_config)
+        except Exception:
+            clone = get_process_instance(self.process.id,
+                                         study_config=self.study_config)
+        if hasattr(self.process, 'context_name'):
+            clone.context_name = self.process.context_name
+        return clone
+
+    @staticmethod
+    def _run_iterated_process(process, configuration_dict):
+        """ Run an iteration of the iterated process, as
+        :meth:`StudyConfig.run <capsul.study_config.study_config.StudyConfig.run>`
+        does, without activating the configuration
+        """
+        # Import cannot be done on module due to circular dependencies
+        from capsul.pipeline.pipeline import Pipeline
+
+        study_config = process.get_study_config()
+        missing = process.get_missing_mandatory_parameters()
+        if len(missing) != 0:
+            raise ValueError('In process %s: missing mandatory parameters: %s'
+                             % (process.name, ', '.join(missing)))
+        output_directory = None
+        if 'output_directory' in process.traits():
+            output_directory = process.output_directory
+        if output_directory in (None, Undefined, ''):
+            output_directory = study_config.output_directory
+        temporary_files = []
+        if isinstance(process, Pipeline):
+            processes = []
+            for node in process.workflow_ordered_nodes():
+                process._check_temporary_files_for_node(node,
+                                                        temporary_files)
+                processes.append(node.process)
+        else:
+            processes = [process]
+        result = None
+        try:
+            for node_process in processes:
+                # distinct processes output directories are reserved for
+                # concurrent iterations
+                process_counter = None
+                if output_directory not in (None, Undefined) \
+                        and study_config.process_output_directory:
+                    process_counter = reserve_process_counter(study_config)
+                result, log_file = run_process(
+                    output_directory, node_process,
+                    generate_logging=study_config.generate_logging,
+                    configuration_dict=configuration_dict,
+                    process_counter=process_counter,
+                    activate_configuration=False)
+        finally:
+            if temporary_files:
+                process._free_temporary_files(temporary_files)
+        return result
+
+    @staticmethod
+    def _run_iterations_chunk(process, iterations, outputs,
+                              configuration_dict, events=None):
+        """ Run a list of iterations on a process instance
+
+        Parameters
+        ----------
+        process: Process
+            process instance used to run iterations
+        iterations: list of tuple
+            (index, parameters) for each iteration: the iteration index and
+            the dict of its parameters values
+        outputs: list of str
+            names of iterative output parameters
+        configuration_dict: dict
+            configuration of the processes, activated by the caller
+        events: list
+            if not None, iterations are measured and their instrumentation
+            events are appended to this list instead of being emitted
+
+        Returns
+        -------
+        outputs_values: list of dict
+            output parameters values of each iteration
+        """
+        results = []
+        for iteration, parameters in iterations:
+            measure = None
+            emit = events is None
+            if not emit or instrumentation.is_active():
+                measure = instrumentation.NodeMeasure(
+                    process, kind='iteration', iteration=iteration)
+            for name, value in six.iteritems(parameters):
+                setattr(process, name, value)
+            if measure is not None:
+                measure.lap('propagation_time')
+                event = measure.start(emit=emit)
+                if not emit:
+                    events.append(event)
+            try:
+                ProcessIteration._run_iterated_process(process,
+                                                       configuration_dict)
+            except Exception:
+                if measure is not None:
+                    measure.stop('failed', emit=emit)
+                raise
+            if measure is not None:
+                event = measure.stop(emit=emit)
+                if not emit:
+                    events.append(event)
+            results.append(dict((name, getattr(process, name))
+                                for name in outputs))
+        return results
 
     def set_study_config(self, study_config):
         super(ProcessIteration, self).set_study_config(study_config)
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+from __future__ import absolute_import
+import unittest
+import random
+import six
+from traits.api import File, Float
+from capsul.api import Process
+from capsul.api import Pipeline, Switch
+from capsul.pipeline.test.test_switch_pipeline import SwitchPipeline
+from capsul.pipeline.test.test_double_switch import DoubleSwitchPipeline1
+from capsul.pipeline.test.test_complex_pipeline_activations \
+    import ComplexPipeline
+
+
+class DummyProcess(Process):
+    """ Dummy Test Process
+    """
+    def __init__(self):
+        super(DummyProcess, self).__init__()
+
+        # inputs
+        self.add_trait("input_image", File(optional=False))
+        self.add_trait("other_input", Float(optional=True))
+
+        # outputs
+        self.add_trait("output_image", File(optional=False, output=True))
+        self.add_trait("other_output", Float(optional=True, output=True))
+
+
+class RandomPipeline(Pipeline):
+    """ Random layered pipeline with switches, used to compare incremental
+    and full activation updates on many configurations.
+    """
+    def __init__(self, seed, **kwargs):
+        self.seed = seed
+        kwargs.setdefault('autoexport_nodes_parameters', False)
+        super(RandomPipeline, self).__init__(**kwargs)
+
+    def pipeline_definition(self):
+        rng = random.Random(self.seed)
+        outputs = ['input_image']
+        procs = []
+        n = 0
+        for layer in range(5):
+            new_outputs = []
+            for i in range(rng.randint(1, 4)):
+                name = 'node_%d' % n
+                n += 1
+                self.add_process(
+                    name, 'capsul.pipeline.test.test_incremental_activation.'
+                    'DummyProcess')
+                source = rng.choice(outputs)
+                if source == 'input_image':
+                    if 'input_image' not in self.user_traits():
+                        self.export_parameter(name, 'input_image')
+                    else:
+                        self.add_link('input_image->%s.input_image' % name)
+                else:
+                    self.add_link('%s->%s.input_image' % (source, name))
+                if procs and rng.random() < 0.3:
+                    weak = (rng.random() < 0.5)
+                    self.add_link('%s.other_output->%s.other_input'
+                                  % (rng.choice(procs), name), weak)
+                new_outputs.append('%s.output_image' % name)
+                procs.append(name)
+            if len(new_outputs) >= 2 and rng.random() < 0.7:
+                switch_name = 'switch_%d' % layer
+                inputs = ['in%d' % i for i in range(len(new_outputs))]
+                self.add_switch(switch_name, inputs, ['out'])
+                for inp, source in zip(inputs, new_outputs):
+                    self.add_link('%s->%s.%s_switch_out'
+                                  % (source, switch_name, inp))
+                new_outputs = ['%s.out' % switch_name]
+            outputs = new_outputs + outputs[-2:]
+        for i, output in enumerate(new_outputs):
+            node_name, plug_name = output.split('.')
+            self.export_parameter(node_name, plug_name, 'output_%d' % i)
+
+
+def activation_state(pipeline):
+    """ Activation flags of all nodes and plugs of a pipeline
+    """
+    state = {}
+    for node in pipeline.all_nodes():
+        state[node.full_name] = node.activated
+        for plug_name, plug in six.iteritems(node.plugs):
+            state['%s.%s' % (node.full_name, plug_name)] = plug.activated
+    return state
+
+
+class TestIncrementalActivation(unittest.TestCase):
+
+    def check_against_full_update(self, pipeline, msg=''):
+        incremental = activation_state(pipeline)
+        pipeline.update_nodes_and_plugs_activation()
+        full = activation_state(pipeline)
+        diff = sorted(k for k in full if full[k] != incremental[k])
+        self.assertEqual(diff, [], msg)
+
+    def check_all_changes(self, pipeline):
+        """ Toggle every switch value and every node enabled state, and
+        compare the incremental update with a full one after each change.
+        """
+        self.check_against_full_update(pipeline, 'initial state')
+        for node in list(pipeline.all_nodes()):
+            if isinstance(node, Switch):
+                values = node.trait('switch').handler.values
+                for value in list(values) + [values[0]]:
+                    node.switch = value
+                    self.check_against_full_update(
+                        pipeline, '%s.switch = %s' % (node.full_name, value))
+        for node in list(pipeline.all_nodes()):
+            if node is pipeline.pipeline_node:
+                continue
+            node.enabled = False
+            self.check_against_full_update(
+                pipeline, '%s disabled' % node.full_name)
+            for other in list(pipeline.all_nodes()):
+                if isinstance(other, Switch):
+                    values = other.trait('switch').handler.values
+                    for value in reversed(values):
+                        other.switch = value
+                        self.check_against_full_update(
+                            pipeline, '%s disabled, %s.switch = %s'
+                            % (node.full_name, other.full_name, value))
+            node.enabled = True
+            self.check_against_full_update(
+                pipeline, '%s enabled' % node.full_name)
+
+    def test_switch_pipeline(self):
+        self.check_all_changes(SwitchPipeline())
+
+    def test_double_switch(self):
+        self.check_all_changes(DoubleSwitchPipeline1())
+
+    def test_complex_pipeline(self):
+        self.check_all_changes(ComplexPipeline())
+
+    def test_links_changes(self):
+        pipeline = SwitchPipeline()
+        pipeline.remove_link('way21.output_image->way22.input_image')
+        self.check_against_full_update(pipeline)
+        pipeline.add_link('way21.output_image->way22.input_image')
+        self.check_against_full_update(pipeline)
+
+    def test_random_pipelines(self):
+        for seed in range(10):
+            pipeline = RandomPipeline(seed)
+            self.check_all_changes(pipeline)
+
+    def test_full_update_option(self):
+        pipeline = SwitchPipeline()
+        pipeline.incremental_activation = False
+        pipeline.switch = 'two'
+        self.check_against_full_update(pipeline)
+
+
+def test():
+    """ Function to execute unitest
+    """
+    suite = unittest.TestLoader().loadTestsFromTestCase(
+        TestIncrementalActivation)
+    runtime = unittest.TextTestRunner(verbosity=2).run(suite)
+    return runtime.wasSuccessful()
+
+
+if __name__ == "__main__":
+    print("RETURNCODE: ", test())
@@ -268,6 +268,24 @@ class TestPipeline(unittest.TestCase):
         # iterative jobs -> iterative output barrier (2)
         self.assertEqual(len(workflow.dependencies), 6)
 
+    def test_iterative_jobs_template(self):
+        self.pipeline.output_image = [
+            os.path.join(self.directory, 'toto_out'),
+            os.path.join(self.directory, 'tutu_out')]
+        self.pipeline.other_output = [1., 2.]
+        workflow = pipeline_workflow.workflow_from_pipeline(self.pipeline)
+        iter_jobs = [job for job in workflow.jobs
+                     if re.match(r'DummyProcess_[0-9]+$', job.name)]
+        self.assertEqual(len(iter_jobs), 2)
+        # iteration jobs share the same configuration, and only differ by
+        # their parameters
+        self.assertTrue(iter_jobs[0].configuration
+                        is iter_jobs[1].configuration)
+        self.assertEqual(iter_jobs[0].command, iter_jobs[1].command)
+        self.assertEqual(
+            sorted([job.param_dict['input_image'] for job in iter_jobs]),
+            self.pipeline.input_image)
+
     def test_iterative_big_pipeline_workflow(self):
         self.big_pipeline.files_to_create = [["toto", "tutu"],
                                          ["tata", "titi", "tete"]]
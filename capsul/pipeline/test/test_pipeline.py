@@ -2,7 +2,7 @@
 from __future__ import print_function
 from __future__ import absolute_import
 import unittest
-from traits.api import File, Float
+from traits.api import File, Float, List
 from capsul.api import Process
 from capsul.api import Pipeline
 from capsul.api import get_process_instance
@@ -66,6 +66,47 @@ class MyPipeline(Pipeline):
         self.nodes['constant'].process.input_image = 'blah'
 
 
+class DummyListProcess(Process):
+    """ Dummy process with lists parameters
+    """
+    inputs = List(File())
+    outputs = List(File(), output=True)
+    other_input = Float(optional=True)
+
+
+class ListPipeline(Pipeline):
+    """ Pipeline propagating lists through several links
+    """
+    do_autoexport_nodes_parameters = False
+
+    def pipeline_definition(self):
+        for name in ('node1', 'node2', 'node3'):
+            self.add_process(
+                name, "capsul.pipeline.test.test_pipeline.DummyListProcess")
+        self.export_parameter("node1", "inputs")
+        self.export_parameter("node1", "other_input")
+        self.add_link("inputs->node2.inputs")
+        self.add_link("node2.outputs->node3.inputs")
+        self.export_parameter("node3", "outputs")
+
+
+class NestedPipeline(Pipeline):
+    """ Pipeline made of two MyPipeline sub-pipelines
+    """
+    def pipeline_definition(self):
+        self.add_process("sub1",
+            "capsul.pipeline.test.test_pipeline.MyPipeline")
+        self.add_process("sub2",
+            "capsul.pipeline.test.test_pipeline.MyPipeline")
+        self.add_link("sub1.output->sub2.input_image")
+
+
+class LazyNestedPipeline(NestedPipeline):
+    """ NestedPipeline with lazy sub-pipelines
+    """
+    lazy_sub_pipelines = True
+
+
 class TestPipeline(unittest.TestCase):
 
     debug = False
@@ -101,6 +142,155 @@ class TestPipeline(unittest.TestCase):
         self.pipeline.workflow_ordered_nodes()
         self.assertEqual(self.pipeline.workflow_repr, "")
 
+    def test_dependency_index(self):
+        nodes = self.pipeline.nodes
+        index = self.pipeline.dependency_index()
+        self.assertTrue(self.pipeline.dependency_index() is index)
+        self.assertEqual(index.successors[nodes['node1']], [nodes['node2']])
+        self.assertEqual(index.in_degree[nodes['node2']], 2)
+        order = index.topological_order(
+            [nodes['node2'], nodes['node1'], nodes['constant']])
+        self.assertEqual(order[-1], nodes['node2'])
+        # structure changes invalidate the index
+        self.pipeline.remove_link("node1.output_image->node2.input_image")
+        index2 = self.pipeline.dependency_index()
+        self.assertTrue(index2 is not index)
+        self.assertEqual(index2.successors[nodes['node1']], [nodes['node2']])
+        self.pipeline.remove_link("node1.other_output->node2.other_input")
+        index = self.pipeline.dependency_index()
+        self.assertEqual(index.successors[nodes['node1']], [])
+        self.assertEqual(index.topological_order([nodes['node2']]),
+                         [nodes['node2']])
+        self.pipeline.add_process(
+            "node3", "capsul.pipeline.test.test_pipeline.DummyProcess")
+        self.pipeline.add_link("node2.output_image->node3.input_image")
+        index = self.pipeline.dependency_index()
+        self.assertEqual(index.predecessors[nodes['node3']],
+                         [nodes['node2']])
+        self.pipeline.remove_node("node3")
+        self.assertTrue('node3' not in
+                        self.pipeline.dependency_index().names.values())
+
+    def test_plug_notification(self):
+        plug = self.pipeline.nodes['node2'].plugs['input_image']
+        changes = []
+
+        def changed(obj, name, old, new):
+            changes.append((name, old, new))
+
+        plug.on_trait_change(changed, 'enabled')
+        plug.on_trait_change(lambda new: changes.append(new), 'enabled')
+        plug.enabled = False
+        plug.enabled = False
+        self.assertEqual(changes, [('enabled', True, False), False])
+        # the node has been deactivated through its own handler
+        self.assertFalse(self.pipeline.nodes['node2'].activated)
+        plug.on_trait_change(changed, 'enabled', remove=True)
+        plug.enabled = True
+        self.assertEqual(changes[2:], [True])
+        self.assertTrue(self.pipeline.nodes['node2'].activated)
+        # only changes of the enabled attribute are notified
+        self.assertRaises(ValueError, plug.on_trait_change, changed,
+                          'activated')
+
+    def test_plug_attributes(self):
+        import pickle
+        from capsul.pipeline.pipeline_nodes import Plug
+
+        # other keyword arguments become attributes (as the name of map and
+        # reduce nodes plugs)
+        plug = Plug(name='inputs_0', optional=True, output=True)
+        self.assertEqual(plug.name, 'inputs_0')
+        self.assertTrue(plug.optional)
+        self.assertTrue(plug.output)
+        self.assertFalse(plug.activated)
+        self.assertEqual(plug.links_to, set())
+        # notification handlers (a lambda cannot be pickled) are not
+        # pickled
+        changes = []
+        plug.on_trait_change(lambda new: changes.append(new))
+        plug.enabled = False
+        self.assertEqual(changes, [False])
+        plug2 = pickle.loads(pickle.dumps(plug))
+        self.assertEqual(plug2.name, 'inputs_0')
+        self.assertFalse(plug2.enabled)
+        self.assertTrue(plug2.output)
+        plug2.enabled = True
+        self.assertEqual(changes, [False])
+        plug.enabled = True
+        self.assertEqual(changes, [False, True])
+
+    def test_batch_propagation(self):
+        pipeline = ListPipeline()
+        ref_pipeline = ListPipeline()
+        values = ['/tmp/input_%d.nii' % i for i in range(100)]
+        ref_pipeline.inputs = values
+        ref_pipeline.other_input = 3.
+        pipeline.set_parameters_batch({'inputs': values, 'other_input': 3.})
+        self.assertEqual(
+            [node.process.export_to_dict()
+             for name, node in sorted(ref_pipeline.nodes.items())
+             if name != ''],
+            [node.process.export_to_dict()
+             for name, node in sorted(pipeline.nodes.items())
+             if name != ''])
+        # propagated lists are distinct traits lists
+        node1 = pipeline.nodes['node1'].process
+        node2 = pipeline.nodes['node2'].process
+        self.assertTrue(node1.inputs is not node2.inputs)
+        node2.inputs.append('/tmp/other.nii')
+        self.assertEqual(len(node1.inputs), 100)
+        # nested delays: values are propagated when the last one ends
+        pipeline.delay_value_propagation()
+        pipeline.delay_value_propagation()
+        node2.outputs = values[:2]
+        node2.outputs = values[:3]
+        node3 = pipeline.nodes['node3'].process
+        pipeline.restore_value_propagation()
+        self.assertEqual(node3.inputs, [])
+        pipeline.restore_value_propagation()
+        self.assertEqual(node3.inputs, values[:3])
+        node2.outputs = values[:4]
+        self.assertEqual(node3.inputs, values[:4])
+
+    def test_lazy_sub_pipelines(self):
+        from capsul.pipeline import pipeline_tools
+        ref_pipeline = NestedPipeline()
+        # the first instance records the sub-pipelines parameters
+        LazyNestedPipeline()
+        pipeline = LazyNestedPipeline()
+        sub1 = pipeline.nodes['sub1'].process
+        self.assertTrue(sub1._lazy_definition)
+        self.assertEqual(list(sub1._nodes.keys()), [''])
+        self.assertEqual(sorted(pipeline.nodes['sub1'].plugs.keys()),
+                         sorted(ref_pipeline.nodes['sub1'].plugs.keys()))
+        for p in (ref_pipeline, pipeline):
+            p.input_image = '/tmp/input.nii'
+            p.output = '/tmp/output.nii'
+        self.assertEqual(sub1.input_image, '/tmp/input.nii')
+        self.assertTrue(pipeline.nodes['sub2'].process._lazy_definition)
+        # inner nodes are built on first access
+        self.assertEqual(sub1.nodes['node1'].process.input_image,
+                         '/tmp/input.nii')
+        self.assertFalse(sub1._lazy_definition)
+        self.assertEqual(
+            sub1.nodes['node1'].process.context_name,
+            pipeline.nodes['sub1'].process.context_name + '.node1')
+        # workflow generation builds the other one
+        pipeline.workflow_ordered_nodes()
+        self.assertFalse(pipeline.nodes['sub2'].process._lazy_definition)
+        self.assertEqual(
+            pipeline.nodes['sub2'].process.nodes['node2'].process.output_image,
+            '/tmp/output.nii')
+        self.assertEqual(
+            pipeline_tools.dump_pipeline_state_as_dict(ref_pipeline),
+            pipeline_tools.dump_pipeline_state_as_dict(pipeline))
+        self.assertEqual(
+            [(node.full_name, node.activated) for node
+             in ref_pipeline.all_nodes()],
+            [(node.full_name, node.activated) for node
+             in pipeline.all_nodes()])
+
     def test_run_pipeline(self):
         setattr(self.pipeline.nodes_activation, "node2", True)
         tmp = tempfile.mkstemp('', prefix='capsul_test_pipeline')
@@ -158,6 +158,44 @@ class TestPipelineWorkflow(unittest.TestCase):
             raise ValueError('workflow should have failed due to a missing '
                 'temporary file')
 
+    def test_shared_configuration(self):
+        self.pipeline.enable_all_pipeline_steps()
+        wf = pipeline_workflow.workflow_from_pipeline(
+            self.pipeline, study_config=self.study_config)
+        configs = dict((job.name, job.configuration) for job in wf.jobs)
+        # processes with the same requirements share their configuration
+        self.assertTrue(configs['node1'] is configs['node3'])
+        self.assertTrue(configs['node1'] is configs['node4'])
+        self.assertFalse(configs['node1'] is configs['node2'])
+        self.assertTrue('capsul.engine.module.spm' in configs['node2'])
+
+    def test_sub_pipeline_steps(self):
+        pipeline = Pipeline()
+        pipeline.set_study_config(self.study_config)
+        pipeline.add_process('sub', self.pipeline)
+        pipeline.autoexport_nodes_parameters(include_optional=True)
+        self.pipeline.enable_all_pipeline_steps()
+        self.pipeline.pipeline_steps.step3 = False
+        wf = pipeline_workflow.workflow_from_pipeline(
+            pipeline, study_config=self.study_config,
+            create_directories=False)
+        self.assertEqual(sorted(job.name for job in wf.jobs),
+                         ['node1', 'node2', 'node4'])
+        self.assertEqual(len(wf.dependencies), 2)
+
+    def test_layered_pipeline(self):
+        from capsul.benchmark.synthetic import layered_pipeline
+
+        pipeline = layered_pipeline(3, 4, study_config=self.study_config)
+        wf = pipeline_workflow.workflow_from_pipeline(
+            pipeline, study_config=self.study_config)
+        self.assertEqual(len(wf.jobs), 12)
+        # each node of a layer depends on 2 nodes of the previous one
+        self.assertEqual(len(wf.dependencies), 18)
+        jobs = dict((job.name, job) for job in wf.jobs)
+        self.assertTrue((jobs['n_0_1'], jobs['n_1_0']) in wf.dependencies)
+        self.assertTrue((jobs['n_2_2'], jobs['n_3_2']) in wf.dependencies)
+
 
 def test():
     """ Function to execute unitest
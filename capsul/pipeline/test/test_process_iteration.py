@@ -6,16 +6,19 @@ import sys
 import os
 import os.path as osp
 import unittest
-from tempfile import NamedTemporaryFile
+import threading
+import shutil
+from tempfile import NamedTemporaryFile, mkdtemp
 import struct
 
 # Trait import
-from traits.api import String, Int, List, File
+from traits.api import String, Int, List, File, Float, Directory, Undefined
 
 # Capsul import
 from capsul.api import Process
 from capsul.api import Pipeline
 from capsul.pipeline.process_iteration import ProcessIteration
+from capsul.study_config.study_config import StudyConfig
 import six
 from six.moves import range
 
@@ -47,6 +50,24 @@ class ProcessSlice(Process):
             f.seek(self.slice_number*2, 0)
             f.write(struct.pack('H', self.slice_number))
 
+class Square(Process):
+    x = Float()
+    offset = Float(0.)
+    y = Float(output=True)
+
+    def _run_process(self):
+        self.y = self.x * self.x + self.offset
+
+
+class DirectorySquare(Square):
+    output_directory = Directory(Undefined, optional=True)
+    directory = Directory(output=True, optional=True)
+
+    def _run_process(self):
+        super(DirectorySquare, self)._run_process()
+        self.directory = self.output_directory
+
+
 class MyPipeline(Pipeline):
     """ Simple Pipeline to test the iterative Node
     """
@@ -116,11 +137,95 @@ class TestPipeline(unittest.TestCase):
         numbers = struct.unpack_from('H' * self.parallel_processes, result)
         self.assertEqual(numbers, tuple(range(self.parallel_processes)))
 
+    def test_parallel_iterations(self):
+        """ Method to test iterations dispatched to a pool of workers.
+        """
+        iteration = self.pipeline.nodes['process_slices'].process
+        iteration.parallel_workers = 4
+        iteration.parallel_chunk_size = 3
+        self.pipeline()
+        with open(self.pipeline.output_image,'rb') as f:
+            result = f.read()
+        numbers = struct.unpack_from('H' * self.parallel_processes, result)
+        self.assertEqual(numbers, tuple(range(self.parallel_processes)))
+
+
+class TestParallelIteration(unittest.TestCase):
+    """ Class to test iterations in a pool of workers
+    """
+    def run_iteration(self, **kwargs):
+        iteration = ProcessIteration(
+            'capsul.pipeline.test.test_process_iteration.Square', ['x', 'y'])
+        for name, value in six.iteritems(kwargs):
+            setattr(iteration, name, value)
+        iteration.x = [float(i) for i in range(23)]
+        iteration.offset = 1.
+        iteration()
+        return iteration.y
+
+    def test_outputs_order(self):
+        sequential = self.run_iteration()
+        self.assertEqual(sequential, [i * i + 1. for i in range(23)])
+        for chunk_size in (None, 1, 5, 100):
+            self.assertEqual(
+                self.run_iteration(parallel_workers=4,
+                                   parallel_chunk_size=chunk_size),
+                sequential)
+
+    def test_process_pool(self):
+        self.assertEqual(
+            self.run_iteration(parallel_workers=2, parallel_mode='process'),
+            [i * i + 1. for i in range(23)])
+
+    def test_configuration_activation(self):
+        from capsul import engine
+        activate_configuration = engine.activate_configuration
+        activation_threads = set()
+
+        def activate(configuration_dict):
+            activation_threads.add(threading.current_thread())
+            activate_configuration(configuration_dict)
+
+        engine.activate_configuration = activate
+        try:
+            self.run_iteration(parallel_workers=4, parallel_chunk_size=1)
+        finally:
+            engine.activate_configuration = activate_configuration
+        # workers do not activate the configuration
+        self.assertEqual(activation_threads, set([threading.current_thread()]))
+
+    def test_output_directories(self):
+        output_directory = mkdtemp()
+        try:
+            study_config = StudyConfig(
+                modules=[], output_directory=output_directory,
+                process_output_directory=True)
+            for mode in ('thread', 'process'):
+                iteration = ProcessIteration(
+                    'capsul.pipeline.test.test_process_iteration.'
+                    'DirectorySquare', ['x', 'y', 'directory'],
+                    study_config=study_config)
+                iteration.parallel_workers = 2
+                iteration.parallel_chunk_size = 1
+                iteration.parallel_mode = mode
+                iteration.x = [float(i) for i in range(6)]
+                iteration()
+                self.assertEqual(iteration.y, [i * i for i in range(6)])
+                self.assertEqual(iteration.directory,
+                                 [iteration.output_directory] * 6)
+                # each iteration gets its own process output directory
+                self.assertEqual(
+                    len(os.listdir(iteration.output_directory)), 6)
+        finally:
+            shutil.rmtree(output_directory)
+
 
 def test():
     """ Function to execute unitest
     """
     suite = unittest.TestLoader().loadTestsFromTestCase(TestPipeline)
+    suite.addTests(unittest.TestLoader().loadTestsFromTestCase(
+        TestParallelIteration))
     runtime = unittest.TextTestRunner(verbosity=2).run(suite)
     return runtime.wasSuccessful()
 
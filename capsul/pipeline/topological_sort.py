@@ -6,12 +6,17 @@ Classes
 =======
 :class:`GraphNode`
 ------------------
+:class:`Graph`
+--------------
+:class:`DependencyIndex`
+------------------------
 '''
 
 # System import
 from __future__ import absolute_import
 from __future__ import print_function
 import logging
+import collections
 import six
 
 # Define the logger
@@ -140,6 +145,8 @@ class Graph(object):
         """
         self._nodes = {}
         self._links = []
+        # set of links, for fast membership tests
+        self._links_set = set()
 
     def add_node(self, node):
         """ Method to add a GraphNode in the Graph
@@ -186,10 +193,11 @@ class Graph(object):
         if to_node not in self._nodes:
             raise Exception("Node {0} is not defined in the Graph."
                    "Use add_node() method".format(to_node))
-        if (from_node, to_node) not in self._links:
+        if (from_node, to_node) not in self._links_set:
             self._nodes[to_node].add_link_from(self._nodes[from_node])
             self._nodes[from_node].add_link_to(self._nodes[to_node])
             self._links.append((from_node, to_node))
+            self._links_set.add((from_node, to_node))
 
     def topological_sort(self):
         """ Perform the topological sort: find an order in which all the
@@ -198,10 +206,13 @@ class Graph(object):
         Step 2: Loop until there are nnil
         a) Delete the current nodes c_nnil of in-degree 0.
         b) Place it in the output.
-        c) Remove all its outgoing links from the graph.
-        d) If the node has in-degree 0, add the node to nnil.
+        c) Decrement the in-degree of its successors.
+        d) If a successor has in-degree 0, add it to nnil.
         Step 3: Assert that there is no loop in the graph.
 
+        In-degrees are counted apart from the nodes, so the graph is not
+        modified and the sort is linear in the number of nodes and links.
+
         Returns
         -------
         output: list of tuple
@@ -211,8 +222,10 @@ class Graph(object):
         ordered_nodes = []
 
         # Step 1
+        in_degree = {}
         nnil = []
         for name, node in six.iteritems(self._nodes):
+            in_degree[node] = node.links_from_degree
             if node.links_from_degree == 0:
                 nnil.append(node)
 
@@ -224,9 +237,9 @@ class Graph(object):
             ordered_nodes.append(c_nnil)
         #-- c
             for node in c_nnil.links_to:
-                node.remove_link_from(c_nnil)
+                in_degree[node] -= 1
         #-- d
-                if node.links_from_degree == 0:
+                if in_degree[node] == 0:
                     nnil.append(node)
 
         # Step 3
@@ -237,6 +250,126 @@ class Graph(object):
                             "Please inverstigate")
 
 
+class DependencyIndex(object):
+    """ Index of the dependencies between the nodes of a pipeline
+
+    The index is built once from the plugs links of the pipeline nodes, and
+    is then shared by the traversals of the pipeline (completion, workflow
+    graph, execution order) which thus do not need to scan plugs and links
+    again: it is obtained through
+    :meth:`~capsul.pipeline.pipeline.Pipeline.dependency_index`, which
+    keeps it until the pipeline structure changes (nodes or links added or
+    removed).
+
+    Only links between nodes of the pipeline are indexed. The pipeline node
+    itself (named ``''``) is a node of the index: it is both the source of
+    links to its inner nodes (exported inputs) and the destination of links
+    from them (exported outputs), so traversals should generally exclude
+    it.
+
+    Attributes
+    ----------
+    nodes : list
+        [(node_name, node), ...] in the pipeline nodes order
+    names : dict
+        {node: node_name}
+    successors : dict
+        {node: [successor nodes]}, without duplicates and self-links
+    predecessors : dict
+        {node: [predecessor nodes]}, without duplicates and self-links
+    in_degree : dict
+        {node: number of predecessors}
+    plug_links : dict
+        {plug: [links to nodes of the pipeline]}, links are those of
+        ``plug.links_to``: (dest_node_name, dest_plug_name, dest_node,
+        dest_plug, weak_link)
+
+    Methods
+    -------
+    topological_order
+    """
+
+    def __init__(self, pipeline):
+        """ Build the index of a pipeline
+
+        Parameters
+        ----------
+        pipeline: Pipeline (mandatory)
+            the pipeline to index
+        """
+        self.nodes = list(pipeline.nodes.items())
+        self.names = dict((node, name) for name, node in self.nodes)
+        self.successors = dict((node, []) for name, node in self.nodes)
+        self.predecessors = dict((node, []) for name, node in self.nodes)
+        self.plug_links = {}
+        for node_name, node in self.nodes:
+            successors = self.successors[node]
+            known = set()
+            for plug in six.itervalues(node.plugs):
+                links = [link for link in plug.links_to
+                         if pipeline.nodes.get(link[0]) is link[2]]
+                if not links:
+                    continue
+                self.plug_links[plug] = links
+                for link in links:
+                    dest_node = link[2]
+                    if dest_node is node or dest_node in known:
+                        continue
+                    known.add(dest_node)
+                    successors.append(dest_node)
+                    self.predecessors[dest_node].append(node)
+        self.in_degree = dict((node, len(predecessors))
+                              for node, predecessors
+                              in six.iteritems(self.predecessors))
+
+    def topological_order(self, nodes=None):
+        """ Order nodes so that each node comes after the nodes it depends on
+
+        The order is computed using Kahn's algorithm on the subgraph of the
+        given nodes, in linear time. Nodes which are part of a cycle, or
+        which depend on one, cannot be ordered and are not part of the
+        result.
+
+        Parameters
+        ----------
+        nodes: iterable (optional)
+            nodes to order. Default: all the nodes of the index. Links
+            going through other nodes are not taken into account.
+
+        Returns
+        -------
+        ordered_nodes: list
+            the ordered nodes. Independent nodes are in the pipeline nodes
+            order.
+        """
+        if nodes is None:
+            selected = None
+            order = [node for name, node in self.nodes]
+        else:
+            selected = set(nodes)
+            order = [node for name, node in self.nodes if node in selected]
+        in_degree = {}
+        for node in order:
+            if selected is None:
+                in_degree[node] = self.in_degree[node]
+            else:
+                in_degree[node] = len([pred
+                                       for pred in self.predecessors[node]
+                                       if pred in selected])
+        ready = collections.deque(node for node in order
+                                  if in_degree[node] == 0)
+        ordered_nodes = []
+        while ready:
+            node = ready.popleft()
+            ordered_nodes.append(node)
+            for successor in self.successors[node]:
+                if successor in in_degree:
+                    in_degree[successor] -= 1
+                    if in_degree[successor] == 0:
+                        ready.append(successor)
+        return ordered_nodes
+
+
 if __name__ == '__main__':
 
     """ A toy example:
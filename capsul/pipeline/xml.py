@@ -22,6 +22,7 @@ from soma.sorted_dictionary import OrderedDict
 
 from capsul.process.xml import string_to_value
 from capsul.pipeline.pipeline_construction import PipelineConstructor
+from capsul.utils.parse_cache import cached_parse
 from soma.controller import Controller
 
 from traits.api import Undefined
@@ -30,6 +31,9 @@ from traits.api import Undefined
 def create_xml_pipeline(module, name, xml_file):
     """
     Create a pipeline class given its Capsul XML 2.0 representation.
+
+    XML files are parsed once: the parsed definitions are cached (see
+    :mod:`capsul.utils.parse_cache`) as long as files are not modified.
     
     Parameters
     ----------
@@ -43,14 +47,12 @@ def create_xml_pipeline(module, name, xml_file):
     
     """
     if os.path.exists(xml_file):
-        xml_pipeline = ET.parse(xml_file).getroot()
+        class_name, definition = cached_parse(
+            xml_file, 'xml_pipeline', _parse_xml_pipeline_file)
     else:
-        xml_pipeline = ET.fromstring(xml_file)
-    version = xml_pipeline.get('capsul_xml')
-    if version and version != '2.0':
-        raise ValueError('Only Capsul XML 2.0 is supported, not %s' % version)
+        class_name, definition = _parse_xml_pipeline(
+            ET.fromstring(xml_file))
 
-    class_name = xml_pipeline.get('name')
     if class_name:
         if name is None:
             name = class_name
@@ -61,6 +63,34 @@ def create_xml_pipeline(module, name, xml_file):
         name = os.path.basename(xml_file).rsplit('.', 1)[0]
 
     builder = PipelineConstructor(module, name)
+    builder.set_definition(definition)
+    return builder.pipeline
+
+
+def _parse_xml_pipeline_file(xml_file):
+    """ Parse a pipeline XML file, see :func:`_parse_xml_pipeline`
+    """
+    return _parse_xml_pipeline(ET.parse(xml_file).getroot())
+
+
+def _parse_xml_pipeline(xml_pipeline):
+    """
+    Parse a Capsul XML 2.0 pipeline element
+
+    Returns
+    -------
+    class_name: str
+        pipeline name given in the XML description, or None
+    definition: dict
+        pipeline definition, see
+        :meth:`~capsul.pipeline.pipeline_construction.PipelineConstructor.definition`
+    """
+    version = xml_pipeline.get('capsul_xml')
+    if version and version != '2.0':
+        raise ValueError('Only Capsul XML 2.0 is supported, not %s' % version)
+
+    class_name = xml_pipeline.get('name')
+    builder = PipelineConstructor(__name__, class_name or 'XMLPipeline')
     exported_parameters = set()
 
     for child in xml_pipeline:
@@ -255,7 +285,7 @@ def create_xml_pipeline(module, name, xml_file):
                                      gui_child.tag)
         else:
             raise ValueError('Invalid tag in <pipeline>: %s' % child.tag)
-    return builder.pipeline
+    return class_name, builder.definition()
 
 
 def save_xml_pipeline(pipeline, xml_file):
@@ -1037,7 +1037,8 @@ class Process(six.with_metaclass(ProcessMeta, Controller)):
         if value is None:
             value = Undefined
 
-        if protected is not None:
+        if protected is not None \
+                and protected != self.is_parameter_protected(name):
             self.protect_parameter(name, protected)
         # Set the new trait value
         setattr(self, name, value)
@@ -1149,28 +1150,37 @@ class Process(six.with_metaclass(ProcessMeta, Controller)):
             configuration values, because different nodes may require different
             config values.
         '''
+        config = self._resolved_requirements(environment, message_list)
+        if config is None:
+            return None
+        return deepcopy(config)
+
+    def _resolved_requirements(self, environment='global',
+                               message_list=None):
+        '''
+        Same as :meth:`check_requirements` (default implementation), but the
+        returned config dict is shared with other processes with the same
+        requirements, and must not be modified. Requirements resolution is
+        cached by the engine settings, see
+        :meth:`~capsul.engine.settings.Settings.resolve_requirements`.
+        '''
         settings = self.get_study_config().engine.settings
         req = self.requirements()
-        config = settings.select_configurations(environment, uses=req)
-        success = True
-        for module in req:
-            module_name = settings.module_name(module)
-            if module_name not in config:
-                print('requirement:', req, 'not met in', self.name)
-                print('config:', settings.select_configurations(environment))
-                if message_list is not None:
-                    message_list.append('requirement: %s is not met in %s'
-                                        % (req, self.name))
-                else:
-                    # if no message is expected, then we can return immediately
-                    # without checking further requirements. Otherwise we
-                    # continue to get a full list of unsatisfied requirements.
-                    return None
-                success = False
-        if success:
-            return config
-        else:
+        config, missing = settings.resolve_requirements(environment, req)
+        for module in missing:
+            print('requirement:', req, 'not met in', self.name)
+            print('config:', settings.select_configurations(environment))
+            if message_list is not None:
+                message_list.append('requirement: %s is not met in %s'
+                                    % (req, self.name))
+            else:
+                # if no message is expected, then we can return immediately
+                # without checking further requirements. Otherwise we
+                # continue to get a full list of unsatisfied requirements.
+                return None
+        if missing:
             return None
+        return config
 
 
 class FileCopyProcess(Process):
@@ -253,6 +253,47 @@ class TestLoadFromDescription(unittest.TestCase):
         sys.path.pop(-1)
         shutil.rmtree(tmpdir)
 
+    def test_pipeline_cache(self):
+        """ Method to test the XML pipelines parse cache and classes cache
+        """
+        from capsul.utils import parse_cache
+        from capsul.pipeline import xml
+        tmpdir = tempfile.mkdtemp()
+        cache_directory = parse_cache.cache_directory
+        parse_cache.cache_directory = os.path.join(tmpdir, 'cache')
+        parse = xml._parse_xml_pipeline_file
+        try:
+            pipeline1 = get_process_instance(
+                "capsul.process.test.xml_pipeline")
+            xml_file = os.path.join(tmpdir, "test_pipeline.xml")
+            save_xml_pipeline(pipeline1, xml_file)
+            pipeline2 = get_process_instance(xml_file)
+            # the same id gives the same class
+            pipeline3 = get_process_instance(xml_file)
+            self.assertTrue(type(pipeline3) is type(pipeline2))
+            # the definition is read from the persistent cache
+            parse_cache.clear_cache()
+            xml._parse_xml_pipeline_file = None
+            pipeline3 = xml.create_xml_pipeline('pipeline_mod', None,
+                                                xml_file)()
+            self.assertEqual(sorted(pipeline3.nodes.keys()),
+                             sorted(pipeline1.nodes.keys()))
+            # modified files are parsed again
+            xml._parse_xml_pipeline_file = parse
+            with open(xml_file, 'w') as f:
+                f.write('<pipeline><invalid/></pipeline>')
+            self.assertRaises(ValueError, get_process_instance, xml_file)
+            # function processes classes are also cached
+            process1 = get_process_instance(
+                "capsul.process.test.test_load_from_description.cat")
+            process2 = get_process_instance(
+                "capsul.process.test.test_load_from_description.cat")
+            self.assertTrue(type(process1) is type(process2))
+        finally:
+            xml._parse_xml_pipeline_file = parse
+            parse_cache.cache_directory = cache_directory
+            shutil.rmtree(tmpdir)
+
     def test_return_string(self):
         process = get_process_instance(
             "capsul.process.test.test_load_from_description.cat")
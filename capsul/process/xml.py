@@ -39,6 +39,10 @@ from six.moves import range
 if sys.version_info[0] >= 3:
     xrange = range
 
+# classes built by create_xml_process:
+# {(module, name, function, xml): process_class}
+_xml_process_classes = {}
+
 _known_values = {
     'Undefined': Undefined,
     'None': Undefined
@@ -164,8 +168,14 @@ def create_xml_process(module, name, function, xml):
     Returns
     -------
     results:  XMLProcess subclass
-        created process class.
+        created process class. Classes are cached: the same class is returned
+        for the same parameters.
     """
+    key = (module, name, function, xml)
+    process_class = _xml_process_classes.get(key)
+    if process_class is not None:
+        return process_class
+
     xml_process = ET.fromstring(xml)
     
     class_kwargs = {
@@ -225,6 +235,7 @@ def create_xml_process(module, name, function, xml):
     
     # Get the process instance associated to the function
     process_class = type(str(name), (XMLProcess, ), class_kwargs)
+    _xml_process_classes[key] = process_class
     return process_class
 
 
@@ -13,16 +13,14 @@ Functions
 # System import
 from __future__ import absolute_import
 import logging
-import traceback
 import os
 import json
 import sys
-from setuptools import find_packages
-from inspect import isclass
 
 # CAPSUL import
 from capsul.api import Pipeline
 from capsul.api import Process
+from capsul.utils.finder import process_index
 
 # Define the logger
 logger = logging.getLogger(__name__)
@@ -97,68 +95,28 @@ def find_pipeline_and_process(module_name):
         found in the module.
     """
 
-    # Try to import the module
+    # Get the module processes from the processes index: modules are only
+    # imported if they have not been indexed yet
     try:
-        __import__(module_name)
+        entries = process_index(module_name)
     except ImportError:
         logger.error("Can't load module {0}".format(module_name))
         return {}, []
 
-    # Get the module path
-    module = sys.modules[module_name]
-    if hasattr(module, '__path__'):
-        module_path = module.__path__[0]
-    else:
-        module_path = os.path.dirname(module.__file__)
-
-    # Use setuptools to go through the module
-    sub_modules = find_packages(where=module_path, exclude=("doc", ))
-    sub_modules = [module_name + "." + x for x in sub_modules]
-    sub_modules.insert(0, module_name)
-    logger.debug("Modules found with setuptools: '{0}'.".format(sub_modules))
-
-    # Shift
-    shift = len(module_name.split("."))
-
     # Create a set with all pipelines and process
     pip_and_proc = [set(), set()]
-    for sub_module in sub_modules:
-        # Get the sub module path
-        sub_module_path = os.path.join(
-            module_path, *sub_module.split(".")[shift:])
-
-        # List all the mdule in sub module path
-        sub_sub_module_names = [
-            sub_module + "." + x[:-3] for x in os.listdir(sub_module_path)
-            if (x.endswith(".py") and not x.startswith("_"))]
-
-        # Try to import the sub sub module
-        for sub_sub_module_name in sub_sub_module_names:
-            try:
-                __import__(sub_sub_module_name)
-            except ImportError:
-                exc_info = sys.exc_info()
-                logger.error("".join(traceback.format_exception(*exc_info)))
-                logger.error("Can't load module "
-                              "{0}".format(sub_sub_module_name))
-                continue
-
-            # Get the module
-            sub_sub_module = sys.modules[sub_sub_module_name]
-
-            # From all the tools, find Pipeline instance
-            for tool_name in dir(sub_sub_module):
-                if tool_name.startswith("_"):
-                    continue
-                tool = getattr(sub_sub_module, tool_name)
-                # Check all the authorized derived class
-                parent_classes = [Pipeline, Process]
-                for cnt, parent_class in enumerate(parent_classes):
-                    if (isclass(tool) and issubclass(tool, parent_class)) \
-                            and tool not in parent_classes:
-                        pip_and_proc[cnt].add(
-                            sub_sub_module_name + "." + tool_name)
-                        break
+    base_classes = ['%s.%s' % (parent_class.__module__, parent_class.__name__)
+                    for parent_class in (Pipeline, Process)]
+    for entry in entries:
+        if entry['source'] != 'class' or entry['package'] \
+                or entry['name'].startswith('_') \
+                or entry['module'].rsplit('.', 1)[-1].startswith('_') \
+                or entry['object'] in base_classes:
+            continue
+        if entry['kind'] == 'pipeline':
+            pip_and_proc[0].add(entry['id'])
+        else:
+            pip_and_proc[1].add(entry['id'])
     # Format output
     output = {
         "pipeline_descs": list(pip_and_proc[0]),
@@ -9,7 +9,7 @@ Classes
 '''
 
 from __future__ import absolute_import
-from traits.api import Bool, Undefined
+from traits.api import Bool, Int, Float, File, Undefined
 from capsul.study_config.study_config import StudyConfigModule
 
 
@@ -23,5 +23,37 @@ class SmartCachingConfig(StudyConfigModule):
             output=False,
             desc='Use smart-caching during the execution',
             groups=['smartcaching']))
+        study_config.add_trait('smart_caching_content_hash', Bool(
+            False,
+            output=False,
+            desc='Identify input files by a hash of their content rather '
+                 'than by their modification time and size',
+            groups=['smartcaching']))
+        study_config.add_trait('smart_caching_max_size', Int(
+            0,
+            output=False,
+            desc='Maximum size of the cache, in bytes. The least recently '
+                 'used results are removed beyond it. 0 means no limit.',
+            groups=['smartcaching']))
+        study_config.add_trait('smart_caching_max_age', Float(
+            0.,
+            output=False,
+            desc='Maximum time, in seconds, a result is kept in the cache '
+                 'after its last use. 0 means no limit.',
+            groups=['smartcaching']))
+        study_config.add_trait('incremental_execution', Bool(
+            False,
+            output=False,
+            desc='Make-like pipelines execution: nodes which have already '
+                 'been run with the same parameters and inputs, and whose '
+                 'outputs have not changed, are not run again',
+            groups=['smartcaching']))
+        study_config.add_trait('execution_record_file', File(
+            Undefined,
+            output=False,
+            desc='Database recording executions for incremental_execution. '
+                 'Default: capsul_execution_record.sqlite in the output '
+                 'directory',
+            groups=['smartcaching']))
         self.study_config = study_config
         # self.study_config.on_trait_change(self._use_smart_caching_changed, 'use_smart_caching')
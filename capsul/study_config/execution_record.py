@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+'''
+Execution records for make-like incremental pipelines execution.
+
+Each successful execution of a process is recorded with a signature built
+from its parameters, its input files fingerprints and its tools versions.
+When the pipeline runs again, a node whose signature has been recorded, and
+whose output files have not changed since, is up to date: it is not run
+again, and its output parameters are restored from the record.
+
+Classes
+=======
+:class:`ExecutionRecord`
+------------------------
+
+Functions
+=========
+:func:`process_signature`
+-------------------------
+'''
+
+# System import
+from __future__ import absolute_import
+from __future__ import print_function
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import contextlib
+import six
+
+# CAPSUL import
+from capsul.study_config.memory import (file_fingerprint, has_attribute,
+                                        is_path_trait, CapsulResultEncoder,
+                                        CapsulResultDecoder)
+
+# TRAITS import
+from traits.api import Undefined
+
+
+def _fingerprints(python_object, content_hash=False, index=None):
+    """ Replace existing files paths by their fingerprints in a parameter
+    value.
+    """
+    if isinstance(python_object, dict):
+        return dict((key, _fingerprints(val, content_hash, index))
+                    for key, val in six.iteritems(python_object)
+                    if val is not Undefined)
+    elif isinstance(python_object, (list, tuple)):
+        return [_fingerprints(val, content_hash, index)
+                for val in python_object if val is not Undefined]
+    elif isinstance(python_object, six.string_types) \
+            and os.path.isfile(python_object):
+        return file_fingerprint(python_object, content_hash=content_hash,
+                                index=index)
+    return python_object
+
+
+def _output_files(python_object, files):
+    """ List files paths in an output parameter value
+    """
+    if isinstance(python_object, (list, tuple)):
+        for val in python_object:
+            _output_files(val, files)
+    elif isinstance(python_object, six.string_types) and python_object:
+        files.append(python_object)
+
+
+def process_signature(process, content_hash=False, index=None):
+    """ Signature of a process execution.
+
+    The signature is a hash of the process identifier and tools versions,
+    of its input parameters (input files being replaced by their
+    fingerprints, see :func:`~capsul.study_config.memory.file_fingerprint`),
+    and of its output files and directories names. Parameters with a
+    ``nohash`` trait attribute are ignored.
+
+    Parameters
+    ----------
+    process: Process
+        the process to be executed.
+    content_hash: bool (optional, default False)
+        identify input files by a hash of their content.
+    index: MemoryIndex (optional)
+        persistent storage of files content hashes.
+
+    Returns
+    -------
+    signature: str
+    """
+    parameters = {}
+    for name, trait in six.iteritems(process.user_traits()):
+        value = getattr(process, name)
+        if value is Undefined \
+                or has_attribute(trait, "nohash", attribute_value=True,
+                                 recursive=True):
+            continue
+        if trait.output:
+            # output values computed by the process cannot be known before
+            # it runs: only files names are part of the signature
+            if is_path_trait(trait):
+                parameters[name] = value
+        else:
+            parameters[name] = _fingerprints(value, content_hash, index)
+    signature = {
+        "process": process.id,
+        "parameters": parameters,
+        "versions": process.versions,
+    }
+    hasher = hashlib.new("md5")
+    hasher.update(json.dumps(signature, sort_keys=True,
+                             cls=CapsulResultEncoder).encode())
+    return hasher.hexdigest()
+
+
+class ExecutionRecord(object):
+    """ Persistent record of processes executions.
+
+    Records are stored in a sqlite database, indexed by the execution
+    signature (see :func:`process_signature`). A record contains the output
+    parameters values of the process, and the fingerprints of its output
+    files at the end of the execution.
+
+    Attributes
+    ----------
+    path: str
+        the record database file
+    content_hash: bool
+        identify files by a hash of their content rather than by their
+        modification time and size.
+
+    Methods
+    -------
+    signature
+    is_up_to_date
+    restore
+    record
+    forget
+    file_hash
+    set_file_hash
+    """
+
+    def __init__(self, path, content_hash=False, index=None):
+        """ Initialize the ExecutionRecord class.
+
+        Parameters
+        ----------
+        path: str
+            the record database file. It is created if needed.
+        content_hash: bool (optional, default False)
+            identify files by a hash of their content.
+        index: MemoryIndex (optional)
+            persistent storage of files content hashes. By default they are
+            stored in the record database.
+        """
+        self.path = path
+        self.content_hash = content_hash
+        if index is None:
+            index = self
+        self.index = index
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        with self._connect() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS executions (signature TEXT "
+                       "PRIMARY KEY, process TEXT, outputs TEXT, files TEXT, "
+                       "time REAL)")
+            db.execute("CREATE TABLE IF NOT EXISTS file_hashes (key TEXT "
+                       "PRIMARY KEY, hash TEXT)")
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """ Open a connection, and commit (or rollback) on exit.
+        """
+        connection = sqlite3.connect(self.path, timeout=60)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def signature(self, process):
+        """ Signature of a process execution, see :func:`process_signature`
+        """
+        return process_signature(process, self.content_hash, self.index)
+
+    def _get(self, signature):
+        with self._connect() as db:
+            row = db.execute("SELECT outputs, files FROM executions WHERE "
+                             "signature=?", (signature, )).fetchone()
+        if row is None:
+            return None
+        return (json.loads(row[0], cls=CapsulResultDecoder),
+                json.loads(row[1]))
+
+    def is_up_to_date(self, process, signature=None):
+        """ Check if a process execution has already been done, and its
+        output files have not changed since.
+
+        Parameters
+        ----------
+        process: Process
+            the process to be executed.
+        signature: str (optional)
+            the execution signature, if it is already known.
+
+        Returns
+        -------
+        up_to_date: bool
+        """
+        if signature is None:
+            signature = self.signature(process)
+        record = self._get(signature)
+        if record is None:
+            return False
+        outputs, files = record
+        for path, fingerprint in six.iteritems(files):
+            if not os.path.exists(path):
+                return False
+            if fingerprint is not None \
+                    and self._file_fingerprint(path) != fingerprint:
+                return False
+        return True
+
+    def restore(self, process, signature=None):
+        """ Set the output parameters of a process from its recorded
+        execution.
+
+        Parameters
+        ----------
+        process: Process
+            the process to be executed.
+        signature: str (optional)
+            the execution signature, if it is already known.
+        """
+        if signature is None:
+            signature = self.signature(process)
+        outputs, files = self._get(signature)
+        for name, value in six.iteritems(outputs):
+            if name in process.user_traits():
+                setattr(process, name, value)
+
+    def record(self, process, signature):
+        """ Record a successful process execution.
+
+        Parameters
+        ----------
+        process: Process
+            the executed process.
+        signature: str
+            the execution signature, computed before the execution.
+        """
+        outputs = {}
+        files = {}
+        for name, trait in six.iteritems(process.user_traits()):
+            if not trait.output:
+                continue
+            value = getattr(process, name)
+            outputs[name] = value
+            if is_path_trait(trait):
+                paths = []
+                _output_files(value, paths)
+                for path in paths:
+                    if os.path.exists(path):
+                        files[path] = self._file_fingerprint(path)
+        with self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO executions VALUES "
+                       "(?, ?, ?, ?, ?)",
+                       (signature, process.id,
+                        json.dumps(outputs, cls=CapsulResultEncoder),
+                        json.dumps(files), time.time()))
+
+    def forget(self, signature):
+        """ Remove an execution record
+        """
+        with self._connect() as db:
+            db.execute("DELETE FROM executions WHERE signature=?",
+                       (signature, ))
+
+    def file_hash(self, key):
+        """ Get a stored file content hash, or None
+        """
+        with self._connect() as db:
+            row = db.execute("SELECT hash FROM file_hashes WHERE key=?",
+                             (key, )).fetchone()
+        if row is None:
+            return None
+        return row[0]
+
+    def set_file_hash(self, key, content_hash):
+        """ Store a file content hash
+        """
+        with self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO file_hashes VALUES (?, ?)",
+                       (key, content_hash))
+
+    def _file_fingerprint(self, path):
+        """ Fingerprint of an output file, None for directories
+        """
+        if not os.path.isfile(path):
+            return None
+        return file_fingerprint(path, content_hash=self.content_hash,
+                                index=self.index)
@@ -0,0 +1,598 @@
+# -*- coding: utf-8 -*-
+'''
+Profiling and timing instrumentation of processes execution.
+
+Instrumentation hooks receive structured events emitted during the
+execution of processes and pipelines: start and end of each process node
+and of each iteration of iterative nodes, with wall and CPU times, peak
+memory, input and output files sizes, and the time spent in parameters
+propagation and completion. Nothing is measured as long as no hook is
+installed.
+
+Events are dictionaries with at least the following keys:
+
+event: str
+    event type: 'node_start', 'node_end' or 'workflow_build'
+time: float
+    timestamp of the event
+pid: int
+    system process id
+kind: str
+    'process', 'iteration', or 'job' for soma-workflow jobs
+name: str
+    node name
+process: str
+    process identifier (not available for soma-workflow jobs)
+
+'node_end' events also contain the following measures, when available:
+
+status: str
+    'done', 'failed', or 'up_to_date' when a node has not been run in
+    incremental mode
+wall_time: float
+    execution duration, in seconds
+cpu_time: float
+    CPU time of the executing thread, plus the CPU time of the child
+    processes which have terminated during the execution
+setup_time: float
+    time spent before the actual execution (configuration, output
+    directories creation...)
+propagation_time, completion_time: float
+    for iterations, time spent to set the iteration parameters on the
+    iterated process, and to complete them
+peak_rss: int
+    peak resident memory size of the executing process, and of its
+    terminated children, at the end of the execution, in bytes
+input_bytes, output_bytes: int
+    total size of the existing input and output files
+
+A basic usage is::
+
+    from capsul.study_config import instrumentation
+
+    recorder = instrumentation.EventsRecorder()
+    with instrumentation.instrumented(
+            recorder, instrumentation.JsonLinesSink('/tmp/events.jsonl')):
+        study_config.run(pipeline)
+    print(recorder.report())
+
+Classes
+=======
+:class:`InstrumentationHook`
+----------------------------
+:class:`JsonLinesSink`
+----------------------
+:class:`EventsRecorder`
+-----------------------
+:class:`NodeMeasure`
+--------------------
+
+Functions
+=========
+:func:`add_hook`
+----------------
+:func:`remove_hook`
+-------------------
+:func:`is_active`
+-----------------
+:func:`emit`
+------------
+:func:`emit_event`
+------------------
+:func:`instrumented`
+--------------------
+:func:`node_name`
+-----------------
+:func:`is_measured`
+-------------------
+:func:`files_size`
+------------------
+:func:`read_events`
+-------------------
+:func:`summary`
+---------------
+:func:`summary_report`
+----------------------
+'''
+
+# System import
+from __future__ import absolute_import
+from __future__ import print_function
+import os
+import sys
+import time
+import json
+import threading
+import contextlib
+import logging
+import six
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+# CAPSUL import
+from capsul.study_config.memory import is_path_trait
+
+# TRAITS import
+from traits.api import Undefined
+
+# Define the logger
+logger = logging.getLogger(__name__)
+
+# installed hooks, and the system process which has installed them: hooks
+# are not called in forked worker processes
+_hooks = []
+_hooks_pid = None
+_hooks_lock = threading.Lock()
+# processes being measured in the current thread
+_measured = threading.local()
+
+
+class InstrumentationHook(object):
+    """ Base class for instrumentation hooks.
+
+    Subclasses implement :meth:`event`. Any callable taking an event dict
+    can also be used as a hook.
+    """
+
+    def event(self, event):
+        """ Receive an event dictionary
+        """
+        raise NotImplementedError('event() is not implemented in %s'
+                                  % self.__class__.__name__)
+
+    def close(self):
+        """ Called when the hook is removed
+        """
+        pass
+
+    def __call__(self, event):
+        self.event(event)
+
+
+class JsonLinesSink(InstrumentationHook):
+    """ Write events in a file, one JSON dictionary per line.
+
+    Each line is flushed when written, so that the file is usable even if
+    the execution is interrupted. Use :func:`read_events` to read it back.
+    """
+
+    def __init__(self, path, append=True):
+        """ Initialize the sink
+
+        Parameters
+        ----------
+        path: str
+            events file name
+        append: bool (optional, default True)
+            append events to an existing file. Otherwise it is overwritten.
+        """
+        self.path = path
+        self.append = append
+        self._file = None
+        self._lock = threading.Lock()
+
+    def event(self, event):
+        line = json.dumps(event, default=str)
+        with self._lock:
+            if self._file is None:
+                directory = os.path.dirname(self.path)
+                if directory and not os.path.isdir(directory):
+                    os.makedirs(directory)
+                self._file = open(self.path, 'a' if self.append else 'w')
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                # further events will be appended
+                self.append = True
+
+
+class EventsRecorder(InstrumentationHook):
+    """ Keep events in memory.
+
+    Attributes
+    ----------
+    events: list
+        received events
+    """
+
+    def __init__(self):
+        self.events = []
+        self._lock = threading.Lock()
+
+    def event(self, event):
+        with self._lock:
+            self.events.append(event)
+
+    def clear(self):
+        with self._lock:
+            del self.events[:]
+
+    def summary(self):
+        """ Statistics of recorded events, see :func:`summary`
+        """
+        return summary(self.events)
+
+    def report(self, top=10):
+        """ Text report of recorded events, see :func:`summary_report`
+        """
+        return summary_report(self.events, top=top)
+
+
+def add_hook(hook):
+    """ Install an instrumentation hook
+
+    Parameters
+    ----------
+    hook: InstrumentationHook or callable
+        called with each event dictionary
+    """
+    global _hooks_pid
+    with _hooks_lock:
+        if _hooks_pid != os.getpid():
+            # hooks inherited from a parent process are dropped
+            del _hooks[:]
+            _hooks_pid = os.getpid()
+        if hook not in _hooks:
+            _hooks.append(hook)
+
+
+def remove_hook(hook):
+    """ Uninstall an instrumentation hook, and close it.
+    """
+    with _hooks_lock:
+        if hook in _hooks:
+            _hooks.remove(hook)
+    if hasattr(hook, 'close'):
+        hook.close()
+
+
+def is_active():
+    """ True if events are currently collected
+    """
+    return bool(_hooks) and _hooks_pid == os.getpid()
+
+
+def emit_event(event):
+    """ Send an event dictionary to all installed hooks.
+
+    Errors in hooks are logged, and do not stop the execution.
+    """
+    if not is_active():
+        return
+    for hook in list(_hooks):
+        try:
+            hook(event)
+        except Exception as e:
+            logger.error('instrumentation hook %s failed: %s' % (hook, e))
+
+
+def emit(event_type, **kwargs):
+    """ Build an event from the given values, and send it to hooks
+    """
+    if not is_active():
+        return
+    event = {'event': event_type, 'time': time.time(), 'pid': os.getpid()}
+    event.update(kwargs)
+    emit_event(event)
+
+
+@contextlib.contextmanager
+def instrumented(*hooks):
+    """ Context manager installing hooks, and removing them on exit
+    """
+    for hook in hooks:
+        add_hook(hook)
+    try:
+        yield hooks
+    finally:
+        for hook in hooks:
+            remove_hook(hook)
+
+
+def _path_values(value, paths):
+    if isinstance(value, (list, tuple)):
+        for item in value:
+            _path_values(item, paths)
+    elif isinstance(value, six.string_types) and value:
+        paths.append(value)
+
+
+def files_size(process, output=False):
+    """ Total size of the existing files of a process parameters
+
+    Parameters
+    ----------
+    process: Process
+        the process
+    output: bool (optional, default False)
+        measure output files instead of input files
+
+    Returns
+    -------
+    size: int
+        size in bytes. Directories are not measured.
+    """
+    size = 0
+    for name, trait in six.iteritems(process.user_traits()):
+        if bool(trait.output) != output or not is_path_trait(trait):
+            continue
+        value = getattr(process, name, Undefined)
+        if value is Undefined:
+            continue
+        paths = []
+        _path_values(value, paths)
+        for path in paths:
+            try:
+                if os.path.isfile(path):
+                    size += os.path.getsize(path)
+            except (OSError, TypeError):
+                pass
+    return size
+
+
+def is_measured(process):
+    """ True if the execution of a process is already being measured in
+    the current thread, by a running :class:`NodeMeasure`. This avoids
+    nested measures when a process is run through several layers (such as
+    iterations run through :meth:`StudyConfig.run`).
+    """
+    return id(process) in getattr(_measured, 'processes', ())
+
+
+def node_name(process):
+    """ Name of a process in events: its context name in its pipeline
+    ("pipeline.node"), if any, or the process name.
+    """
+    return getattr(process, 'context_name', None) \
+        or getattr(process, 'name', None)
+
+
+def _cpu_time():
+    """ CPU time of the current thread, and of terminated child processes
+    """
+    if hasattr(time, 'thread_time'):
+        cpu = time.thread_time()
+    else:
+        cpu = time.process_time()
+    times = os.times()
+    return cpu + times[2] + times[3]
+
+
+def _peak_rss():
+    """ Peak resident memory size of the current process, and of its
+    terminated children, in bytes (None if unknown)
+    """
+    if resource is None:
+        return None
+    rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+              resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    if sys.platform != 'darwin':
+        # Linux reports kilobytes, MacOS bytes
+        rss *= 1024
+    return rss
+
+
+class NodeMeasure(object):
+    """ Measure the execution of a process node.
+
+    The measure starts when the object is created, then :meth:`start` is
+    called when the actual execution begins, and :meth:`stop` when it is
+    finished. These methods emit the 'node_start' and 'node_end' events.
+    Preparation steps before the execution may be timed using :meth:`lap`,
+    the remaining time before the execution is the setup time.
+
+    Attributes
+    ----------
+    process: Process
+        the measured process
+    name: str
+        node name. By default see :func:`node_name`.
+    kind: str
+        'process' or 'iteration'
+    extra: dict
+        values added to the events
+    """
+
+    def __init__(self, process, name=None, kind='process', **extra):
+        self.process = process
+        if name is None:
+            name = node_name(process)
+        self.name = name
+        self.kind = kind
+        self.extra = extra
+        self._last = time.time()
+        self._start = None
+        self._start_cpu = None
+
+    def _event(self, event_type):
+        event = {'event': event_type, 'time': time.time(), 'pid': os.getpid(),
+                 'kind': self.kind, 'name': self.name,
+                 'process': getattr(self.process, 'id', None)}
+        event.update(self.extra)
+        return event
+
+    def lap(self, name):
+        """ Record in the events the time spent since the creation of the
+        measure, or since the previous lap
+
+        Parameters
+        ----------
+        name: str
+            event key, for instance 'propagation_time'
+        """
+        now = time.time()
+        self.extra[name] = now - self._last
+        self._last = now
+
+    def start(self, emit=True):
+        """ Begin the execution measure
+
+        Parameters
+        ----------
+        emit: bool (optional, default True)
+            emit the 'node_start' event. Otherwise it is only returned.
+
+        Returns
+        -------
+        event: dict
+        """
+        event = self._event('node_start')
+        self._start = event['time']
+        self._start_cpu = _cpu_time()
+        if self.process is not None:
+            if not hasattr(_measured, 'processes'):
+                _measured.processes = set()
+            _measured.processes.add(id(self.process))
+        if emit:
+            emit_event(event)
+        return event
+
+    def stop(self, status='done', emit=True):
+        """ End the execution measure
+
+        Parameters
+        ----------
+        status: str (optional, default 'done')
+            execution status
+        emit: bool (optional, default True)
+            emit the 'node_end' event. Otherwise it is only returned.
+
+        Returns
+        -------
+        event: dict
+        """
+        if self._start is None:
+            self.start(emit=emit)
+        if self.process is not None:
+            getattr(_measured, 'processes', set()).discard(id(self.process))
+        event = self._event('node_end')
+        event.update({
+            'status': status,
+            'wall_time': event['time'] - self._start,
+            'cpu_time': _cpu_time() - self._start_cpu,
+            'setup_time': self._start - self._last,
+            'peak_rss': _peak_rss(),
+        })
+        if self.process is not None \
+                and hasattr(self.process, 'user_traits'):
+            event['input_bytes'] = files_size(self.process)
+            event['output_bytes'] = files_size(self.process, output=True)
+        if emit:
+            emit_event(event)
+        return event
+
+
+def read_events(path):
+    """ Read events written by a :class:`JsonLinesSink`
+
+    Returns
+    -------
+    events: list of dict
+    """
+    events = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                events.append(json.loads(line))
+    return events
+
+
+def summary(events):
+    """ Statistics of node executions, grouped by node kind and name
+
+    Parameters
+    ----------
+    events: list of dict, or str
+        events, or a JSON-lines events file name
+
+    Returns
+    -------
+    statistics: list of dict
+        one dict per (kind, name), sorted by decreasing total wall time,
+        with the keys: kind, name, count, failed, wall_time (total),
+        mean_wall_time, max_wall_time, cpu_time, setup_time,
+        propagation_time, completion_time, peak_rss (max), input_bytes and
+        output_bytes (totals).
+    """
+    if isinstance(events, six.string_types):
+        events = read_events(events)
+    stats = {}
+    sums = ('wall_time', 'cpu_time', 'setup_time', 'propagation_time',
+            'completion_time', 'input_bytes', 'output_bytes')
+    for event in events:
+        if event.get('event') != 'node_end':
+            continue
+        key = (event.get('kind'), event.get('name'))
+        item = stats.get(key)
+        if item is None:
+            item = {'kind': key[0], 'name': key[1], 'count': 0, 'failed': 0,
+                    'max_wall_time': 0., 'peak_rss': None}
+            for name in sums:
+                item[name] = 0
+            stats[key] = item
+        item['count'] += 1
+        if event.get('status') == 'failed':
+            item['failed'] += 1
+        for name in sums:
+            item[name] += event.get(name) or 0
+        item['max_wall_time'] = max(item['max_wall_time'],
+                                    event.get('wall_time') or 0.)
+        rss = event.get('peak_rss')
+        if rss is not None:
+            item['peak_rss'] = max(item['peak_rss'] or 0, rss)
+    result = sorted(stats.values(), key=lambda item: -item['wall_time'])
+    for item in result:
+        item['mean_wall_time'] = item['wall_time'] / item['count']
+    return result
+
+
+def summary_report(events, top=10):
+    """ Text report ranking the slowest nodes
+
+    Parameters
+    ----------
+    events: list of dict, or str
+        events, or a JSON-lines events file name
+    top: int (optional, default 10)
+        number of nodes listed. 0 or None lists all nodes.
+
+    Returns
+    -------
+    report: str
+    """
+    stats = summary(events)
+    # iterations are part of their iterative node execution
+    work = sum(item['wall_time'] for item in stats
+               if item['kind'] != 'iteration')
+    overhead = sum(item['setup_time'] + item['propagation_time']
+                   + item['completion_time'] for item in stats)
+    lines = ['%d node executions, %.3fs of execution, %.3fs of setup, '
+             'parameters propagation and completion'
+             % (sum(item['count'] for item in stats), work, overhead)]
+    header = ('%-30s %-9s %6s %10s %10s %10s %10s %10s'
+              % ('node', 'kind', 'count', 'total(s)', 'mean(s)', 'max(s)',
+                 'cpu(s)', 'rss(MB)'))
+    lines.append(header)
+    lines.append('-' * len(header))
+    if top:
+        stats = stats[:top]
+    for item in stats:
+        rss = item['peak_rss']
+        lines.append('%-30s %-9s %6d %10.3f %10.3f %10.3f %10.3f %10s'
+                     % (str(item['name'])[:30], item['kind'], item['count'],
+                        item['wall_time'], item['mean_wall_time'],
+                        item['max_wall_time'], item['cpu_time'],
+                        '-' if rss is None else '%.1f' % (rss / 1048576.)))
+        if item['failed']:
+            lines[-1] += ' (%d failed)' % item['failed']
+    return '\n'.join(lines)
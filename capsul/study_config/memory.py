@@ -10,6 +10,8 @@ Classes
 -------------------------
 :class:`CapsulResultEncoder`
 ----------------------------
+:class:`MemoryIndex`
+--------------------
 :class:`Memory`
 ---------------
 
@@ -19,8 +21,12 @@ Functions
 -----------------------------
 :func:`has_attribute`
 ---------------------
+:func:`is_path_trait`
+---------------------
 :func:`file_fingerprint`
 ------------------------
+:func:`file_content_hash`
+-------------------------
 '''
 
 # System import
@@ -35,6 +41,10 @@ import json
 import logging
 import six
 import sys
+import sqlite3
+import contextlib
+import collections
+import threading
 
 # CAPSUL import
 from capsul.process.process import Process, ProcessResult
@@ -49,7 +59,7 @@ except ImportError:
         pass
 
 # TRAITS import
-from traits.api import Undefined
+from traits.api import Undefined, File, Directory, List
 
 
 # Define the logger
@@ -203,7 +213,8 @@ class MemorizedProcess(object):
     structure. Methods are provided to inspect the cache or clean it.
     """
 
-    def __init__(self, process, cachedir, timestamp=None, verbose=1):
+    def __init__(self, process, cachedir, timestamp=None, verbose=1,
+                 memory=None):
         """ Initialize the MemorizedProcess class.
 
         Parameters
@@ -220,6 +231,9 @@ class MemorizedProcess(object):
             is called.
         verbose: int
             if different from zero, print console messages.
+        memory: Memory (optional)
+            the Memory which created this object. When given, its cache
+            index, file content hashing and eviction settings are used.
         """
         # Check the a process is passed
         self.process_class = process.__class__
@@ -248,6 +262,8 @@ class MemorizedProcess(object):
         # Store if some messages have to be displayed
         self.verbose = verbose
 
+        self.memory = memory
+
     def __call__(self, **kwargs):
         """ Call wrapped process and cache result, or read cache if
         available.
@@ -270,12 +286,29 @@ class MemorizedProcess(object):
         # Create the destination folder and a unique id for the current
         # process
         process_dir, process_hash, input_parameters = self._get_process_id()
+        index = getattr(self.memory, 'index', None)
+        if index is not None:
+            entry_key = os.path.relpath(process_dir, self.cachedir)
+            cached = index.lookup(entry_key)
+            if cached and not os.path.isdir(process_dir):
+                # removed behind our back
+                index.remove(entry_key)
+                cached = False
+            elif not cached and os.path.isfile(
+                    os.path.join(process_dir, "result.json")):
+                # entry written before the index existed
+                index.add(entry_key, self.process.id,
+                          directory_size(process_dir))
+                cached = True
+        else:
+            cached = os.path.isdir(process_dir)
 
         # Execute the process
-        if not os.path.isdir(process_dir):
+        if not cached:
 
             # Create the destination memory folder
-            os.makedirs(process_dir)
+            if not os.path.isdir(process_dir):
+                os.makedirs(process_dir)
 
             # Try to execute the process and if an error occured remove the
             # cache folder
@@ -302,6 +335,12 @@ class MemorizedProcess(object):
                 shutil.rmtree(process_dir)
                 raise
 
+            if index is not None:
+                index.add(entry_key, self.process.id,
+                          directory_size(process_dir))
+                index.record_access(self.process.id, hit=False)
+                self.memory.evict(keep=[entry_key])
+
         # Restore the process results from the cache folder
         else:
             # Restore the memorized files
@@ -322,8 +361,26 @@ class MemorizedProcess(object):
             # Update the process output traits
             result = self._load_process_result(process_dir, input_parameters)
 
+            if index is not None:
+                index.touch(entry_key)
+                index.record_access(self.process.id, hit=True)
+
         return result
 
+    def statistics(self):
+        """ Cache hits and misses of the wrapped process.
+
+        Returns
+        -------
+        statistics: dict
+            {'hits': int, 'misses': int}, counted over all executions of
+            processes of the same type using the same cache directory.
+        """
+        index = getattr(self.memory, 'index', None)
+        if index is None:
+            return {'hits': 0, 'misses': 0}
+        return index.statistics(self.process.id)
+
     def _copy_files_to_memory(self, python_object, process_dir, file_mapping):
         """ Copy file items inside the memory.
 
@@ -559,7 +616,11 @@ class MemorizedProcess(object):
             if (python_object is not Undefined and
                     isinstance(python_object, six.string_types) and
                     os.path.isfile(python_object)):
-                out = file_fingerprint(python_object)
+                if getattr(self.memory, 'content_hash', False):
+                    out = file_fingerprint(python_object, content_hash=True,
+                                           index=self.memory.index)
+                else:
+                    out = file_fingerprint(python_object)
 
         return out
 
@@ -693,22 +754,54 @@ def has_attribute(trait, attribute_name, attribute_value=None,
     return count > 0
 
 
-def file_fingerprint(afile):
+def is_path_trait(trait):
+    """ Checks if a trait is a File or Directory, or a list of them.
+
+    Parameters
+    ----------
+    trait: Trait
+        the input trait object.
+
+    Returns
+    -------
+    res: bool
+        True if the trait values are files or directories paths.
+    """
+    if isinstance(trait.trait_type, (File, Directory)):
+        return True
+    if isinstance(trait.trait_type, List) and trait.inner_traits:
+        return is_path_trait(trait.inner_traits[0])
+    return False
+
+
+def file_fingerprint(afile, content_hash=False, index=None):
     """ Computes the file fingerprint.
 
-    Do not consider the file content, just the fingerprint (ie. the mtime,
-    the size and the file location).
+    By default, do not consider the file content, just the fingerprint (ie.
+    the mtime, the size and the file location).
 
     Parameters
     ----------
     afile: string
         the file to process.
+    content_hash: bool (optional, default False)
+        use a hash of the file content instead of its mtime and size, so
+        that touching or copying a file back does not invalidate the cache.
+    index: MemoryIndex (optional)
+        persistent storage of file content hashes, see
+        :func:`file_content_hash`.
 
     Returns
     -------
     fingerprint: tuple
-        the file location, mtime and size.
+        the file location, mtime and size, or the file location and content
+        hash.
     """
+    if content_hash:
+        return {
+            "name": afile,
+            "content": file_content_hash(afile, index)
+        }
     fingerprint = {
         "name": afile,
         "mtime": None,
@@ -721,6 +814,76 @@ def file_fingerprint(afile):
     return fingerprint
 
 
+#: maximum number of file content hashes kept in memory (the least recently
+#: used ones are dropped first)
+content_hashes_cache_size = 10000
+
+# file content hashes memory: {(device, inode, mtime, size): hash}, in least
+# recently used first order
+_content_hashes = collections.OrderedDict()
+_content_hashes_lock = threading.Lock()
+
+
+def file_content_hash(afile, index=None):
+    """ Computes the md5 hash of a file content.
+
+    Hashes are memorized for each (device, inode, mtime, size), thus a file
+    is read again only when it has been modified. The last
+    :py:data:`content_hashes_cache_size` hashes are kept in memory and, if
+    an index is given, all hashes are kept on disk.
+
+    Parameters
+    ----------
+    afile: string
+        the file to process.
+    index: MemoryIndex (optional)
+        index used to store hashes between sessions.
+
+    Returns
+    -------
+    hash: string
+        the file content hash, or None if the file does not exist.
+    """
+    if not os.path.isfile(afile):
+        return None
+    stat = os.stat(afile)
+    key = (stat.st_dev, stat.st_ino, stat.st_mtime, stat.st_size)
+    with _content_hashes_lock:
+        content_hash = _content_hashes.pop(key, None)
+        if content_hash is not None:
+            # move it at the end (most recently used)
+            _content_hashes[key] = content_hash
+            return content_hash
+    str_key = '%d:%d:%r:%d' % key
+    if index is not None:
+        content_hash = index.file_hash(str_key)
+    if content_hash is None:
+        hasher = hashlib.new("md5")
+        with open(afile, "rb") as open_file:
+            for chunk in iter(lambda: open_file.read(1024 * 1024), b""):
+                hasher.update(chunk)
+        content_hash = hasher.hexdigest()
+        if index is not None:
+            index.set_file_hash(str_key, content_hash)
+    with _content_hashes_lock:
+        _content_hashes[key] = content_hash
+        while len(_content_hashes) > content_hashes_cache_size:
+            _content_hashes.popitem(last=False)
+    return content_hash
+
+
+def directory_size(directory):
+    """ Total size of the files in a directory, in bytes.
+    """
+    size = 0
+    for root, dirs, files in os.walk(directory):
+        for fname in files:
+            fpath = os.path.join(root, fname)
+            if not os.path.islink(fpath):
+                size += os.path.getsize(fpath)
+    return size
+
+
 class CapsulResultEncoder(json.JSONEncoder):
     """ Deal with ProcessResult in json.
     """
@@ -811,27 +974,223 @@ class CapsulResultDecoder(json.JSONDecoder):
 # be able to flush the disk
 ############################################################################
 
+class MemoryIndex(object):
+    """ On-disk index of a Memory cache directory.
+
+    The index is a sqlite database stored in the cache directory. It records
+    the cache entries (their size and last access time, used for eviction),
+    the file content hashes, and hits / misses statistics for each process
+    type. Each operation uses its own connection, so that an index can be
+    shared between threads and processes.
+
+    Entries are identified by their directory, relative to the cache
+    directory.
+
+    Methods
+    -------
+    lookup
+    add
+    touch
+    remove
+    entries
+    record_access
+    statistics
+    file_hash
+    set_file_hash
+    rebuild
+    """
+
+    index_file = "capsul_memory_index.sqlite"
+
+    def __init__(self, cachedir):
+        """ Initialize the MemoryIndex class.
+
+        Parameters
+        ----------
+        cachedir: string
+            the cache directory. The index is created if it does not exist,
+            and filled with the entries already present in the directory.
+        """
+        self.cachedir = cachedir
+        self.path = os.path.join(cachedir, self.index_file)
+        new_index = not os.path.exists(self.path)
+        with self._connect() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY "
+                       "KEY, process TEXT, size INTEGER, created REAL, "
+                       "last_access REAL)")
+            db.execute("CREATE INDEX IF NOT EXISTS entries_access ON "
+                       "entries (last_access)")
+            db.execute("CREATE TABLE IF NOT EXISTS file_hashes (key TEXT "
+                       "PRIMARY KEY, hash TEXT)")
+            db.execute("CREATE TABLE IF NOT EXISTS statistics (process TEXT "
+                       "PRIMARY KEY, hits INTEGER, misses INTEGER)")
+        if new_index:
+            self.rebuild()
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """ Open a connection, and commit (or rollback) on exit.
+        """
+        connection = sqlite3.connect(self.path, timeout=60)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def lookup(self, key):
+        """ Check if an entry is in the index.
+        """
+        with self._connect() as db:
+            return db.execute("SELECT 1 FROM entries WHERE key=?",
+                              (key, )).fetchone() is not None
+
+    def add(self, key, process_id, size):
+        """ Add (or replace) an entry
+        """
+        now = time.time()
+        with self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                       (key, process_id, size, now, now))
+
+    def touch(self, key):
+        """ Update the last access time of an entry
+        """
+        with self._connect() as db:
+            db.execute("UPDATE entries SET last_access=? WHERE key=?",
+                       (time.time(), key))
+
+    def remove(self, key):
+        """ Remove an entry from the index (its directory is not removed)
+        """
+        with self._connect() as db:
+            db.execute("DELETE FROM entries WHERE key=?", (key, ))
+
+    def entries(self):
+        """ All entries, the least recently used first.
+
+        Returns
+        -------
+        entries: list
+            (key, process_id, size, created, last_access) tuples
+        """
+        with self._connect() as db:
+            return db.execute("SELECT key, process, size, created, "
+                              "last_access FROM entries "
+                              "ORDER BY last_access").fetchall()
+
+    def record_access(self, process_id, hit):
+        """ Count a cache hit or miss for a process type
+        """
+        with self._connect() as db:
+            db.execute("INSERT OR IGNORE INTO statistics VALUES (?, 0, 0)",
+                       (process_id, ))
+            if hit:
+                db.execute("UPDATE statistics SET hits=hits+1 "
+                           "WHERE process=?", (process_id, ))
+            else:
+                db.execute("UPDATE statistics SET misses=misses+1 "
+                           "WHERE process=?", (process_id, ))
+
+    def statistics(self, process_id=None):
+        """ Cache hits and misses statistics
+
+        Parameters
+        ----------
+        process_id: str (optional)
+            if given, only return the statistics of this process type.
+
+        Returns
+        -------
+        statistics: dict
+            {'hits': int, 'misses': int} for the given process_id, or
+            {process_id: {'hits': int, 'misses': int}} for all processes.
+        """
+        with self._connect() as db:
+            if process_id is not None:
+                row = db.execute("SELECT hits, misses FROM statistics "
+                                 "WHERE process=?", (process_id, )).fetchone()
+                if row is None:
+                    row = (0, 0)
+                return {'hits': row[0], 'misses': row[1]}
+            return dict((row[0], {'hits': row[1], 'misses': row[2]})
+                        for row in db.execute("SELECT process, hits, misses "
+                                              "FROM statistics"))
+
+    def file_hash(self, key):
+        """ Get a stored file content hash, or None
+        """
+        with self._connect() as db:
+            row = db.execute("SELECT hash FROM file_hashes WHERE key=?",
+                             (key, )).fetchone()
+        if row is None:
+            return None
+        return row[0]
+
+    def set_file_hash(self, key, content_hash):
+        """ Store a file content hash
+        """
+        with self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO file_hashes VALUES (?, ?)",
+                       (key, content_hash))
+
+    def rebuild(self):
+        """ Index the entries of the cache directory which are not in the
+        index yet (written by older versions, for instance)
+        """
+        for root, dirs, files in os.walk(self.cachedir):
+            if "result.json" in files:
+                key = os.path.relpath(root, self.cachedir)
+                if not self.lookup(key):
+                    process_id = ".".join(os.path.dirname(key).split(os.sep))
+                    self.add(key, process_id, directory_size(root))
+
+
 class Memory(object):
     """ Memory context to provide caching for processes.
 
+    Cache entries are recorded in an on-disk index (see
+    :class:`MemoryIndex`), which allows to bound the cache size and age:
+    the least recently used entries are removed when a new one is written
+    and the limits are exceeded.
+
     Attributes
     ----------
     `cachedir`: string
         the location for the caching. If None is given, no caching is done.
+    `content_hash`: bool
+        identify input files by a hash of their content rather than by their
+        modification time and size.
+    `max_size`: int
+        maximum total size of the cache, in bytes. None means no limit.
+    `max_age`: float
+        maximum time, in seconds, an entry is kept in the cache after its
+        last use. None means no limit.
+    `index`: MemoryIndex
+        the cache index, None if no caching is done.
 
     Methods
     -------
     cache
     clear
+    evict
+    statistics
     """
 
-    def __init__(self, cachedir):
+    def __init__(self, cachedir, content_hash=False, max_size=None,
+                 max_age=None):
         """ Initialize the Memory class.
 
         Parameters
         ----------
         base_dir: string
             the directory name of the location for the caching.
+        content_hash: bool (optional, default False)
+            identify input files by a hash of their content.
+        max_size: int (optional)
+            maximum total size of the cache, in bytes.
+        max_age: float (optional)
+            maximum time, in seconds, an entry is kept after its last use.
         """
         # Build the capsul memory folder
         if cachedir is not None:
@@ -845,6 +1204,12 @@ class Memory(object):
         # Define class parameters
         self.cachedir = cachedir
         self.timestamp = time.time()
+        self.content_hash = content_hash
+        self.max_size = max_size
+        self.max_age = max_age
+        self.index = None
+        if cachedir is not None:
+            self.index = MemoryIndex(cachedir)
 
     def cache(self, process, verbose=1):
         """ Create a proxy of the given process in order to only execute
@@ -900,7 +1265,7 @@ class Memory(object):
         # Otherwise a proxy process is created
         else:
             return MemorizedProcess(process, self.cachedir, self.timestamp,
-                                    verbose)
+                                    verbose, memory=self)
 
     def clear(self, skips=None):
         """ Remove all the cache appart from those given to the method
@@ -911,16 +1276,79 @@ class Memory(object):
         skips: list
             a list of path to keep during the cache deletion.
         """
-        # Get all memory directories to remove
-        to_remove_folders = []
         skips = skips or []
-        for root, dirs, files in os.walk(self.cachedir):
-            if "result.json" and files and dirs == [] and root not in skips:
-                to_remove_folders.append(root)
+        for key, process_id, size, created, last_access \
+                in self.index.entries():
+            folder = os.path.join(self.cachedir, key)
+            if folder not in skips:
+                self._remove_entry(key)
+
+    def evict(self, max_size=None, max_age=None, keep=()):
+        """ Remove least recently used cache entries to bound the cache
 
-        # Delete memory directories
-        for folder in to_remove_folders:
+        Parameters
+        ----------
+        max_size: int (optional)
+            maximum total size of the cache, in bytes. Default: self.max_size
+        max_age: float (optional)
+            entries which have not been used for this time, in seconds, are
+            removed. Default: self.max_age
+        keep: list (optional)
+            keys (directories relative to cachedir) of entries which should
+            not be removed.
+
+        Returns
+        -------
+        removed: list
+            keys of removed entries
+        """
+        if max_size is None:
+            max_size = self.max_size
+        if max_age is None:
+            max_age = self.max_age
+        if self.index is None or (max_size is None and max_age is None):
+            return []
+        removed = []
+        entries = self.index.entries()
+        total_size = sum(entry[2] for entry in entries)
+        now = time.time()
+        for key, process_id, size, created, last_access in entries:
+            if key in keep:
+                continue
+            if (max_age is not None and now - last_access > max_age) \
+                    or (max_size is not None and total_size > max_size):
+                self._remove_entry(key)
+                removed.append(key)
+                total_size -= size
+        return removed
+
+    def statistics(self, process_id=None):
+        """ Cache hits and misses statistics
+
+        Parameters
+        ----------
+        process_id: str (optional)
+            if given, only return the statistics of this process type.
+
+        Returns
+        -------
+        statistics: dict
+            {'hits': int, 'misses': int} for the given process_id, or
+            {process_id: {'hits': int, 'misses': int}} for all processes.
+        """
+        if self.index is None:
+            if process_id is not None:
+                return {'hits': 0, 'misses': 0}
+            return {}
+        return self.index.statistics(process_id)
+
+    def _remove_entry(self, key):
+        """ Delete a cache entry directory, and remove it from the index
+        """
+        folder = os.path.join(self.cachedir, key)
+        if os.path.isdir(folder):
             shutil.rmtree(folder)
+        self.index.remove(key)
 
     def __repr__(self):
         """ Memory class representation.
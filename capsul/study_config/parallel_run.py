@@ -0,0 +1,484 @@
+# -*- coding: utf-8 -*-
+'''
+Local parallel execution of pipelines, without soma-workflow.
+
+Process nodes of a pipeline are scheduled following the dependencies
+computed by :meth:`~capsul.pipeline.pipeline.Pipeline.workflow_dependencies`:
+a node is started as soon as all the nodes it depends on have finished, and
+as many nodes as allowed by the number of workers run concurrently.
+
+Classes
+=======
+:class:`LocalParallelExecutor`
+------------------------------
+
+Functions
+=========
+:func:`process_slots`
+---------------------
+'''
+
+# System import
+from __future__ import absolute_import
+from __future__ import print_function
+import logging
+import multiprocessing
+import sys
+import traceback
+import six
+from concurrent import futures
+
+# Capsul import
+from capsul.study_config.run import run_process, reserve_process_counter
+from capsul.study_config import instrumentation
+
+# Define the logger
+logger = logging.getLogger(__name__)
+
+
+def process_slots(process, max_slots):
+    """ Number of worker slots needed to run a process
+
+    The resource hint is the ``parallel_job_info`` process attribute, as used
+    by soma-workflow: a dict which may contain ``nodes_number`` and
+    ``cpu_per_node`` values. Processes without this attribute use one slot.
+
+    Parameters
+    ----------
+    process: Process
+        the process to run
+    max_slots: int
+        the total number of slots: the result never exceeds this number,
+        otherwise the process could never be run.
+
+    Returns
+    -------
+    slots: int
+    """
+    info = getattr(process, 'parallel_job_info', None)
+    if not info:
+        return 1
+    slots = int(info.get('nodes_number', 1)) \
+        * int(info.get('cpu_per_node', 1))
+    return max(1, min(slots, max_slots))
+
+
+# study config settings used by run_process, sent to worker processes
+_EXECUTION_SETTINGS = ('output_directory', 'generate_logging',
+                       'create_output_directories', 'process_output_directory',
+                       'use_smart_caching', 'smart_caching_content_hash',
+                       'smart_caching_max_size', 'smart_caching_max_age')
+
+
+def _execution_settings(study_config):
+    """ Study config settings needed to run a process in a worker process
+    """
+    settings = {}
+    for name in _EXECUTION_SETTINGS:
+        value = study_config.get_trait_value(name)
+        if value is not None:
+            settings[name] = value
+    return settings
+
+
+def _execution_study_config(settings):
+    """ Build, in a worker process, a StudyConfig holding execution settings
+    returned by :func:`_execution_settings`
+    """
+    # Import cannot be done on module due to circular dependencies
+    from capsul.study_config.study_config import StudyConfig
+
+    modules = []
+    if 'use_smart_caching' in settings:
+        modules.append('SmartCachingConfig')
+    return StudyConfig(init_config=settings, modules=modules)
+
+
+def _run_in_worker_process(process_id, parameters, configuration_dict,
+                           output_directory, settings, generate_logging=False,
+                           verbose=0, process_counter=None, name=None,
+                           measure=False):
+    """ Run a process in a worker of a process pool.
+
+    The process is instantiated again from its identifier and parameters,
+    since processes attached to a StudyConfig cannot be pickled, in a
+    StudyConfig holding the execution settings of the calling process. It is
+    then run through :func:`~capsul.study_config.run.run_process`, in the
+    output directory reserved by the scheduler. Output parameters values are
+    sent back to the calling process, with the instrumentation events of the
+    execution if measure is True (hooks are installed in the calling process
+    only).
+    """
+    # Import cannot be done on module due to circular dependencies
+    from capsul.study_config.process_instance import get_process_instance
+
+    node_measure = None
+    if measure:
+        node_measure = instrumentation.NodeMeasure(None, name=name)
+    process = get_process_instance(
+        process_id, study_config=_execution_study_config(settings))
+    process.import_from_dict(parameters)
+    events = []
+    if node_measure is not None:
+        node_measure.process = process
+        events.append(node_measure.start(emit=False))
+    result, log_file = run_process(output_directory, process,
+                                   generate_logging=generate_logging,
+                                   verbose=verbose,
+                                   configuration_dict=configuration_dict or {},
+                                   process_counter=process_counter,
+                                   activate_configuration=True)
+    if node_measure is not None:
+        events.append(node_measure.stop(emit=False))
+    outputs = dict((name, getattr(process, name))
+                   for name, trait in six.iteritems(process.user_traits())
+                   if trait.output or name == 'output_directory')
+    return result, outputs, events
+
+
+class LocalParallelExecutor(object):
+    """ Run process nodes concurrently on the local machine, following their
+    dependencies.
+
+    Processes are either run in threads of the current process (the
+    default), or in a pool of worker processes. Threads are cheap and share
+    the pipeline state, and are well suited to processes which call external
+    commands. Worker processes can use several cores for pure python
+    processes, but processes are instantiated again in the workers from
+    their identifier, which is only possible for processes which can be
+    built by :func:`~capsul.study_config.process_instance.get_process_instance`.
+
+    Attributes
+    ----------
+    max_workers: int
+        maximum number of worker slots used at the same time. 0 or None
+        means the number of CPUs of the machine.
+    policy: str
+        'fail_fast': when a process fails, no more process is started, and
+        the error is raised after running processes have finished.
+        'keep_going': when a process fails, processes which do not depend
+        on it are still run. A RuntimeError listing failures is raised at
+        the end.
+    use_processes: bool
+        run processes in a pool of worker processes instead of threads.
+    execution_record: ExecutionRecord
+        if not None, nodes are run in a make-like incremental mode: nodes
+        which are up to date according to this record, and which do not
+        depend on a node which has been run, are not run again. See
+        :class:`~capsul.study_config.execution_record.ExecutionRecord`.
+    up_to_date_nodes: list
+        nodes which have been found up to date, and thus not run, during the
+        last call to run()
+
+    Methods
+    -------
+    run
+    """
+
+    def __init__(self, max_workers=None, policy='fail_fast',
+                 use_processes=False, interruption_check=None,
+                 execution_record=None):
+        """ Initialize the executor
+
+        Parameters
+        ----------
+        max_workers: int (optional)
+            number of workers slots. 0 or None means the number of CPUs.
+        policy: str (optional)
+            'fail_fast' (default) or 'keep_going'
+        use_processes: bool (optional)
+            run processes in worker processes instead of threads
+        interruption_check: callable (optional)
+            function called after each finished node: if it returns True,
+            the execution is stopped and a RuntimeError is raised.
+        execution_record: ExecutionRecord (optional)
+            record used to skip up to date nodes
+        """
+        if policy not in ('fail_fast', 'keep_going'):
+            raise ValueError('Unknown execution policy: %s' % policy)
+        if not max_workers:
+            max_workers = multiprocessing.cpu_count()
+        self.max_workers = max_workers
+        self.policy = policy
+        self.use_processes = use_processes
+        self.interruption_check = interruption_check
+        self.execution_record = execution_record
+        self.up_to_date_nodes = []
+
+    def run(self, execution_list, dependencies, output_directory=None,
+            generate_logging=False, verbose=0, configuration_dict=None):
+        """ Execute process nodes
+
+        Parameters
+        ----------
+        execution_list: list
+            process nodes (or processes) to execute, in a valid sequential
+            order, which is used as priority order.
+        dependencies: dict
+            {node: iterable of nodes which must be executed before it}, as
+            returned by
+            :meth:`~capsul.pipeline.pipeline.Pipeline.workflow_dependencies`.
+            Nodes which are not in execution_list are ignored, but the
+            dependencies through them are kept.
+        output_directory: str (optional)
+            output directory passed to
+            :func:`~capsul.study_config.run.run_process`
+        generate_logging: bool (optional)
+            save processes logs
+        verbose: int (optional)
+            if different from zero, print console messages.
+        configuration_dict: dict (optional)
+            configuration dictionary
+
+        Returns
+        -------
+        result:
+            the result of the last node of execution_list which has been run
+        """
+        order = dict((node, i) for i, node in enumerate(execution_list))
+        requirements = self._restrict_dependencies(dependencies, order)
+        waiting = dict((node, set(deps))
+                       for node, deps in six.iteritems(requirements))
+        successors = {}
+        for node, deps in six.iteritems(waiting):
+            for dep in deps:
+                successors.setdefault(dep, []).append(node)
+        ready = [node for node in execution_list if not waiting[node]]
+        results = {}
+        failures = []
+        skipped = set()
+        running = {}
+        executed = set()
+        self.up_to_date_nodes = []
+        record = self.execution_record
+        free_slots = self.max_workers
+        stop = False
+        interrupted = False
+        # configuration activated for the running threads
+        active_configuration = None
+
+        if self.use_processes:
+            pool = futures.ProcessPoolExecutor(self.max_workers)
+        else:
+            pool = futures.ThreadPoolExecutor(self.max_workers)
+        try:
+            while ready or running:
+                # start all ready nodes for which there are enough slots, in
+                # priority order
+                submit = not stop
+                while submit:
+                    submit = False
+                    ready.sort(key=order.get)
+                    for node in list(ready):
+                        process = getattr(node, 'process', node)
+                        signature = None
+                        if record is not None:
+                            signature = record.signature(process)
+                            if not requirements[node].intersection(executed) \
+                                    and record.is_up_to_date(process,
+                                                             signature):
+                                # up to date: restore outputs, and go on
+                                # with nodes depending on it
+                                ready.remove(node)
+                                record.restore(process, signature)
+                                logger.info('Process %s is up to date'
+                                            % process.name)
+                                instrumentation.emit(
+                                    'node_end', kind='process',
+                                    name=instrumentation.node_name(process),
+                                    process=process.id,
+                                    status='up_to_date', wall_time=0.)
+                                self.up_to_date_nodes.append(node)
+                                ready.extend(self._release_successors(
+                                    node, successors, waiting, skipped))
+                                submit = True
+                                continue
+                        slots = process_slots(process, self.max_workers)
+                        if slots > free_slots:
+                            continue
+                        node_configuration = None
+                        if not self.use_processes:
+                            # the configuration activation is global: only
+                            # nodes using the same configuration run
+                            # concurrently, and it is activated here, in the
+                            # scheduler thread
+                            node_configuration = configuration_dict
+                            if node_configuration is None:
+                                node_configuration \
+                                    = process.check_requirements('global')
+                            if node_configuration is None:
+                                node_configuration = {}
+                            if node_configuration != active_configuration:
+                                if running:
+                                    continue
+                                self._activate_configuration(
+                                    node_configuration)
+                                active_configuration = node_configuration
+                        ready.remove(node)
+                        free_slots -= slots
+                        future = self._submit(
+                            pool, process, output_directory,
+                            generate_logging, verbose, node_configuration)
+                        running[future] = (node, slots, signature)
+                if not running:
+                    break
+
+                done, not_done = futures.wait(
+                    list(running), return_when=futures.FIRST_COMPLETED)
+                for future in done:
+                    node, slots, signature = running.pop(future)
+                    free_slots += slots
+                    process = getattr(node, 'process', node)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        if self.use_processes:
+                            instrumentation.emit(
+                                'node_end', kind='process',
+                                name=instrumentation.node_name(process),
+                                process=process.id, status='failed')
+                        logger.error('Process %s failed: %s'
+                                     % (process.name, e))
+                        failures.append((node, e, sys.exc_info()))
+                        if self.policy == 'fail_fast':
+                            stop = True
+                        else:
+                            self._skip_successors(node, successors, waiting,
+                                                  skipped)
+                        continue
+                    if self.use_processes:
+                        result, outputs, events = result
+                        for name, value in six.iteritems(outputs):
+                            setattr(process, name, value)
+                        for event in events:
+                            instrumentation.emit_event(event)
+                    else:
+                        result = result[0]
+                    results[node] = result
+                    executed.add(node)
+                    if record is not None:
+                        record.record(process, signature)
+                    ready.extend(self._release_successors(
+                        node, successors, waiting, skipped))
+
+                if not stop and self.interruption_check is not None \
+                        and self.interruption_check():
+                    stop = True
+                    interrupted = True
+        finally:
+            for future in running:
+                future.cancel()
+            pool.shutdown(wait=True)
+
+        if interrupted:
+            raise RuntimeError('Execution interruption requested')
+        if failures:
+            if self.policy == 'fail_fast' or len(failures) == 1:
+                six.reraise(*failures[0][2])
+            raise RuntimeError(
+                '%d processes failed:\n%s'
+                % (len(failures),
+                   '\n'.join(
+                       '%s: %s' % (getattr(node, 'process', node).name,
+                                   ''.join(traceback.format_exception_only(
+                                       type(e), e)).strip())
+                       for node, e, exc_info in failures)))
+
+        result = None
+        for node in execution_list:
+            if node in results:
+                result = results[node]
+        return result
+
+    def _submit(self, pool, process, output_directory, generate_logging,
+                verbose, configuration_dict):
+        """ Submit a process execution to the pool
+        """
+        if not self.use_processes:
+            # the process output directory is reserved here, in the
+            # scheduler thread, so that concurrent processes get distinct
+            # ones
+            process_counter = None
+            study_config = process.get_study_config()
+            if output_directory and study_config.process_output_directory:
+                process_counter = reserve_process_counter(study_config)
+            return pool.submit(run_process, output_directory, process,
+                               generate_logging=generate_logging,
+                               verbose=verbose,
+                               configuration_dict=configuration_dict,
+                               process_counter=process_counter,
+                               activate_configuration=False)
+        # the worker process runs the process through run_process, with the
+        # process counter reserved here: it keeps counting executions in
+        # the calling process
+        study_config = process.get_study_config()
+        process_counter = reserve_process_counter(study_config)
+        if configuration_dict is None:
+            configuration_dict = process.check_requirements('global')
+        parameters = process.export_to_dict(exclude_undefined=True)
+        return pool.submit(_run_in_worker_process, process.id, parameters,
+                           configuration_dict, output_directory,
+                           _execution_settings(study_config),
+                           generate_logging=generate_logging,
+                           verbose=verbose, process_counter=process_counter,
+                           name=instrumentation.node_name(process),
+                           measure=instrumentation.is_active())
+
+    @staticmethod
+    def _activate_configuration(configuration_dict):
+        """ Activate a configuration, as done by
+        :func:`~capsul.study_config.run.run_process`
+        """
+        from capsul import engine
+        engine.activated_modules = set()
+        engine.activate_configuration(configuration_dict)
+
+    @staticmethod
+    def _restrict_dependencies(dependencies, nodes):
+        """ Dependencies between the given nodes only, keeping dependencies
+        through nodes which are not executed
+        """
+        restricted = {}
+        for node in nodes:
+            deps = set()
+            todo = list(dependencies.get(node, ()))
+            done = set()
+            while todo:
+                dep = todo.pop()
+                if dep in done:
+                    continue
+                done.add(dep)
+                if dep in nodes:
+                    deps.add(dep)
+                else:
+                    todo.extend(dependencies.get(dep, ()))
+            restricted[node] = deps
+        return restricted
+
+    @staticmethod
+    def _release_successors(node, successors, waiting, skipped):
+        """ Remove a finished node from the dependencies of its successors,
+        and return the successors which are ready to run
+        """
+        ready = []
+        for succ in successors.get(node, []):
+            deps = waiting[succ]
+            deps.discard(node)
+            if not deps and succ not in skipped:
+                ready.append(succ)
+        return ready
+
+    @staticmethod
+    def _skip_successors(node, successors, waiting, skipped):
+        """ Mark all nodes depending on a failed node as skipped
+        """
+        todo = list(successors.get(node, []))
+        while todo:
+            succ = todo.pop()
+            if succ in skipped:
+                continue
+            skipped.add(succ)
+            logger.warning('Process %s skipped because a process it '
+                           'depends on failed'
+                           % getattr(succ, 'process', succ).name)
+            todo.extend(successors.get(succ, []))
@@ -34,6 +34,7 @@ from capsul.process.nipype_process import nipype_factory
 from capsul.process.xml import create_xml_process
 from capsul.pipeline.xml import create_xml_pipeline
 from capsul.pipeline.pipeline_nodes import Node
+from capsul.utils.parse_cache import file_stamp
 from soma.controller import Controller
 
 # Nipype import
@@ -46,6 +47,10 @@ except ImportError:
 
 process_xml_re = re.compile(r'<process.*</process>', re.DOTALL)
 
+# XML pipelines classes resolved from string ids:
+# {(process_id, current_directory): (xml_file, file_stamp, pipeline_class)}
+_xml_pipeline_classes = {}
+
 
 def is_process(item):
     """ Check if the input item is a process class or function with decorator
@@ -191,10 +196,32 @@ def _get_process_instance(process_or_id, study_config=None, **kwargs):
                 object_name = name
         return object_name
 
+    def _create_xml_pipeline(module_name, object_name, xml_url):
+        ''' Create an XML pipeline class, and keep it for later resolutions
+        of the same id
+        '''
+        pipeline_class = create_xml_pipeline(module_name, object_name,
+                                             xml_url)
+        _xml_pipeline_classes[(process_or_id, os.getcwd())] \
+            = (xml_url, file_stamp(xml_url), pipeline_class)
+        return pipeline_class
+
     result = None
+    cached = None
+    if isinstance(process_or_id, six.string_types):
+        cached = _xml_pipeline_classes.get((process_or_id, os.getcwd()))
+        if cached is not None and file_stamp(cached[0]) != cached[1]:
+            # the XML file has changed
+            cached = None
+
+    # If the function 'process_or_id' parameter is the id of an already
+    # resolved XML pipeline
+    if cached is not None:
+        result = cached[2]()
+
     # If the function 'process_or_id' parameter is already a Process
     # instance.
-    if isinstance(process_or_id, Process):
+    elif isinstance(process_or_id, Process):
         result = process_or_id
 
     # If the function 'process_or_id' parameter is a Process class.
@@ -321,8 +348,8 @@ def _get_process_instance(process_or_id, study_config=None, **kwargs):
                                               % (module_name, str(e)))
             as_xml = True
             if osp.exists(xml_url):
-                result = create_xml_pipeline(module_name, object_name,
-                                             xml_url)()
+                result = _create_xml_pipeline(module_name, object_name,
+                                              xml_url)()
 
         if result is None and not as_xml:
             if module_dict is not None:
@@ -357,8 +384,8 @@ def _get_process_instance(process_or_id, study_config=None, **kwargs):
                 xml_file = osp.join(osp.dirname(module.__file__),
                                     object_name + '.xml')
                 if osp.exists(xml_file):
-                    result = create_xml_pipeline(module_name, None,
-                                                 xml_file)()
+                    result = _create_xml_pipeline(module_name, None,
+                                                  xml_file)()
 
     if result is None:
         raise ValueError("Invalid process_or_id argument. "
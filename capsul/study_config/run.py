@@ -6,6 +6,10 @@ Functions
 =========
 :func:`run_process`
 -------------------
+:func:`reserve_process_counter`
+-------------------------------
+:func:`create_output_directories`
+---------------------------------
 '''
 
 # System import
@@ -13,10 +17,12 @@ from __future__ import absolute_import
 from __future__ import print_function
 import os
 import logging
+import threading
 import six
 
 # CAPSUL import
 from capsul.study_config.memory import Memory
+from capsul.study_config import instrumentation
 from capsul.process.process import Process
 
 # TRAIT import
@@ -25,11 +31,50 @@ from traits.api import Undefined, File, Directory
 # Define the logger
 logger = logging.getLogger(__name__)
 
+# protects the process_counter of study configs
+_process_counter_lock = threading.Lock()
+
+
+def reserve_process_counter(study_config, count=1):
+    """ Return the process counter of a study config, and increment it, in
+    a thread-safe way: processes run concurrently get distinct counters.
+
+    count counters may be reserved at once, for processes run in another
+    process: they are the returned value and the next ones.
+    """
+    with _process_counter_lock:
+        process_counter = study_config.process_counter
+        study_config.process_counter = process_counter + count
+    return process_counter
+
+
+def create_output_directories(process_instance):
+    """ Create parent directories of all output File or Directory parameters
+    of a process.
+
+    Parameters
+    ----------
+    process_instance: Process (madatory)
+        the capsul process we want to execute.
+    """
+    for name, trait in process_instance.user_traits().items():
+        if trait.output and isinstance(trait.handler, (File, Directory)):
+            value = getattr(process_instance, name)
+            if value is not Undefined and value:
+                base = os.path.dirname(value)
+                if base and not os.path.exists(base):
+                    try:
+                        os.makedirs(base)
+                    except OSError:
+                        # may have been created concurrently
+                        if not os.path.isdir(base):
+                            raise
+
 
 def run_process(output_dir, process_instance,
                 generate_logging=False, verbose=0, configuration_dict=None,
-                cachedir=None,
-                **kwargs):
+                cachedir=None, process_counter=None,
+                activate_configuration=True, **kwargs):
     """ Execute a capsul process in a specific directory.
 
     Parameters
@@ -47,6 +92,13 @@ def run_process(output_dir, process_instance,
         if different from zero, print console messages.
     configuration_dict: dict (optional)
         configuration dictionary
+    process_counter: int (optional)
+        process counter used to build the process output directory, reserved
+        by the caller using :func:`reserve_process_counter`. If None, the
+        study config counter is used, and incremented after the execution.
+    activate_configuration: bool (optional, default True)
+        activate configuration_dict. Callers running processes concurrently
+        should activate it themselves, in a single thread.
 
     Returns
     -------
@@ -55,6 +107,11 @@ def run_process(output_dir, process_instance,
     output_log_file: str
         the path to the process execution log file.
     """
+    measure = None
+    if instrumentation.is_active() \
+            and not instrumentation.is_measured(process_instance):
+        measure = instrumentation.NodeMeasure(process_instance)
+
     # Message
     logger.info("Study Config: executing process '{0}'...".format(
         process_instance.id))
@@ -67,21 +124,16 @@ def run_process(output_dir, process_instance,
 
     # create directories for outputs
     if study_config.create_output_directories:
-        for name, trait in process_instance.user_traits().items():
-            if trait.output and isinstance(trait.handler, (File, Directory)):
-                value = getattr(process_instance, name)
-                if value is not Undefined and value:
-                    base = os.path.dirname(value)
-                    if base and not os.path.exists(base):
-                        os.makedirs(base)
+        create_output_directories(process_instance)
 
     if configuration_dict is None:
         configuration_dict = {}
-    # clear activations for now.
-    from capsul import engine
-    engine.activated_modules = set()
-    #print('activate config:', configuration_dict)
-    engine.activate_configuration(configuration_dict)
+    if activate_configuration:
+        # clear activations for now.
+        from capsul import engine
+        engine.activated_modules = set()
+        #print('activate config:', configuration_dict)
+        engine.activate_configuration(configuration_dict)
 
     # Run
     if study_config.get_trait_value("use_smart_caching") in [None, False]:
@@ -92,7 +144,11 @@ def run_process(output_dir, process_instance,
     # Update the output directory folder if necessary
     if output_dir not in (None, Undefined) and output_dir:
         if study_config.process_output_directory:
-            output_dir = os.path.join(output_dir, '%s-%s' % (study_config.process_counter, process_instance.name))
+            if process_counter is None:
+                counter = study_config.process_counter
+            else:
+                counter = process_counter
+            output_dir = os.path.join(output_dir, '%s-%s' % (counter, process_instance.name))
         # Guarantee that the output directory exists
         if not os.path.isdir(output_dir):
             os.makedirs(output_dir)
@@ -140,9 +196,44 @@ def run_process(output_dir, process_instance,
         print("{0}\n[Process] Calling {1}...\n{2}".format(
             80 * "_", process_instance.id,
             call_with_inputs))
+    if measure is not None:
+        measure.start()
+    try:
+        returncode = _execute(process_instance, cachedir, study_config,
+                              verbose, kwargs)
+    except Exception:
+        if measure is not None:
+            measure.stop('failed')
+        raise
+    if measure is not None:
+        measure.stop()
+
+    # Save the process log
+    if generate_logging:
+        process_instance.save_log(returncode)
+
+    # Increment the number of executed process count
+    if process_counter is None:
+        with _process_counter_lock:
+            study_config.process_counter += 1
+
+    return returncode, output_log_file
+
+
+def _execute(process_instance, cachedir, study_config, verbose, kwargs):
+    """ Execute a process, through the smart-caching memory if cachedir is
+    not None
+    """
     if cachedir:
         # Create a memory object
-        mem = Memory(cachedir)
+        mem = Memory(
+            cachedir,
+            content_hash=study_config.get_trait_value(
+                "smart_caching_content_hash") or False,
+            max_size=study_config.get_trait_value(
+                "smart_caching_max_size") or None,
+            max_age=study_config.get_trait_value(
+                "smart_caching_max_age") or None)
         proxy_instance = mem.cache(process_instance, verbose=verbose)
 
         # Execute the proxy process
@@ -157,12 +248,4 @@ def run_process(output_dir, process_instance,
         process_instance._before_run_process()
         returncode = process_instance._run_process()
         returncode = process_instance._after_run_process(returncode)
-
-    # Save the process log
-    if generate_logging:
-        process_instance.save_log(returncode)
-
-    # Increment the number of executed process count
-    study_config.process_counter += 1
-
-    return returncode, output_log_file
+    return returncode
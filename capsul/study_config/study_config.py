@@ -35,7 +35,7 @@ else:
 logger = logging.getLogger(__name__)
 
 # Trait import
-from traits.api import File, Directory, Bool, String, Undefined, Int
+from traits.api import File, Directory, Bool, String, Undefined, Int, Enum
 
 # Soma import
 from soma.controller import Controller
@@ -44,6 +44,7 @@ from soma.controller import Controller
 from capsul.pipeline.pipeline import Pipeline
 from capsul.process.process import Process
 from capsul.study_config.run import run_process
+from capsul.study_config.parallel_run import LocalParallelExecutor
 from capsul.pipeline.pipeline_nodes import Node
 from capsul.study_config.process_instance import get_process_instance
 
@@ -95,6 +96,13 @@ class StudyConfig(Controller):
         subdirectory to output_directory. This subdirectory is named 
         '<count>-<name>' where <count> if self.process_counter and <name> 
         is the name of the process.
+    local_parallel_workers : int (default 1)
+        Number of process nodes run concurrently when pipelines are executed
+        locally without soma-workflow. 0 means the number of CPUs.
+    local_parallel_mode : str (default 'thread')
+        'thread' or 'process': how process nodes are run concurrently.
+    local_parallel_policy : str (default 'fail_fast')
+        'fail_fast' or 'keep_going': behaviour when a process fails.
 
     Methods
     -------
@@ -154,6 +162,27 @@ class StudyConfig(Controller):
              "<name> is the name of the process.",
         groups=['study'])
 
+    local_parallel_workers = Int(
+        1,
+        desc="Number of process nodes run concurrently when pipelines are "
+             "executed locally without soma-workflow. 1 runs nodes "
+             "sequentially, 0 uses the number of CPUs of the machine.",
+        groups=['study'])
+
+    local_parallel_mode = Enum(
+        'thread', 'process',
+        desc="How process nodes are run concurrently in the local parallel "
+             "execution: in threads, or in worker processes (processes are "
+             "then instantiated again from their identifier).",
+        groups=['study'])
+
+    local_parallel_policy = Enum(
+        'fail_fast', 'keep_going',
+        desc="Behaviour of the local parallel execution when a process "
+             "fails: stop starting new processes, or keep running the ones "
+             "which do not depend on the failed process.",
+        groups=['study'])
+
     def __init__(self, study_name=None, init_config=None, modules=None,
                  engine=None, **override_config):
         """ Initilize the StudyConfig class
@@ -225,6 +254,34 @@ class StudyConfig(Controller):
         self.run_lock = threading.RLock()
         self.run_interruption_request = False
 
+    def _get_execution_record(self, output_directory):
+        """ Get the ExecutionRecord used by incremental executions
+        """
+        # Import cannot be done on module due to circular dependencies
+        from capsul.study_config.execution_record import ExecutionRecord
+
+        record_file = self.get_trait_value("execution_record_file")
+        if record_file in (None, Undefined, ''):
+            if output_directory in (None, Undefined):
+                directory = os.path.expanduser(self._user_config_directory)
+            else:
+                directory = output_directory
+            record_file = os.path.join(directory,
+                                       "capsul_execution_record.sqlite")
+        return ExecutionRecord(
+            record_file,
+            content_hash=bool(
+                self.get_trait_value("smart_caching_content_hash")))
+
+    def _check_interruption_request(self):
+        """ Check (and reset) the run interruption request flag
+        """
+        with self.run_lock:
+            if self.run_interruption_request:
+                self.run_interruption_request = False
+                return True
+        return False
+
     def initialize_modules(self):
         """
         Modules initialization, calls initialize_module on each config module.
@@ -298,7 +355,10 @@ class StudyConfig(Controller):
 
          Depending on the studies_config settings, it may be a sequential run,
          or a parallel run, which can involve remote execution (through soma-
-         workflow).
+         workflow). Without soma-workflow, pipeline nodes are run
+         concurrently on the local machine when local_parallel_workers is
+         not 1, and nodes which are up to date are not run again when
+         incremental_execution is set (see SmartCachingConfig).
 
          Only pipeline nodes can be filtered on the 'execute_qc_nodes'
          attribute.
@@ -407,6 +467,32 @@ class StudyConfig(Controller):
                     self.run_interruption_request = False
                     raise RuntimeError('Execution interruption requested')
 
+            execution_record = None
+            if isinstance(process_or_pipeline, Pipeline) \
+                    and self.get_trait_value("incremental_execution"):
+                execution_record = self._get_execution_record(
+                    output_directory)
+
+            # Execute independent process nodes concurrently
+            if isinstance(process_or_pipeline, Pipeline) \
+                    and ((self.local_parallel_workers != 1
+                          and len(execution_list) > 1)
+                         or execution_record is not None):
+                executor = LocalParallelExecutor(
+                    self.local_parallel_workers,
+                    policy=self.local_parallel_policy,
+                    use_processes=(self.local_parallel_mode == 'process'),
+                    interruption_check=self._check_interruption_request,
+                    execution_record=execution_record)
+                result = executor.run(
+                    execution_list,
+                    process_or_pipeline.workflow_dependencies(),
+                    output_directory=output_directory,
+                    generate_logging=self.generate_logging,
+                    verbose=verbose,
+                    configuration_dict=configuration_dict)
+                execution_list = []
+
             # Execute each process node element
             for process_node in execution_list:
                 # Execute the process instance contained in the node
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+# System import
+from __future__ import absolute_import
+from __future__ import print_function
+import unittest
+import tempfile
+import shutil
+import os
+import time
+
+# Capsul import
+from capsul.api import Process, Pipeline
+from capsul.study_config.study_config import StudyConfig
+
+# Trait import
+from traits.api import File, Float
+
+
+class AppendProcess(Process):
+    """ Copy a text file and append a suffix to its content.
+    """
+    input = File(optional=False)
+    suffix = Float(optional=True)
+    output = File(output=True, optional=False)
+    length = Float(output=True, optional=True)
+
+    executions = []
+
+    def _run_process(self):
+        with open(self.input) as f:
+            content = f.read()
+        content += ' %s' % self.suffix
+        with open(self.output, 'w') as f:
+            f.write(content)
+        self.length = len(content)
+        self.executions.append(self.name)
+
+
+class TwoBranchesPipeline(Pipeline):
+    """ a -> b, and c independent
+    """
+    do_autoexport_nodes_parameters = False
+
+    def pipeline_definition(self):
+        proc = 'capsul.study_config.test.test_incremental_execution.' \
+            'AppendProcess'
+        for name in ('a', 'b', 'c'):
+            self.add_process(name, proc)
+            self.nodes[name].process.name = name
+            self.export_parameter(name, 'output', '%s_output' % name)
+            self.export_parameter(name, 'suffix', '%s_suffix' % name)
+        self.add_link('a.output->b.input')
+        self.export_parameter('a', 'input')
+        self.export_parameter('c', 'input', 'c_input')
+        self.export_parameter('b', 'length')
+
+
+class TestIncrementalExecution(unittest.TestCase):
+    """ Execute pipelines in the make-like incremental mode.
+    """
+    def setUp(self):
+        self.output_directory = tempfile.mkdtemp()
+        self.study_config = StudyConfig(
+            modules=['SmartCachingConfig'],
+            output_directory=self.output_directory,
+            incremental_execution=True)
+        self.pipeline = self.study_config.get_process_instance(
+            TwoBranchesPipeline)
+        pipeline = self.pipeline
+        for name in ('input', 'c_input'):
+            fname = os.path.join(self.output_directory, '%s.txt' % name)
+            with open(fname, 'w') as f:
+                f.write(name)
+            setattr(pipeline, name, fname)
+        for name in ('a', 'b', 'c'):
+            setattr(pipeline, '%s_output' % name,
+                    os.path.join(self.output_directory, '%s.txt' % name))
+        del AppendProcess.executions[:]
+
+    def tearDown(self):
+        shutil.rmtree(self.output_directory)
+
+    def run_pipeline(self):
+        del AppendProcess.executions[:]
+        self.study_config.run(self.pipeline)
+        return sorted(AppendProcess.executions)
+
+    def test_incremental_execution(self):
+        pipeline = self.pipeline
+        self.assertEqual(self.run_pipeline(), ['a', 'b', 'c'])
+        self.assertEqual(pipeline.length, 13)
+        self.assertTrue(os.path.exists(os.path.join(
+            self.output_directory, 'capsul_execution_record.sqlite')))
+
+        # nothing has changed: no process is run, outputs are restored
+        pipeline.nodes['b'].process.length = 0
+        self.assertEqual(self.run_pipeline(), [])
+        self.assertEqual(pipeline.length, 13)
+
+        # a parameter changes
+        pipeline.c_suffix = 2
+        self.assertEqual(self.run_pipeline(), ['c'])
+
+        # an output file is removed
+        os.unlink(pipeline.b_output)
+        self.assertEqual(self.run_pipeline(), ['b'])
+
+        # an input file is modified: downstream nodes are run again
+        time.sleep(0.01)
+        with open(pipeline.input, 'a') as f:
+            f.write(' modified')
+        self.assertEqual(self.run_pipeline(), ['a', 'b'])
+        self.assertEqual(pipeline.length, 22)
+
+        # a new value is also up to date when run again
+        pipeline.c_suffix = 3
+        self.assertEqual(self.run_pipeline(), ['c'])
+        self.assertEqual(self.run_pipeline(), [])
+
+        # incremental mode disabled
+        self.study_config.incremental_execution = False
+        self.assertEqual(self.run_pipeline(), ['a', 'b', 'c'])
+
+    def test_content_hash(self):
+        self.study_config.smart_caching_content_hash = True
+        self.study_config.execution_record_file = os.path.join(
+            self.output_directory, 'record', 'record.sqlite')
+        self.assertEqual(self.run_pipeline(), ['a', 'b', 'c'])
+        self.assertTrue(os.path.exists(
+            self.study_config.execution_record_file))
+        # modification time changes, not the content
+        os.utime(self.pipeline.input,
+                 (time.time() + 10, time.time() + 10))
+        self.assertEqual(self.run_pipeline(), [])
+        with open(self.pipeline.input, 'w') as f:
+            f.write('other')
+        self.assertEqual(self.run_pipeline(), ['a', 'b'])
+
+
+def test():
+    """ Function to execute unitest
+    """
+    suite = unittest.TestLoader().loadTestsFromTestCase(
+        TestIncrementalExecution)
+    runtime = unittest.TextTestRunner(verbosity=2).run(suite)
+    return runtime.wasSuccessful()
+
+
+if __name__ == "__main__":
+    print("RETURNCODE: ", test())
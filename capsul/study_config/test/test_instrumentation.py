@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+# System import
+from __future__ import absolute_import
+from __future__ import print_function
+import unittest
+import tempfile
+import shutil
+import os
+import time
+
+# Capsul import
+from capsul.api import Process, Pipeline
+from capsul.study_config.study_config import StudyConfig
+from capsul.study_config import instrumentation
+
+# Trait import
+from traits.api import Float, Bool, File
+
+
+class WaitProcess(Process):
+    """ Wait some time, and write a file
+    """
+    duration = Float(0., optional=True)
+    fail = Bool(False, optional=True)
+    output = File(output=True, optional=True)
+    out = Float(output=True)
+
+    def _run_process(self):
+        if self.fail:
+            raise ValueError('process failure')
+        time.sleep(self.duration)
+        if self.output:
+            with open(self.output, 'w') as f:
+                f.write('x' * 100)
+        self.out = self.duration
+
+
+class TwoNodesPipeline(Pipeline):
+    """ Two independent nodes, and an iterative one
+    """
+    do_autoexport_nodes_parameters = False
+
+    def pipeline_definition(self):
+        proc = 'capsul.study_config.test.test_instrumentation.WaitProcess'
+        self.add_process('fast', proc)
+        self.add_process('slow', proc)
+        self.add_iterative_process('iter', proc,
+                                   iterative_plugs=['duration', 'out'])
+        self.export_parameter('fast', 'duration', 'fast_duration')
+        self.export_parameter('slow', 'duration', 'slow_duration')
+        self.export_parameter('slow', 'output')
+        self.export_parameter('slow', 'fail')
+        self.export_parameter('fast', 'out', 'fast_out')
+        self.export_parameter('slow', 'out', 'slow_out')
+        self.export_parameter('iter', 'duration', 'iter_duration')
+        self.export_parameter('iter', 'out', 'iter_out')
+
+
+class TestInstrumentation(unittest.TestCase):
+    """ Collect execution events of pipelines
+    """
+    def setUp(self):
+        self.output_directory = tempfile.mkdtemp()
+        self.study_config = StudyConfig(
+            modules=[], output_directory=self.output_directory)
+        self.pipeline = self.study_config.get_process_instance(
+            TwoNodesPipeline)
+        self.pipeline.fast_duration = 0.
+        self.pipeline.slow_duration = 0.1
+        self.pipeline.iter_duration = [0., 0.01, 0.02]
+        self.pipeline.output = os.path.join(self.output_directory, 'out.txt')
+
+    def tearDown(self):
+        shutil.rmtree(self.output_directory)
+
+    def test_events(self):
+        recorder = instrumentation.EventsRecorder()
+        events_file = os.path.join(self.output_directory, 'events.jsonl')
+        with instrumentation.instrumented(
+                recorder, instrumentation.JsonLinesSink(events_file)):
+            self.assertTrue(instrumentation.is_active())
+            self.study_config.run(self.pipeline)
+        self.assertFalse(instrumentation.is_active())
+
+        events = recorder.events
+        self.assertEqual(
+            [(e['event'], e['name'])
+             for e in instrumentation.read_events(events_file)],
+            [(e['event'], e['name']) for e in events])
+        ends = [e for e in events if e['event'] == 'node_end'
+                and e['kind'] == 'process']
+        starts = [e for e in events if e['event'] == 'node_start'
+                  and e['kind'] == 'process']
+        self.assertEqual(len(ends), 3)
+        self.assertEqual(len(starts), 3)
+        slow = [e for e in ends if e['name'].endswith('.slow')][0]
+        self.assertEqual(slow['status'], 'done')
+        self.assertTrue(slow['wall_time'] >= 0.1)
+        self.assertEqual(slow['output_bytes'], 100)
+        self.assertTrue(slow['peak_rss'] is None or slow['peak_rss'] > 0)
+
+        iterations = [e for e in events if e['event'] == 'node_end'
+                      and e['kind'] == 'iteration']
+        self.assertEqual([e['iteration'] for e in iterations], [0, 1, 2])
+        for event in iterations:
+            self.assertTrue('propagation_time' in event)
+            self.assertTrue('completion_time' in event)
+
+        # the slowest node is listed first
+        stats = instrumentation.summary(events_file)
+        self.assertEqual(stats[0]['name'], slow['name'])
+        iter_stats = [s for s in stats if s['kind'] == 'iteration'][0]
+        self.assertEqual(iter_stats['count'], 3)
+        report = recorder.report()
+        self.assertTrue(slow['name'] in report.split('\n')[3])
+
+    def test_parallel_iterations(self):
+        recorder = instrumentation.EventsRecorder()
+        iteration = self.pipeline.nodes['iter'].process
+        iteration.parallel_workers = 2
+        iteration.parallel_chunk_size = 1
+        self.pipeline.iter_duration = [0.02, 0., 0.01, 0.]
+        with instrumentation.instrumented(recorder):
+            self.study_config.run(self.pipeline)
+        self.assertEqual(self.pipeline.iter_out, [0.02, 0., 0.01, 0.])
+        iterations = [e for e in recorder.events if e['event'] == 'node_end'
+                      and e['kind'] == 'iteration']
+        self.assertEqual(sorted(e['iteration'] for e in iterations),
+                         [0, 1, 2, 3])
+        for event in iterations:
+            self.assertEqual(event['status'], 'done')
+
+    def test_process_pool_iterations(self):
+        recorder = instrumentation.EventsRecorder()
+        iteration = self.pipeline.nodes['iter'].process
+        iteration.parallel_workers = 2
+        iteration.parallel_chunk_size = 1
+        iteration.parallel_mode = 'process'
+        with instrumentation.instrumented(recorder):
+            self.study_config.run(self.pipeline)
+        self.assertEqual(self.pipeline.iter_out, [0., 0.01, 0.02])
+        # events of worker processes are emitted in the calling process
+        iterations = [e for e in recorder.events if e['event'] == 'node_end'
+                      and e['kind'] == 'iteration']
+        self.assertEqual([e['iteration'] for e in iterations], [0, 1, 2])
+        for event in iterations:
+            self.assertEqual(event['status'], 'done')
+            self.assertNotEqual(event['pid'], os.getpid())
+            self.assertTrue(event['name'].endswith('.iter'))
+
+    def test_failure(self):
+        recorder = instrumentation.EventsRecorder()
+        self.pipeline.fail = True
+        with instrumentation.instrumented(recorder):
+            self.assertRaises(ValueError, self.study_config.run,
+                              self.pipeline)
+        failed = [e for e in recorder.events if e['event'] == 'node_end'
+                  and e['status'] == 'failed']
+        self.assertEqual(len(failed), 1)
+        self.assertTrue(failed[0]['name'].endswith('.slow'))
+        self.assertTrue('(1 failed)' in recorder.report())
+
+    def test_no_hook(self):
+        events = []
+        instrumentation.add_hook(events.append)
+        instrumentation.remove_hook(events.append)
+        self.study_config.run(self.pipeline)
+        self.assertEqual(events, [])
+
+    def test_process_pool(self):
+        self.study_config.local_parallel_workers = 2
+        self.study_config.local_parallel_mode = 'process'
+        # iterative nodes cannot be instantiated in worker processes
+        self.pipeline.nodes['iter'].enabled = False
+        recorder = instrumentation.EventsRecorder()
+        with instrumentation.instrumented(recorder):
+            self.study_config.run(self.pipeline)
+        ends = [e for e in recorder.events if e['event'] == 'node_end'
+                and e['kind'] == 'process']
+        self.assertEqual(len(ends), 2)
+        self.assertTrue(all(e['pid'] != os.getpid() for e in ends))
+
+
+def test():
+    """ Function to execute unitest
+    """
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestInstrumentation)
+    runtime = unittest.TextTestRunner(verbosity=2).run(suite)
+    return runtime.wasSuccessful()
+
+
+if __name__ == "__main__":
+    print("RETURNCODE: ", test())
@@ -7,11 +7,13 @@ import unittest
 import os
 import tempfile
 import shutil
+import time
 
 # Capsul import
 from capsul.api import Process
 from capsul.api import FileCopyProcess
 from capsul.api import get_process_instance
+from capsul.study_config import memory
 from capsul.study_config.memory import Memory
 
 # Trait import
@@ -44,6 +46,17 @@ class DummyCopyProcess(FileCopyProcess):
         self.s = repr(self.copied_inputs)
 
 
+class FileSizeProcess(Process):
+    """ Count the bytes of a file.
+    """
+    i = File(output=False, optional=False, desc="a file")
+    n = Float(output=True, desc="the file size")
+
+    def _run_process(self):
+        with open(self.i, 'rb') as f:
+            self.n = len(f.read())
+
+
 class TestMemory(unittest.TestCase):
     """ Execute a process using smart-caching functionalities.
     """
@@ -125,6 +138,118 @@ class TestMemory(unittest.TestCase):
             eval(proxy_process.s),
             {'i': copied_file, 'l': [copied_file], 'f': 2.5})
 
+    def test_statistics_and_index(self):
+        """ Test hits / misses counters and the cache index.
+        """
+        self.cachedir = tempfile.mkdtemp()
+        self.mem = Memory(self.cachedir)
+        self.proxy_process()
+        stats = self.mem.statistics(DummyProcess().id)
+        self.assertEqual(stats, {'hits': 1, 'misses': 2})
+        self.assertEqual(len(self.mem.index.entries()), 2)
+
+        # a new Memory on the same directory shares the index
+        mem2 = Memory(self.cachedir)
+        proxy_process = mem2.cache(DummyProcess(), verbose=0)
+        proxy_process(f=2., ff=2.)
+        self.assertEqual(proxy_process.res, 4.)
+        self.assertEqual(proxy_process.statistics(),
+                         {'hits': 2, 'misses': 2})
+
+        # the index is rebuilt from existing entries if it is lost
+        os.unlink(self.mem.index.path)
+        mem3 = Memory(self.cachedir)
+        self.assertEqual(len(mem3.index.entries()), 2)
+
+        mem3.clear()
+        self.assertEqual(len(mem3.index.entries()), 0)
+        proxy_process(f=2., ff=2.)
+        self.assertEqual(proxy_process.statistics(),
+                         {'hits': 0, 'misses': 1})
+
+    def test_eviction(self):
+        """ Test size and age bounded eviction.
+        """
+        self.cachedir = tempfile.mkdtemp()
+        self.mem = Memory(self.cachedir)
+        proxy_process = self.mem.cache(DummyProcess(), verbose=0)
+        for f in (1., 2., 3.):
+            proxy_process(f=f, ff=1.)
+            time.sleep(0.01)
+        # use the first entry again: it becomes the most recent one
+        proxy_process(f=1., ff=1.)
+        entries = self.mem.index.entries()
+        self.assertEqual(len(entries), 3)
+        entry_size = max(entry[2] for entry in entries)
+        removed = self.mem.evict(max_size=entry_size * 2)
+        self.assertEqual(len(removed), 1)
+        self.assertEqual(len(self.mem.index.entries()), 2)
+        for key in removed:
+            self.assertFalse(os.path.exists(
+                os.path.join(self.mem.cachedir, key)))
+        # the entry computed with f=2 has been removed
+        proxy_process(f=1., ff=1.)
+        proxy_process(f=2., ff=1.)
+        self.assertEqual(self.mem.statistics(DummyProcess().id),
+                         {'hits': 2, 'misses': 4})
+
+        # bounds given to the Memory are applied when entries are added
+        mem = Memory(self.cachedir, max_age=0.01)
+        time.sleep(0.02)
+        proxy_process = mem.cache(DummyProcess(), verbose=0)
+        proxy_process(f=4., ff=1.)
+        self.assertEqual(len(mem.index.entries()), 1)
+
+    def test_content_hash(self):
+        """ Test input files identification by their content.
+        """
+        self.cachedir = tempfile.mkdtemp()
+        fname = os.path.join(self.workspace_dir, 'data.txt')
+        with open(fname, 'w') as f:
+            f.write('some data')
+        for content_hash, misses in ((False, 2), (True, 1)):
+            mem = Memory(os.path.join(self.cachedir, str(content_hash)),
+                         content_hash=content_hash)
+            proxy_process = mem.cache(FileSizeProcess(), verbose=0)
+            proxy_process(i=fname)
+            self.assertEqual(proxy_process.n, 9)
+            # same content, other modification time
+            os.utime(fname, (time.time() - 100, time.time() - 100))
+            proxy_process(i=fname)
+            self.assertEqual(proxy_process.statistics()['misses'], misses)
+        # a modified content is a miss
+        with open(fname, 'w') as f:
+            f.write('other data!')
+        proxy_process(i=fname)
+        self.assertEqual(proxy_process.n, 11)
+        self.assertEqual(proxy_process.statistics(),
+                         {'hits': 1, 'misses': 2})
+
+    def test_content_hashes_cache_size(self):
+        """ Test the bound of the content hashes kept in memory.
+        """
+        cache_size = memory.content_hashes_cache_size
+        memory._content_hashes.clear()
+        memory.content_hashes_cache_size = 2
+        try:
+            fnames = []
+            for i in range(3):
+                fname = os.path.join(self.workspace_dir, 'data%d.txt' % i)
+                with open(fname, 'w') as f:
+                    f.write('data %d' % i)
+                fnames.append(fname)
+            hashes = [memory.file_content_hash(fname) for fname in fnames[:2]]
+            # data0 is used again, thus data1 is dropped
+            self.assertEqual(memory.file_content_hash(fnames[0]), hashes[0])
+            memory.file_content_hash(fnames[2])
+            self.assertEqual(len(memory._content_hashes), 2)
+            self.assertTrue(hashes[0] in memory._content_hashes.values())
+            self.assertFalse(hashes[1] in memory._content_hashes.values())
+        finally:
+            memory.content_hashes_cache_size = cache_size
+            memory._content_hashes.clear()
+
+
 def test():
     """ Function to execute unitest.
     """
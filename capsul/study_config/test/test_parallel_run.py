@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+# System import
+from __future__ import absolute_import
+from __future__ import print_function
+import unittest
+import tempfile
+import shutil
+import os
+import time
+import threading
+
+# Capsul import
+from capsul.api import Process, Pipeline
+from capsul.study_config.study_config import StudyConfig
+
+# Trait import
+from traits.api import Float, Bool, Directory
+
+
+class SleepProcess(Process):
+    """ Wait, and compute out = max(inp, inp2) + 1.
+    """
+    inp = Float(optional=False)
+    inp2 = Float(0., optional=True)
+    fail = Bool(False, optional=True)
+    out = Float(output=True)
+
+    intervals = {}
+    lock = threading.Lock()
+
+    def _run_process(self):
+        if self.fail:
+            raise ValueError('process failure')
+        start = time.time()
+        time.sleep(0.2)
+        self.out = max(self.inp, self.inp2) + 1
+        with self.lock:
+            self.intervals.setdefault(self, []).append(
+                (start, time.time()))
+
+
+class DirectoryProcess(SleepProcess):
+    """ SleepProcess with an output directory
+    """
+    output_directory = Directory(optional=True)
+
+
+class ForkPipeline(Pipeline):
+    """ Two independent branches joined by a last node:
+    a -> b, a -> c -> d, (b, d) -> e
+    """
+    do_autoexport_nodes_parameters = False
+    node_process = 'capsul.study_config.test.test_parallel_run.SleepProcess'
+
+    def pipeline_definition(self):
+        proc = self.node_process
+        for name in ('a', 'b', 'c', 'd', 'e'):
+            self.add_process(name, proc)
+        self.add_link('a.out->b.inp')
+        self.add_link('a.out->c.inp')
+        self.add_link('c.out->d.inp')
+        self.add_link('d.out->e.inp')
+        self.add_link('b.out->e.inp2')
+        self.export_parameter('a', 'inp')
+        self.export_parameter('e', 'out')
+
+
+class DirectoryForkPipeline(ForkPipeline):
+    """ ForkPipeline made of DirectoryProcess nodes
+    """
+    node_process \
+        = 'capsul.study_config.test.test_parallel_run.DirectoryProcess'
+
+
+class SubPipelineFork(Pipeline):
+    """ Independent branches, one of which is a sub-pipeline
+    """
+    do_autoexport_nodes_parameters = False
+
+    def pipeline_definition(self):
+        proc = 'capsul.study_config.test.test_parallel_run.SleepProcess'
+        self.add_process('first', proc)
+        self.add_process('sub', ForkPipeline())
+        self.add_process('other', proc)
+        self.add_process('last', proc)
+        self.add_link('first.out->sub.inp')
+        self.add_link('first.out->other.inp')
+        self.add_link('sub.out->last.inp')
+        self.export_parameter('first', 'inp')
+        self.export_parameter('last', 'out')
+        self.export_parameter('other', 'out', 'other_out')
+
+
+def name_of(node):
+    return node.full_name
+
+
+class TestParallelRun(unittest.TestCase):
+    """ Execute pipelines with the local parallel executor.
+    """
+    def setUp(self):
+        self.output_directory = tempfile.mkdtemp()
+        self.study_config = StudyConfig(
+            modules=[], output_directory=self.output_directory,
+            local_parallel_workers=4)
+        SleepProcess.intervals.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_directory)
+
+    def check_order(self, pipeline):
+        dependencies = pipeline.workflow_dependencies()
+        for node, deps in dependencies.items():
+            start = SleepProcess.intervals[node.process][0][0]
+            for dep in deps:
+                end = SleepProcess.intervals[dep.process][0][1]
+                self.assertTrue(end <= start)
+
+    def test_workflow_dependencies(self):
+        pipeline = self.study_config.get_process_instance(SubPipelineFork)
+        dependencies = dict(
+            (name_of(node), sorted(name_of(dep) for dep in deps))
+            for node, deps in pipeline.workflow_dependencies().items())
+        self.assertEqual(dependencies,
+                         {'first': [], 'other': ['first'],
+                          'sub.a': ['first'], 'sub.b': ['sub.a'],
+                          'sub.c': ['sub.a'], 'sub.d': ['sub.c'],
+                          'sub.e': ['sub.b', 'sub.d'],
+                          'last': ['sub.e']})
+
+    def test_parallel_execution(self):
+        pipeline = self.study_config.get_process_instance(ForkPipeline)
+        self.study_config.run(pipeline, inp=1.)
+        self.assertEqual(pipeline.out, 5.)
+        self.check_order(pipeline)
+        # b and c run concurrently
+        b = SleepProcess.intervals[pipeline.nodes['b'].process][0]
+        c = SleepProcess.intervals[pipeline.nodes['c'].process][0]
+        self.assertTrue(b[0] < c[1] and c[0] < b[1])
+
+    def test_process_output_directory(self):
+        from capsul import engine
+        self.study_config.process_output_directory = True
+        pipeline = self.study_config.get_process_instance(
+            DirectoryForkPipeline)
+        activate_configuration = engine.activate_configuration
+        activation_threads = set()
+
+        def activate(configuration_dict):
+            activation_threads.add(threading.current_thread())
+            activate_configuration(configuration_dict)
+
+        engine.activate_configuration = activate
+        try:
+            self.study_config.run(pipeline, inp=1.)
+        finally:
+            engine.activate_configuration = activate_configuration
+        self.assertEqual(pipeline.out, 5.)
+        # b and c run concurrently, in distinct directories
+        b = pipeline.nodes['b'].process
+        c = pipeline.nodes['c'].process
+        self.assertTrue(SleepProcess.intervals[b][0][0]
+                        < SleepProcess.intervals[c][0][1]
+                        and SleepProcess.intervals[c][0][0]
+                        < SleepProcess.intervals[b][0][1])
+        directories = [pipeline.nodes[name].process.output_directory
+                       for name in ('a', 'b', 'c', 'd', 'e')]
+        self.assertEqual(len(set(directories)), 5)
+        # configurations are activated by the scheduler thread only
+        self.assertEqual(activation_threads, set([threading.current_thread()]))
+
+    def test_sub_pipeline(self):
+        pipeline = self.study_config.get_process_instance(SubPipelineFork)
+        self.study_config.run(pipeline, inp=1.)
+        self.assertEqual(pipeline.out, 7.)
+        self.check_order(pipeline)
+
+    def test_sequential_fallback(self):
+        self.study_config.local_parallel_workers = 1
+        pipeline = self.study_config.get_process_instance(ForkPipeline)
+        self.study_config.run(pipeline, inp=1.)
+        self.assertEqual(pipeline.out, 5.)
+        self.check_order(pipeline)
+
+    def test_resource_hints(self):
+        self.study_config.local_parallel_workers = 2
+        pipeline = self.study_config.get_process_instance(ForkPipeline)
+        pipeline.nodes['b'].process.parallel_job_info = {'cpu_per_node': 4}
+        self.study_config.run(pipeline, inp=1.)
+        self.assertEqual(pipeline.out, 5.)
+        # b uses all slots: it cannot overlap c
+        b = SleepProcess.intervals[pipeline.nodes['b'].process][0]
+        c = SleepProcess.intervals[pipeline.nodes['c'].process][0]
+        self.assertTrue(b[1] <= c[0] or c[1] <= b[0])
+
+    def test_fail_fast(self):
+        pipeline = self.study_config.get_process_instance(ForkPipeline)
+        pipeline.nodes['b'].process.fail = True
+        self.assertRaises(ValueError, self.study_config.run, pipeline,
+                          inp=1.)
+        # no node is started after the failure of b
+        self.assertTrue(pipeline.nodes['d'].process not in SleepProcess.intervals)
+        self.assertTrue(pipeline.nodes['e'].process not in SleepProcess.intervals)
+
+    def test_keep_going(self):
+        self.study_config.local_parallel_policy = 'keep_going'
+        pipeline = self.study_config.get_process_instance(ForkPipeline)
+        pipeline.nodes['b'].process.fail = True
+        self.assertRaises(ValueError, self.study_config.run, pipeline,
+                          inp=1.)
+        # the independent branch has been run, not the node depending on b
+        self.assertEqual(len(SleepProcess.intervals[pipeline.nodes['d'].process]), 1)
+        self.assertTrue(pipeline.nodes['e'].process not in SleepProcess.intervals)
+
+    def test_process_pool(self):
+        self.study_config.local_parallel_mode = 'process'
+        pipeline = self.study_config.get_process_instance(ForkPipeline)
+        self.study_config.run(pipeline, inp=1.)
+        self.assertEqual(pipeline.out, 5.)
+        self.assertEqual(pipeline.nodes['b'].process.out, 3.)
+
+    def test_process_pool_output_directory(self):
+        self.study_config.local_parallel_mode = 'process'
+        self.study_config.process_output_directory = True
+        pipeline = self.study_config.get_process_instance(
+            DirectoryForkPipeline)
+        self.study_config.run(pipeline, inp=1.)
+        self.assertEqual(pipeline.out, 5.)
+        # directories are reserved by the scheduler, and created in workers
+        directories = [pipeline.nodes[name].process.output_directory
+                       for name in ('a', 'b', 'c', 'd', 'e')]
+        self.assertEqual(len(set(directories)), 5)
+        for directory in directories:
+            self.assertTrue(directory.startswith(self.output_directory))
+            self.assertTrue(os.path.isdir(directory))
+
+
+def test():
+    """ Function to execute unitest
+    """
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestParallelRun)
+    runtime = unittest.TextTestRunner(verbosity=2).run(suite)
+    return runtime.wasSuccessful()
+
+
+if __name__ == "__main__":
+    print("RETURNCODE: ", test())
@@ -33,9 +33,16 @@ tests_no_files = [
         "generate_logging": False,
         'use_matlab': False,
         'use_smart_caching': False,
+        'smart_caching_content_hash': False,
+        'smart_caching_max_size': 0,
+        'smart_caching_max_age': 0.,
+        'incremental_execution': False,
         'use_soma_workflow': False,
         'create_output_directories': True,
         'process_output_directory': False,
+        'local_parallel_workers': 1,
+        'local_parallel_mode': 'thread',
+        'local_parallel_policy': 'fail_fast',
         'user_level': 0,
     },
     ['FSLConfig', 'MatlabConfig', 'SPMConfig', 'SmartCachingConfig',
@@ -52,9 +59,16 @@ tests_no_files = [
         "generate_logging": False,
         'use_matlab': False,
         'use_smart_caching': False,
+        'smart_caching_content_hash': False,
+        'smart_caching_max_size': 0,
+        'smart_caching_max_age': 0.,
+        'incremental_execution': False,
         'use_soma_workflow': False,
         'create_output_directories': True,
         'process_output_directory': False,
+        'local_parallel_workers': 1,
+        'local_parallel_mode': 'thread',
+        'local_parallel_policy': 'fail_fast',
         'user_level': 0,
     },
     ['FSLConfig', 'MatlabConfig', 'SPMConfig', 'SmartCachingConfig',
@@ -71,9 +85,16 @@ tests_no_files = [
         "generate_logging": False,
         'use_matlab': False,
         'use_smart_caching': False,
+        'smart_caching_content_hash': False,
+        'smart_caching_max_size': 0,
+        'smart_caching_max_age': 0.,
+        'incremental_execution': False,
         'use_soma_workflow': False,
         'create_output_directories': True,
         'process_output_directory': False,
+        'local_parallel_workers': 1,
+        'local_parallel_mode': 'thread',
+        'local_parallel_policy': 'fail_fast',
         'user_level': 0,
     },
     ['FSLConfig', 'MatlabConfig', 'SPMConfig', 'SmartCachingConfig',
@@ -98,6 +119,9 @@ tests_no_files = [
         'use_soma_workflow': False,
         'create_output_directories': True,
         'process_output_directory': False,
+        'local_parallel_workers': 1,
+        'local_parallel_mode': 'thread',
+        'local_parallel_policy': 'fail_fast',
         'user_level': 0,
     },
     ['SomaWorkflowConfig'], None, None]],
@@ -114,9 +138,16 @@ tests_no_files = [
         "use_freesurfer": False,
         "shared_directory": soma.config.BRAINVISA_SHARE,
         'use_smart_caching': False,
+        'smart_caching_content_hash': False,
+        'smart_caching_max_size': 0,
+        'smart_caching_max_age': 0.,
+        'incremental_execution': False,
         'use_soma_workflow': False,
         'create_output_directories': True,
         'process_output_directory': False,
+        'local_parallel_workers': 1,
+        'local_parallel_mode': 'thread',
+        'local_parallel_policy': 'fail_fast',
         'user_level': 0,
     },
     ['BrainVISAConfig', 'FSLConfig', 'FreeSurferConfig', 'MatlabConfig', 
@@ -141,9 +172,16 @@ tests_standard_files = [
         "generate_logging": False,
         'use_matlab': False,
         'use_smart_caching': False,
+        'smart_caching_content_hash': False,
+        'smart_caching_max_size': 0,
+        'smart_caching_max_age': 0.,
+        'incremental_execution': False,
         'use_soma_workflow': False,
         'create_output_directories': True,
         'process_output_directory': False,
+        'local_parallel_workers': 1,
+        'local_parallel_mode': 'thread',
+        'local_parallel_policy': 'fail_fast',
         'user_level': 0,
     },
     ['FSLConfig', 'MatlabConfig', 'SPMConfig', 'SmartCachingConfig',
@@ -172,6 +210,9 @@ tests_standard_files = [
         'attributes_schemas': {},
         'process_completion': 'builtin',
         'process_output_directory': False,
+        'local_parallel_workers': 1,
+        'local_parallel_mode': 'thread',
+        'local_parallel_policy': 'fail_fast',
         'user_level': 0,
     },
     ['AttributesConfig', 'BrainVISAConfig', 'FomConfig', 'MatlabConfig', 'SPMConfig', 'SomaWorkflowConfig'],
@@ -187,9 +228,16 @@ tests_standard_files = [
         "generate_logging": False,
         'use_matlab': False,
         'use_smart_caching': False,
+        'smart_caching_content_hash': False,
+        'smart_caching_max_size': 0,
+        'smart_caching_max_age': 0.,
+        'incremental_execution': False,
         'use_soma_workflow': False,
         'create_output_directories': True,
         'process_output_directory': False,
+        'local_parallel_workers': 1,
+        'local_parallel_mode': 'thread',
+        'local_parallel_policy': 'fail_fast',
         'user_level': 0,
     },
     ['FSLConfig', 'MatlabConfig', 'SPMConfig', 'SmartCachingConfig',
@@ -203,6 +251,9 @@ tests_standard_files = [
         "generate_logging": False,
         'create_output_directories': True,
         'process_output_directory': False,
+        'local_parallel_workers': 1,
+        'local_parallel_mode': 'thread',
+        'local_parallel_policy': 'fail_fast',
         'user_level': 0,
     },
     [],
@@ -219,6 +270,9 @@ tests_standard_files = [
         'use_soma_workflow': False,
         'create_output_directories': True,
         'process_output_directory': False,
+        'local_parallel_workers': 1,
+        'local_parallel_mode': 'thread',
+        'local_parallel_policy': 'fail_fast',
         'user_level': 0,
     },
     ['SomaWorkflowConfig'],
@@ -239,9 +293,16 @@ tests_custom_files = [
         "generate_logging": False,
         'use_matlab': False,
         'use_smart_caching': False,
+        'smart_caching_content_hash': False,
+        'smart_caching_max_size': 0,
+        'smart_caching_max_age': 0.,
+        'incremental_execution': False,
         'use_soma_workflow': False,
         'create_output_directories': True,
         'process_output_directory': False,
+        'local_parallel_workers': 1,
+        'local_parallel_mode': 'thread',
+        'local_parallel_policy': 'fail_fast',
         'user_level': 0,
     },
     ['FSLConfig', 'MatlabConfig', 'SPMConfig', 'SmartCachingConfig', 'SomaWorkflowConfig'],
@@ -269,6 +330,9 @@ tests_custom_files = [
         'attributes_schemas': {},
         'process_completion': 'builtin',
         'process_output_directory': False,
+        'local_parallel_workers': 1,
+        'local_parallel_mode': 'thread',
+        'local_parallel_policy': 'fail_fast',
         'user_level': 0,
     },
     ['AttributesConfig', 'BrainVISAConfig', 'FomConfig', 'MatlabConfig', 'SPMConfig', 'SomaWorkflowConfig'],
@@ -284,9 +348,16 @@ tests_custom_files = [
         "generate_logging": False,
         'use_matlab': False,
         'use_smart_caching': False,
+        'smart_caching_content_hash': False,
+        'smart_caching_max_size': 0,
+        'smart_caching_max_age': 0.,
+        'incremental_execution': False,
         'use_soma_workflow': False,
         'create_output_directories': True,
         'process_output_directory': False,
+        'local_parallel_workers': 1,
+        'local_parallel_mode': 'thread',
+        'local_parallel_policy': 'fail_fast',
         'user_level': 0,
     },
     ['FSLConfig', 'MatlabConfig', 'SPMConfig', 'SmartCachingConfig', 'SomaWorkflowConfig'],
@@ -299,6 +370,9 @@ tests_custom_files = [
         "generate_logging": False,
         'create_output_directories': True,
         'process_output_directory': False,
+        'local_parallel_workers': 1,
+        'local_parallel_mode': 'thread',
+        'local_parallel_policy': 'fail_fast',
         'user_level': 0,
     },
     [],
@@ -315,6 +389,9 @@ tests_custom_files = [
         'use_soma_workflow': False,
         'create_output_directories': True,
         'process_output_directory': False,
+        'local_parallel_workers': 1,
+        'local_parallel_mode': 'thread',
+        'local_parallel_policy': 'fail_fast',
         'user_level': 0,
     },
     ['SomaWorkflowConfig'],
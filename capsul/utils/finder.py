@@ -6,6 +6,8 @@ Functions
 =========
 :func:`find_processes`
 ----------------------
+:func:`process_index`
+---------------------
 '''
 
 from __future__ import absolute_import
@@ -15,9 +17,13 @@ import importlib
 import pkgutil
 import types
 import re
+import functools
+import xml.etree.cElementTree as ET
 from glob import glob
 
 from capsul.process.process import Process
+from capsul.pipeline.pipeline import Pipeline
+from capsul.utils.parse_cache import cached_parse
 
 try:
     from nipype.interfaces.base import Interface
@@ -25,41 +31,190 @@ try:
 except ImportError:
     Interface = type("Interface", (object, ), {})
 
+try:
+    from importlib.util import find_spec
+except ImportError:
+    # python 2: modules have to be imported to be found
+    find_spec = None
+
 process_xml_re = re.compile(r'<process.*</process>', re.DOTALL)
 pipeline_xml_re = re.compile(r'<pipeline.*</pipeline>', re.DOTALL)
 
+
 def find_processes(module_name, ignore_import_error=True):
     ''' Find processes in a module and iterate over them
     '''
-    importlib.import_module(module_name)
-    module = sys.modules[module_name]
-    module_names  = [module_name]
-    for i, m, p in pkgutil.walk_packages(module.__path__, 
-                                         prefix='%s.' % module_name):
-        module_names.append(m)
-    for module_name in module_names:
+    for entry in process_index(module_name, ignore_import_error):
+        yield entry['id']
+
+
+def process_index(module_name, ignore_import_error=True):
+    ''' Index of the processes and pipelines of a module and of its
+    submodules.
+
+    Each module is imported once to be indexed, then its entries are kept in
+    a persistent cache (see :mod:`capsul.utils.parse_cache`) until its file
+    is modified: modules are found and indexed without being imported. Note
+    that a module entry is not updated when only the modules it imports are
+    modified.
+
+    Parameters
+    ----------
+    module_name: str
+        name of the module to look into
+    ignore_import_error: bool
+        if True, submodules which cannot be imported are skipped
+
+    Returns
+    -------
+    entries: list of dict
+        one entry per process, with the following items:
+
+        * id: process identifier, to be used in
+          :func:`~capsul.study_config.process_instance.get_process_instance`
+        * module: name of the module containing the process
+        * name: process name in the module
+        * kind: 'pipeline' or 'process'
+        * source: 'class', 'function', 'nipype' or 'xml'
+        * object: full name of the indexed object (which may have been
+          imported from another module)
+        * package: True if the module is a package (found in its __init__
+          file)
+        * doc: docstring summary
+    '''
+    entries = []
+    for sub_module_name, filename in _module_files(module_name):
         try:
-            importlib.import_module(module_name)
+            entries += cached_parse(
+                filename, 'process_index:%s' % sub_module_name,
+                functools.partial(_index_module, sub_module_name))
         except ImportError:
-            if not ignore_import_error:
+            if not ignore_import_error or sub_module_name == module_name:
                 raise
             continue
-        module = sys.modules[module_name]
-        for name in dir(module):
-            item = getattr(module, name)
-            if (isinstance(item, type) and
-                issubclass(item, Process)):
-                yield '%s.%s' % (module_name, name)
-            elif isinstance(item, Interface):
-                # If we have a Nipype interface, wrap this structure in a Process
-                # class
-                yield '%s.%s' % (module_name, name)
-            elif isinstance(item, types.FunctionType):
-                # Check docstring
-                if getattr(item, 'capsul_xml', None) or (item.__doc__ and process_xml_re.search(item.__doc__)):
-                    yield '%s.%s' % (module_name, name)
-        module_dir = osp.dirname(module.__file__)
+        module_dir = osp.dirname(filename)
         for f in glob(osp.join(module_dir, '*.xml')):
-            xml = open(osp.join(module_dir, f)).read()
-            if pipeline_xml_re.search(xml):
-                yield '%s.%s' % (module_name, osp.basename(f)[:-4])
+            doc = cached_parse(f, 'xml_pipeline_doc', _xml_pipeline_doc)
+            if doc is not None:
+                name = osp.basename(f)[:-4]
+                entries.append({
+                    'id': '%s.%s' % (sub_module_name, name),
+                    'module': sub_module_name,
+                    'name': name,
+                    'kind': 'pipeline',
+                    'source': 'xml',
+                    'object': osp.abspath(f),
+                    'package': False,
+                    'doc': doc})
+    return entries
+
+
+def _module_files(module_name):
+    ''' Iterate over (module_name, filename) for a module and its
+    submodules, without importing them (parent packages of module_name are
+    imported, however)
+    '''
+    if find_spec is None:
+        importlib.import_module(module_name)
+        module = sys.modules[module_name]
+        module_names = [module_name]
+        for i, m, p in pkgutil.walk_packages(module.__path__,
+                                             prefix='%s.' % module_name):
+            module_names.append(m)
+        for module_name in module_names:
+            try:
+                importlib.import_module(module_name)
+            except ImportError:
+                continue
+            yield module_name, sys.modules[module_name].__file__
+        return
+
+    spec = find_spec(module_name)
+    if spec is None or not spec.has_location:
+        raise ImportError('No module named %s' % module_name)
+    todo = [(module_name, spec)]
+    while todo:
+        module_name, spec = todo.pop(0)
+        yield module_name, spec.origin
+        paths = spec.submodule_search_locations
+        if paths:
+            for finder, name, is_package in pkgutil.iter_modules(paths):
+                sub_module_name = '%s.%s' % (module_name, name)
+                sub_spec = finder.find_spec(sub_module_name)
+                if sub_spec is not None and sub_spec.has_location:
+                    todo.append((sub_module_name, sub_spec))
+
+
+def _doc_summary(doc):
+    ''' First line of a docstring, without XML process descriptions and
+    the notes added to processes docstrings
+    '''
+    if not doc:
+        return ''
+    doc = process_xml_re.sub('', doc)
+    for line in doc.split('\n'):
+        line = line.strip()
+        if line:
+            if line.startswith('..'):
+                return ''
+            return line
+    return ''
+
+
+def _index_module(module_name, filename):
+    ''' Import a module and list its processes, see :func:`process_index`
+    '''
+    importlib.import_module(module_name)
+    module = sys.modules[module_name]
+    package = osp.basename(filename).startswith('__init__.')
+    entries = []
+    for name in dir(module):
+        item = getattr(module, name)
+        kind = 'process'
+        if (isinstance(item, type) and
+            issubclass(item, Process)):
+            if issubclass(item, Pipeline):
+                kind = 'pipeline'
+            source = 'class'
+            obj = item
+        elif isinstance(item, Interface):
+            # If we have a Nipype interface, wrap this structure in a Process
+            # class
+            source = 'nipype'
+            obj = item.__class__
+        elif isinstance(item, types.FunctionType):
+            # Check docstring
+            if getattr(item, 'capsul_xml', None) or (item.__doc__ and process_xml_re.search(item.__doc__)):
+                source = 'function'
+                obj = item
+            else:
+                continue
+        else:
+            continue
+        entries.append({
+            'id': '%s.%s' % (module_name, name),
+            'module': module_name,
+            'name': name,
+            'kind': kind,
+            'source': source,
+            'object': '%s.%s' % (obj.__module__, obj.__name__),
+            'package': package,
+            'doc': _doc_summary(obj.__doc__)})
+    return entries
+
+
+def _xml_pipeline_doc(filename):
+    ''' Docstring summary of an XML pipeline, None if the file is not a
+    pipeline description
+    '''
+    with open(filename) as f:
+        xml = f.read()
+    if not pipeline_xml_re.search(xml):
+        return None
+    try:
+        doc = ET.fromstring(xml).find('doc')
+    except ET.ParseError:
+        return ''
+    if doc is None:
+        return ''
+    return _doc_summary(doc.text)
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+'''
+Cache of data parsed from files
+
+Data parsed from a file (an XML pipeline definition for instance) are kept in
+memory, and stored on disk in :py:data:`cache_directory`, as pickle files. They
+are valid as long as the file has the same modification time and size: parsing
+a file is done once, even across sessions.
+
+Functions
+=========
+:func:`cached_parse`
+--------------------
+:func:`file_stamp`
+------------------
+:func:`clear_cache`
+-------------------
+'''
+
+from __future__ import absolute_import
+import os
+import os.path as osp
+import hashlib
+import tempfile
+from six.moves import cPickle as pickle
+
+#: directory of the persistent cache files. None disables the persistent
+#: cache (data are still cached in memory).
+cache_directory = osp.join(
+    os.environ.get('XDG_CACHE_HOME') or osp.expanduser('~/.cache'),
+    'capsul', 'parse_cache')
+
+# changing it invalidates all persistent cache files
+_cache_format = 1
+
+# {(kind, filename): (stamp, data)}
+_memory_cache = {}
+
+
+def file_stamp(filename):
+    ''' Modification time and size of a file, None if it does not exist
+    '''
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return None
+    return (getattr(st, 'st_mtime_ns', st.st_mtime), st.st_size)
+
+
+def cached_parse(filename, kind, parse):
+    ''' Return parse(filename), using the cache if the file has not changed
+    since it was parsed.
+
+    Parameters
+    ----------
+    filename: str
+        file to parse
+    kind: str
+        name of the parsing function, which identifies the data in the cache.
+        It should be changed when the parsing function returns different
+        data for the same file.
+    parse: callable
+        function called with the file name, when data are not in the cache.
+        Its result must be picklable.
+    '''
+    filename = osp.abspath(filename)
+    key = (kind, filename)
+    stamp = file_stamp(filename)
+    cached = _memory_cache.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    cache_file = None
+    if cache_directory and stamp is not None:
+        cache_file = osp.join(
+            cache_directory,
+            hashlib.sha1(repr(key).encode('utf-8')).hexdigest() + '.pickle')
+        try:
+            with open(cache_file, 'rb') as f:
+                cached = pickle.load(f)
+            if cached[:3] == (_cache_format, key, stamp):
+                _memory_cache[key] = (stamp, cached[3])
+                return cached[3]
+        except Exception:
+            # missing, obsolete or corrupted cache file
+            pass
+    data = parse(filename)
+    _memory_cache[key] = (stamp, data)
+    if cache_file is not None:
+        _write_cache_file(cache_file, (_cache_format, key, stamp, data))
+    return data
+
+
+def _write_cache_file(cache_file, content):
+    ''' Write a cache file atomically. Errors are ignored: the cache directory
+    may be read-only.
+    '''
+    tmp = None
+    try:
+        if not osp.isdir(cache_directory):
+            os.makedirs(cache_directory)
+        fd, tmp = tempfile.mkstemp(dir=cache_directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(content, f, pickle.HIGHEST_PROTOCOL)
+        os.rename(tmp, cache_file)
+        tmp = None
+    except Exception:
+        pass
+    finally:
+        if tmp is not None and osp.exists(tmp):
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+
+
+def clear_cache(persistent=False):
+    ''' Clear the memory cache, and the persistent one if persistent is True
+    '''
+    _memory_cache.clear()
+    if persistent and cache_directory and osp.isdir(cache_directory):
+        for filename in os.listdir(cache_directory):
+            if filename.endswith('.pickle'):
+                try:
+                    os.unlink(osp.join(cache_directory, filename))
+                except OSError:
+                    pass
@@ -4,6 +4,9 @@ from __future__ import absolute_import
 import unittest
 import six
 import sys
+import os
+import shutil
+import tempfile
 
 
 # Trait import
@@ -19,6 +22,8 @@ from soma.controller.trait_utils import (
 import capsul
 from capsul.utils.version_utils import get_tool_version
 from capsul.utils.version_utils import get_nipype_interfaces_versions
+from capsul.utils import parse_cache
+from capsul.utils.finder import process_index, find_processes
 
 
 class TestUtils(unittest.TestCase):
@@ -39,6 +44,67 @@ class TestUtils(unittest.TestCase):
         self.assertTrue(interface_version is None or
                         isinstance(interface_version, dict))
 
+    def test_process_index(self):
+        """ Method to test the processes discovery index.
+        """
+        tmpdir = tempfile.mkdtemp()
+        cache_directory = parse_cache.cache_directory
+        parse_cache.cache_directory = os.path.join(tmpdir, 'cache')
+        pdir = os.path.join(tmpdir, 'index_toolbox')
+        os.mkdir(pdir)
+        with open(os.path.join(pdir, '__init__.py'), 'w'):
+            pass
+        module_file = os.path.join(pdir, 'procs.py')
+        with open(module_file, 'w') as f:
+            f.write('from capsul.api import Process, Pipeline\n\n'
+                    'class MyProcess(Process):\n'
+                    '    """  My process\n\n    blah\n    """\n\n'
+                    'class MyPipeline(Pipeline):\n'
+                    '    pass\n')
+        sys.path.insert(0, tmpdir)
+        try:
+            entries = dict((entry['id'], entry)
+                           for entry in process_index('index_toolbox'))
+            entry = entries['index_toolbox.procs.MyProcess']
+            self.assertEqual(entry['kind'], 'process')
+            self.assertEqual(entry['source'], 'class')
+            self.assertEqual(entry['doc'], 'My process')
+            entry = entries['index_toolbox.procs.MyPipeline']
+            self.assertEqual(entry['kind'], 'pipeline')
+            self.assertEqual(entry['object'],
+                             'index_toolbox.procs.MyPipeline')
+            self.assertEqual(entries['index_toolbox.procs.Process']['object'],
+                             'capsul.process.process.Process')
+            # the index is read again without importing modules
+            for module_name in ('index_toolbox', 'index_toolbox.procs'):
+                del sys.modules[module_name]
+            parse_cache.clear_cache()
+            self.assertEqual(sorted(find_processes('index_toolbox')),
+                             sorted(entries.keys()))
+            self.assertTrue('index_toolbox.procs' not in sys.modules)
+            # modified modules are indexed again
+            with open(module_file, 'a') as f:
+                f.write('\nclass OtherProcess(Process):\n    pass\n')
+            self.assertTrue('index_toolbox.procs.OtherProcess'
+                            in find_processes('index_toolbox'))
+            # other sources of processes
+            entries = dict((entry['id'], entry)
+                           for entry in process_index('capsul.process.test'))
+            entry = entries['capsul.process.test.test_load_from_description.'
+                            'to_warp_func']
+            self.assertEqual(entry['source'], 'function')
+            self.assertEqual(entry['kind'], 'process')
+            entry = entries['capsul.process.test.test_load_from_description.'
+                            'xml_pipeline']
+            self.assertEqual(entry['source'], 'xml')
+            self.assertEqual(entry['kind'], 'pipeline')
+        finally:
+            sys.path.remove(tmpdir)
+            for module_name in ('index_toolbox', 'index_toolbox.procs'):
+                sys.modules.pop(module_name, None)
+            parse_cache.cache_directory = cache_directory
+            shutil.rmtree(tmpdir)
+
 
 def test():
     """ Function to execute unitest